@@ -50,6 +50,10 @@ def create_app(test_config=None):
     from app.views import main
     app.register_blueprint(main)
     
+    # 邮件模板与页面模板共用同一个Jinja环境（模板编译后缓存）
+    from app.email_templates import init_email_templates
+    init_email_templates(app.jinja_env)
+    
     # 将Redis客户端添加到应用
     app.redis_client = redis_client
     
@@ -106,11 +110,12 @@ def create_app(test_config=None):
             
             # 保存爬取结果到Redis
             timestamp = int(time.time())
-            key = f"all_items_{timestamp}"
+            key = None
             
             if app.redis_client:
-                # 保存所有商品列表
-                app.redis_client.set(key, json.dumps(all_items))
+                # 登记快照（每日关键帧 + 增量，由压缩任务按保留策略清理）
+                from app.snapshots import SnapshotRegistry
+                key = SnapshotRegistry(app.redis_client).save_snapshot(store_name, all_items, timestamp)
                 app.logger.info(f"已将{len(all_items)}个商品数据保存到Redis (key: {key})")
                 
                 # 如果是已知店铺，也更新店铺的商品列表
@@ -119,6 +124,7 @@ def create_app(test_config=None):
                     app.logger.info(f"更新店铺 {store_name} 的商品数据")
                     app.redis_client.set(f"store:{store_name}:items", json.dumps(all_items))
                     app.redis_client.set(f"store:{store_name}:last_update", timestamp)
+                    scraper.index_store_items(store_name, all_items)
             
             return jsonify({
                 'success': True,
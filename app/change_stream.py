@@ -0,0 +1,194 @@
+# 变动事件流模块（每次店铺更新检测到的变动写入Redis Stream，支持回放、消费组和游标增量读取）
+
+import re
+import json
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import ResponseError
+from app.config import Config
+from app.utils import json_dumps, decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 游标格式：Stream 条目ID "{毫秒时间戳}-{序号}"（序号可省略）
+CURSOR_PATTERN = re.compile(r'^\d+(-\d+)?$')
+
+
+class InvalidCursor(ValueError):
+    """游标格式无效"""
+
+
+class ChangeStream:
+    """变动事件流 - 每个店铺一个限长Stream，另有一个汇总所有店铺的全局Stream"""
+
+    # Redis数据结构设计
+    # ==================
+    # 店铺事件流：changes:store:{store_name} (STREAM, MAXLEN ~ CHANGE_STREAM_MAXLEN)
+    # 全局事件流：changes:all (STREAM, MAXLEN ~ CHANGE_STREAM_GLOBAL_MAXLEN)
+    # 事件字段：
+    # {
+    #     "type": "new_listing",        # new_listing, price_change, removed_listing, reappeared_listing
+    #     "store": "store_a",
+    #     "item_id": "123456789",
+    #     "data": "{...}",              # 价格变动为 {"item", "old_price", "new_price"}，其他为商品JSON
+    #     "ts": "1701234567"
+    # }
+    # 消费组：建立在上述Stream上（XGROUP），消费者用 XREADGROUP 读取、XACK 确认
+
+    GLOBAL_KEY = "changes:all"
+
+    EVENT_TYPES = (
+        ('new_listings', 'new_listing'),
+        ('price_changes', 'price_change'),
+        ('removed_listings', 'removed_listing'),
+        ('reappeared_listings', 'reappeared_listing'),
+    )
+
+    def __init__(self, redis_client):
+        """初始化变动事件流"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def stream_key(self, store_name: str = None) -> str:
+        """店铺事件流的键，未指定店铺时为全局事件流"""
+        return f"changes:store:{store_name}" if store_name else self.GLOBAL_KEY
+
+    # ---------- 写入 ----------
+
+    def publish(self, store_name: str, changes: Dict, timestamp: int = None) -> int:
+        """把一次更新的变动写入店铺事件流和全局事件流，返回事件数"""
+        timestamp = int(timestamp or time.time())
+        events = []
+        for key, event_type in self.EVENT_TYPES:
+            for entry in changes.get(key) or []:
+                item = entry.get('item', {}) if event_type == 'price_change' else entry
+                events.append({
+                    'type': event_type,
+                    'store': store_name,
+                    'item_id': str(item.get('id') or ''),
+                    'data': json_dumps(entry),
+                    'ts': timestamp
+                })
+        if not events:
+            return 0
+
+        store_key = self.stream_key(store_name)
+        pipe = self.redis.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(store_key, event, maxlen=Config.CHANGE_STREAM_MAXLEN, approximate=True)
+            pipe.xadd(self.GLOBAL_KEY, event, maxlen=Config.CHANGE_STREAM_GLOBAL_MAXLEN, approximate=True)
+        pipe.execute()
+
+        self.logger.info(f"已写入变动事件流: {store_name} - {len(events)} 个事件")
+        return len(events)
+
+    # ---------- 游标读取 ----------
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> Tuple[int, int]:
+        """解析游标为 (毫秒时间戳, 序号)"""
+        if not cursor or not CURSOR_PATTERN.match(cursor):
+            raise InvalidCursor(f"无效的游标: {cursor}")
+        millis, _, seq = cursor.partition('-')
+        return int(millis), int(seq or 0)
+
+    def _decode_entry(self, entry_id, fields: Dict) -> Dict:
+        fields = {decode_value(key): decode_value(value) for key, value in fields.items()}
+        return {
+            'id': decode_value(entry_id),
+            'type': fields.get('type'),
+            'store': fields.get('store'),
+            'item_id': fields.get('item_id'),
+            'data': json.loads(fields['data']) if fields.get('data') else {},
+            'ts': int(fields.get('ts') or 0)
+        }
+
+    def latest_cursor(self, store_name: str = None) -> Optional[str]:
+        """事件流中最后一个事件的ID（从现在开始订阅时使用）"""
+        entries = self.redis.xrevrange(self.stream_key(store_name), '+', '-', count=1)
+        return decode_value(entries[0][0]) if entries else None
+
+    def read_since(self, cursor: str = None, store_name: str = None, limit: int = 100) -> Dict:
+        """读取游标之后的事件（不含游标本身，游标为空时从最早的事件开始），返回事件和下一次使用的游标"""
+        key = self.stream_key(store_name)
+        limit = max(1, min(int(limit), Config.CHANGE_FEED_MAX_LIMIT))
+
+        start = '-'
+        truncated = False
+        if cursor:
+            millis, seq = self.parse_cursor(cursor)
+            start_id = (millis, seq + 1)
+            start = f"{start_id[0]}-{start_id[1]}"
+
+            # 游标对应的事件已被裁剪时，游标与最早事件之间的事件可能丢失，消费者应重新拉取完整快照
+            oldest = self.redis.xrange(key, '-', '+', count=1)
+            if oldest and self.parse_cursor(decode_value(oldest[0][0])) > start_id:
+                truncated = True
+
+        entries = self.redis.xrange(key, start, '+', count=limit + 1)
+        events = [self._decode_entry(entry_id, fields) for entry_id, fields in entries[:limit]]
+        return {
+            'events': events,
+            'cursor': events[-1]['id'] if events else cursor,
+            'has_more': len(entries) > limit,
+            'truncated': truncated
+        }
+
+    # ---------- 消费组 ----------
+
+    def ensure_group(self, group: str, store_name: str = None, start_id: str = '0') -> bool:
+        """创建消费组（已存在时忽略），start_id='$' 表示只消费之后的新事件"""
+        try:
+            self.redis.xgroup_create(self.stream_key(store_name), group, id=start_id, mkstream=True)
+            self.logger.info(f"创建消费组: {group} ({self.stream_key(store_name)})")
+            return True
+        except ResponseError as e:
+            if 'BUSYGROUP' in str(e):
+                return False
+            raise
+
+    def read_group(self, group: str, consumer: str, store_name: str = None,
+                   count: int = 100, block: int = None) -> List[Dict]:
+        """以消费组成员身份读取未分配的新事件（读取后需调用 ack 确认）"""
+        self.ensure_group(group, store_name)
+        result = self.redis.xreadgroup(
+            group, consumer, {self.stream_key(store_name): '>'},
+            count=max(1, min(int(count), Config.CHANGE_FEED_MAX_LIMIT)), block=block
+        )
+        return [
+            self._decode_entry(entry_id, fields)
+            for _, entries in result or []
+            for entry_id, fields in entries
+        ]
+
+    def ack(self, group: str, event_ids: List[str], store_name: str = None) -> int:
+        """确认事件已处理，返回确认的数量"""
+        if not event_ids:
+            return 0
+        for event_id in event_ids:
+            self.parse_cursor(event_id)
+        return self.redis.xack(self.stream_key(store_name), group, *event_ids)
+
+    def claim_stale(self, group: str, consumer: str, min_idle_ms: int = None,
+                    store_name: str = None, count: int = 100) -> List[Dict]:
+        """接管其他消费者长时间未确认的事件（消费者崩溃后由其他成员继续处理）"""
+        min_idle_ms = Config.CHANGE_STREAM_CLAIM_IDLE_MS if min_idle_ms is None else min_idle_ms
+        result = self.redis.xautoclaim(
+            self.stream_key(store_name), group, consumer, min_idle_ms, start_id='0-0', count=count
+        )
+        # redis 返回 [下次扫描起点, 接管的事件, (Redis 7) 已删除的事件ID]
+        return [self._decode_entry(entry_id, fields) for entry_id, fields in result[1] if fields]
+
+    def get_group_info(self, store_name: str = None) -> List[Dict]:
+        """获取事件流上所有消费组的状态"""
+        try:
+            groups = self.redis.xinfo_groups(self.stream_key(store_name))
+        except ResponseError:
+            # 事件流不存在
+            return []
+        return [
+            {decode_value(key): decode_value(value) for key, value in group.items()}
+            for group in groups
+        ]
@@ -6,12 +6,19 @@ import logging
 import re
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
+from redis.exceptions import WatchError
 from app.improved_scraper import ImprovedEbayStoreScraper
-import random
+from app.listing_resolver import ListingPriceResolver
+from app.config import Config
+from app.webhook import WebhookNotifier
+from app.utils import decode_value
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 旧版对比历史迁移完成标记
+LEGACY_HISTORY_MIGRATED_KEY = 'comparison:history_migrated'
+
 class PriceComparison:
     """价格对比监控类"""
     
@@ -19,6 +26,7 @@ class PriceComparison:
         """初始化价格对比监控"""
         self.redis = redis_client
         self.scraper = ImprovedEbayStoreScraper(redis_client=redis_client)
+        self.resolver = ListingPriceResolver(self.redis, self.scraper)
         self.logger = logger
     
     # Redis数据结构设计
@@ -38,6 +46,7 @@ class PriceComparison:
     #         "item_id": "987654321"
     #     },
     #     "notify_email": "user@example.com",
+    #     "webhook_url": "https://...",  # 可选，价格对比提醒同时推送到该地址
     #     "notify_conditions": {
     #         "higher": true,        # 对手价格比我高时通知
     #         "lower": true,         # 对手价格比我低时通知
@@ -48,7 +57,7 @@ class PriceComparison:
     #     "status": "active"         # active, paused, disabled
     # }
     
-    # 对比历史记录：comparison:history:{comparison_id}:{timestamp}
+    # 对比历史记录
     # {
     #     "timestamp": 1701234567,
     #     "comparison_id": "comp_20241201_001",
@@ -71,26 +80,37 @@ class PriceComparison:
     #         "threshold_exceeded": true      # 是否超过阈值
     #     },
     #     "notification_sent": true,
+    #     "notification_status": "notified",  # notified: 已发送提醒, suppressed: 已提醒过（通知账本抑制）, none: 无需提醒
     #     "check_status": "success"           # success, failed, partial
     # }
     
+    # 最新对比结果：comparison:latest:{comparison_id} (与历史记录同时写入，列表页一次读取)
+    
     # 对比配置索引：comparison:list
     # ["comp_20241201_001", "comp_20241201_002", ...]
     
-    # 对比历史索引：comparison:history_index:{comparison_id}
-    # [1701234567, 1701320967, ...] (按时间戳排序)
+    # 对比历史：comparison:history:{comparison_id} (ZSET, member=历史记录JSON, score=时间戳)
+    # 旧版数据（comparison:history_index:{comparison_id} 列表 + 每条记录单独的键）由调度器启动时迁移一次，
+    # 完成后写入标记 comparison:history_migrated
+    
+    def allocate_comparison_id(self, date_str: str = None) -> str:
+        """按日期原子分配对比配置ID（comp_YYYYMMDD_NNN）"""
+        date_str = date_str or datetime.now().strftime('%Y%m%d')
+        counter_key = f"comparison:id_counter:{date_str}"
+        
+        while True:
+            pipe = self.redis.pipeline()
+            pipe.incr(counter_key)
+            pipe.expire(counter_key, 2 * 24 * 3600)
+            next_number = pipe.execute()[0]
+            comparison_id = f"comp_{date_str}_{next_number:03d}"
+            # 计数器上线当天可能已有旧方式生成的ID，跳过已被占用的编号
+            if not self.redis.exists(f"comparison:config:{comparison_id}"):
+                return comparison_id
     
     def generate_comparison_id(self) -> str:
         """生成唯一的对比配置ID"""
-        timestamp = int(time.time())
-        date_str = datetime.fromtimestamp(timestamp).strftime('%Y%m%d')
-        
-        # 获取当日已有的对比配置数量
-        existing_configs = self.get_all_comparisons()
-        today_configs = [c for c in existing_configs if c['id'].startswith(f'comp_{date_str}')]
-        next_number = len(today_configs) + 1
-        
-        return f"comp_{date_str}_{next_number:03d}"
+        return self.allocate_comparison_id()
     
     def extract_ebay_item_id(self, url: str) -> Optional[str]:
         """从eBay URL中提取商品ID"""
@@ -108,22 +128,43 @@ class PriceComparison:
         
         return None
     
+    def _get_comparison_ids(self) -> List[str]:
+        """获取对比配置ID列表"""
+        current_list = self.redis.get("comparison:list")
+        return json.loads(decode_value(current_list)) if current_list else []
+    
     def get_all_comparisons(self) -> List[Dict]:
-        """获取所有对比配置"""
-        list_key = "comparison:list"
-        current_list = self.redis.get(list_key)
-        
-        if not current_list:
+        """获取所有对比配置（一次MGET）"""
+        comparison_ids = self._get_comparison_ids()
+        if not comparison_ids:
             return []
         
-        comparison_ids = json.loads(current_list)
-        comparisons = []
+        raw_configs = self.redis.mget([f"comparison:config:{comparison_id}" for comparison_id in comparison_ids])
+        return [json.loads(decode_value(raw)) for raw in raw_configs if raw]
+    
+    def get_all_comparisons_with_latest(self) -> List[Dict]:
+        """获取所有对比配置及其最新结果（配置和最新结果在同一次MGET中读取）"""
+        comparison_ids = self._get_comparison_ids()
+        if not comparison_ids:
+            return []
         
-        for comparison_id in comparison_ids:
-            config = self.get_comparison_config(comparison_id)
-            if config:
-                comparisons.append(config)
+        keys = [f"comparison:config:{comparison_id}" for comparison_id in comparison_ids]
+        keys += [self._latest_key(comparison_id) for comparison_id in comparison_ids]
+        values = self.redis.mget(keys)
+        raw_configs, raw_latest = values[:len(comparison_ids)], values[len(comparison_ids):]
         
+        comparisons = []
+        for raw_config, latest in zip(raw_configs, raw_latest):
+            if not raw_config:
+                continue
+            config = json.loads(decode_value(raw_config))
+            config['latest_result'] = json.loads(decode_value(latest)) if latest else None
+            if not latest and config.get('last_check'):
+                # 已检查过但没有最新结果键的旧数据，从历史中读取并回填
+                config['latest_result'] = self.get_latest_comparison_result(config['id'])
+                if config['latest_result']:
+                    self.redis.set(self._latest_key(config['id']), json.dumps(config['latest_result']))
+            comparisons.append(config)
         return comparisons
     
     def get_comparison_config(self, comparison_id: str) -> Optional[Dict]:
@@ -135,64 +176,115 @@ class PriceComparison:
             return json.loads(config_data)
         return None
     
+    def _history_key(self, comparison_id: str) -> str:
+        return f"comparison:history:{comparison_id}"
+    
+    def _latest_key(self, comparison_id: str) -> str:
+        return f"comparison:latest:{comparison_id}"
+    
+    def migrate_legacy_history(self) -> int:
+        """将旧版的JSON时间戳列表和单条记录键迁移到有序集合（完成后写入标记，只执行一次）
+        
+        返回迁移的对比数量；有对比迁移时被并发修改的，不写标记，下次启动时重试。
+        """
+        if self.redis.exists(LEGACY_HISTORY_MIGRATED_KEY):
+            return 0
+        
+        migrated = 0
+        complete = True
+        for index_key in self.redis.scan_iter(match='comparison:history_index:*', count=100):
+            index_key = decode_value(index_key)
+            comparison_id = index_key[len('comparison:history_index:'):]
+            try:
+                if self._migrate_legacy_history(comparison_id, index_key):
+                    migrated += 1
+            except WatchError:
+                complete = False
+                self.logger.warning(f"迁移对比历史时记录被修改，下次启动重试: {comparison_id}")
+        
+        if complete:
+            self.redis.set(LEGACY_HISTORY_MIGRATED_KEY, int(time.time()))
+        self.logger.info(f"旧版对比历史迁移完成: {migrated} 个对比")
+        return migrated
+    
+    def _migrate_legacy_history(self, comparison_id: str, index_key: str) -> bool:
+        """在事务中迁移单个对比的旧版历史记录（读取期间索引被修改时抛出 WatchError）"""
+        with self.redis.pipeline() as pipe:
+            pipe.watch(index_key)
+            legacy_index = pipe.get(index_key)
+            if not legacy_index:
+                return False
+            
+            timestamps = json.loads(decode_value(legacy_index))
+            legacy_keys = [f"comparison:history:{comparison_id}:{timestamp}" for timestamp in timestamps]
+            records = pipe.mget(legacy_keys) if legacy_keys else []
+            
+            pipe.multi()
+            for timestamp, record in zip(timestamps, records):
+                if record:
+                    pipe.zadd(self._history_key(comparison_id), {decode_value(record): timestamp})
+            pipe.delete(index_key, *legacy_keys)
+            pipe.execute()
+        
+        self.logger.info(f"迁移对比历史记录到有序集合: {comparison_id} ({len(timestamps)} 条)")
+        return True
+    
     def save_comparison_history(self, comparison_id: str, history_data: Dict) -> bool:
-        """保存对比历史记录"""
+        """保存对比历史记录（写入和裁剪在同一事务中完成）"""
         timestamp = history_data.get('timestamp', int(time.time()))
-        
-        # 保存历史记录
-        history_key = f"comparison:history:{comparison_id}:{timestamp}"
-        self.redis.set(history_key, json.dumps(history_data))
-        
-        # 更新历史索引
-        self._add_to_history_index(comparison_id, timestamp)
-        
-        # 设置过期时间（保留90天的历史记录）
-        self.redis.expire(history_key, 90 * 24 * 3600)
+        history_key = self._history_key(comparison_id)
+        
+        record_json = json.dumps(history_data)
+        pipe = self.redis.pipeline()
+        pipe.zadd(history_key, {record_json: timestamp})
+        pipe.set(self._latest_key(comparison_id), record_json)
+        # 删除超过保留期的记录，并只保留最近N条
+        pipe.zremrangebyscore(history_key, '-inf', f"({timestamp - Config.COMPARISON_HISTORY_RETENTION_DAYS * 24 * 3600}")
+        pipe.zremrangebyrank(history_key, 0, -Config.COMPARISON_HISTORY_MAX_ENTRIES - 1)
+        pipe.expire(history_key, Config.COMPARISON_HISTORY_RETENTION_DAYS * 24 * 3600)
+        pipe.execute()
         
         self.logger.info(f"保存对比历史记录: {comparison_id} - {timestamp}")
         return True
     
-    def _add_to_history_index(self, comparison_id: str, timestamp: int):
-        """将时间戳添加到历史索引"""
-        index_key = f"comparison:history_index:{comparison_id}"
-        current_index = self.redis.get(index_key)
-        
-        if current_index:
-            history_timestamps = json.loads(current_index)
-        else:
-            history_timestamps = []
-        
-        if timestamp not in history_timestamps:
-            history_timestamps.append(timestamp)
-            # 按时间排序，最新的在前面
-            history_timestamps.sort(reverse=True)
-            
-            # 只保留最近100条记录的索引
-            if len(history_timestamps) > 100:
-                history_timestamps = history_timestamps[:100]
-            
-            self.redis.set(index_key, json.dumps(history_timestamps))
+    def get_comparison_history_page(self, comparison_id: str, limit: int = 20, start: int = None,
+                                    end: int = None, cursor: str = None) -> Dict:
+        """按时间范围倒序分页读取对比历史（一次往返）
+        
+        游标格式为 "时间戳:已跳过数量"，可正确处理同一秒内的多条记录。
+        """
+        max_score, skip = (end if end is not None else '+inf'), 0
+        if cursor:
+            try:
+                cursor_ts, cursor_skip = cursor.split(':')
+                max_score, skip = int(cursor_ts), int(cursor_skip)
+            except ValueError:
+                raise ValueError("无效的分页游标")
+        min_score = start if start is not None else '-inf'
+        
+        rows = self.redis.zrevrangebyscore(
+            self._history_key(comparison_id), max_score, min_score,
+            start=skip, num=limit + 1, withscores=True
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more and rows:
+            last_ts = int(rows[-1][1])
+            same_ts = sum(1 for _, score in rows if int(score) == last_ts)
+            if cursor and last_ts == max_score:
+                same_ts += skip
+            next_cursor = f"{last_ts}:{same_ts}"
+        
+        return {
+            'records': [json.loads(decode_value(member)) for member, _ in rows],
+            'next_cursor': next_cursor
+        }
     
     def get_comparison_history(self, comparison_id: str, limit: int = 10) -> List[Dict]:
-        """获取对比历史记录"""
-        index_key = f"comparison:history_index:{comparison_id}"
-        current_index = self.redis.get(index_key)
-        
-        if not current_index:
-            return []
-        
-        history_timestamps = json.loads(current_index)
-        history_records = []
-        
-        # 获取最近的记录
-        for timestamp in history_timestamps[:limit]:
-            history_key = f"comparison:history:{comparison_id}:{timestamp}"
-            history_data = self.redis.get(history_key)
-            
-            if history_data:
-                history_records.append(json.loads(history_data))
-        
-        return history_records
+        """获取最近的对比历史记录"""
+        return self.get_comparison_history_page(comparison_id, limit=limit)['records']
     
     def get_latest_comparison_result(self, comparison_id: str) -> Optional[Dict]:
         """获取最新的对比结果"""
@@ -241,6 +333,7 @@ class PriceComparison:
                 "threshold_exceeded": threshold_exceeded
             },
             "notification_sent": notification_sent,
+            "notification_status": "notified" if notification_sent else "none",
             "check_status": "success"
         }
         
@@ -261,7 +354,7 @@ class PriceComparison:
     
     def create_comparison(self, my_listing_url: str, competitor_listing_url: str, 
                          notify_email: str, name: str = None, 
-                         notify_conditions: Dict = None) -> Dict:
+                         notify_conditions: Dict = None, webhook_url: str = None) -> Dict:
         """创建新的价格对比配置"""
         
         # 验证URL
@@ -271,6 +364,10 @@ class PriceComparison:
         if not self.validate_ebay_url(competitor_listing_url):
             raise ValueError("竞争对手商品URL格式无效")
         
+        webhook_error = WebhookNotifier.check_url(webhook_url) if webhook_url else None
+        if webhook_error:
+            raise ValueError(webhook_error)
+        
         # 生成配置ID
         comparison_id = self.generate_comparison_id()
         
@@ -291,18 +388,18 @@ class PriceComparison:
         competitor_title = "竞争对手商品"
         
         try:
-            my_info = self.scraper.get_single_listing_info(my_listing_url)
+            my_info = self.resolver.resolve(my_listing_url, my_item_id)
             if my_info:
                 my_title = my_info.get('title', my_title)
-        except:
-            pass
+        except Exception as e:
+            self.logger.warning(f"获取我的商品标题失败: {my_listing_url} - {str(e)}")
             
         try:
-            competitor_info = self.scraper.get_single_listing_info(competitor_listing_url)
+            competitor_info = self.resolver.resolve(competitor_listing_url, competitor_item_id)
             if competitor_info:
                 competitor_title = competitor_info.get('title', competitor_title)
-        except:
-            pass
+        except Exception as e:
+            self.logger.warning(f"获取竞争对手商品标题失败: {competitor_listing_url} - {str(e)}")
         
         # 构建配置数据
         config_data = {
@@ -319,6 +416,7 @@ class PriceComparison:
                 "item_id": competitor_item_id
             },
             "notify_email": notify_email,
+            "webhook_url": webhook_url,
             "notify_conditions": notify_conditions,
             "created_at": int(time.time()),
             "last_check": 0,
@@ -358,18 +456,34 @@ class PriceComparison:
         # 从索引中移除
         self._remove_from_comparison_list(comparison_id)
         
-        # 删除历史记录（可选，也可以保留用于审计）
-        history_keys = self.redis.keys(f"comparison:history:{comparison_id}:*")
-        if history_keys:
-            self.redis.delete(*history_keys)
-            
-        # 删除历史索引
-        index_key = f"comparison:history_index:{comparison_id}"
-        self.redis.delete(index_key)
+        # 删除历史记录、最新结果和旧版历史索引（可选，也可以保留用于审计）
+        self.redis.unlink(
+            self._history_key(comparison_id),
+            self._latest_key(comparison_id),
+            f"comparison:history_index:{comparison_id}"
+        )
+        
+        # 删除旧版历史记录键（SCAN游标分批枚举，避免KEYS阻塞Redis）
+        batch = []
+        for key in self.redis.scan_iter(match=f"comparison:history:{comparison_id}:*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self._unlink_keys(batch)
+                batch = []
+        self._unlink_keys(batch)
         
         self.logger.info(f"删除价格对比配置: {comparison_id}")
         return True
     
+    def _unlink_keys(self, keys: List):
+        """一次往返内分批UNLINK"""
+        if not keys:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for start in range(0, len(keys), 100):
+            pipe.unlink(*keys[start:start + 100])
+        pipe.execute()
+    
     def _remove_from_comparison_list(self, comparison_id: str):
         """从索引列表中移除配置ID"""
         list_key = "comparison:list"
@@ -381,8 +495,8 @@ class PriceComparison:
                 comparison_list.remove(comparison_id)
                 self.redis.set(list_key, json.dumps(comparison_list))
     
-    def perform_comparison(self, comparison_id: str) -> Optional[Dict]:
-        """执行单个对比检查"""
+    def perform_comparison(self, comparison_id: str, bypass_cache: bool = False) -> Optional[Dict]:
+        """执行单个对比检查（bypass_cache=True 时跳过缓存，抓取最新商品页面）"""
         config = self.get_comparison_config(comparison_id)
         if not config:
             self.logger.error(f"找不到对比配置: {comparison_id}")
@@ -392,23 +506,32 @@ class PriceComparison:
             self.logger.info(f"对比配置已暂停或禁用: {comparison_id}")
             return None
         
+        # 获取我的商品信息
+        my_listing_url = config['my_listing']['url']
+        my_info = self.resolver.resolve(
+            my_listing_url, config['my_listing'].get('item_id'), bypass_cache=bypass_cache
+        )
+        
+        if not my_info:
+            self.logger.error(f"无法获取我的商品信息: {my_listing_url}")
+            return None
+        
+        # 获取竞争对手商品信息
+        competitor_listing_url = config['competitor_listing']['url']
+        competitor_info = self.resolver.resolve(
+            competitor_listing_url, config['competitor_listing'].get('item_id'), bypass_cache=bypass_cache
+        )
+        
+        if not competitor_info:
+            self.logger.error(f"无法获取竞争对手商品信息: {competitor_listing_url}")
+            return None
+        
+        return self.evaluate_comparison(config, my_info, competitor_info)
+    
+    def evaluate_comparison(self, config: Dict, my_info: Dict, competitor_info: Dict) -> Optional[Dict]:
+        """根据已获取的两个商品信息生成对比记录并保存"""
+        comparison_id = config['id']
         try:
-            # 获取我的商品信息
-            my_listing_url = config['my_listing']['url']
-            my_info = self.scraper.get_single_listing_info(my_listing_url)
-            
-            if not my_info:
-                self.logger.error(f"无法获取我的商品信息: {my_listing_url}")
-                return None
-            
-            # 获取竞争对手商品信息
-            competitor_listing_url = config['competitor_listing']['url']
-            competitor_info = self.scraper.get_single_listing_info(competitor_listing_url)
-            
-            if not competitor_info:
-                self.logger.error(f"无法获取竞争对手商品信息: {competitor_listing_url}")
-                return None
-            
             # 构建价格数据
             my_price_data = {
                 "current": my_info.get('current', 0),
@@ -429,9 +552,14 @@ class PriceComparison:
                 comparison_id, my_price_data, competitor_price_data
             )
             
-            # 检查是否需要发送通知
+            # 检查是否需要发送通知（有效期内已提醒过的状态记为 suppressed，邮件和Webhook都不再发送）
             should_notify = self._should_send_notification(config, comparison_record)
-            comparison_record['notification_sent'] = should_notify
+            if should_notify and self._already_notified(config, comparison_record):
+                comparison_record['notification_sent'] = False
+                comparison_record['notification_status'] = 'suppressed'
+            else:
+                comparison_record['notification_sent'] = should_notify
+                comparison_record['notification_status'] = 'notified' if should_notify else 'none'
             
             # 保存对比历史
             self.save_comparison_history(comparison_id, comparison_record)
@@ -448,6 +576,30 @@ class PriceComparison:
             self.logger.error(f"执行价格对比时出错: {comparison_id} - {str(e)}")
             return None
     
+    @staticmethod
+    def _ledger_recipient(config: Dict) -> Optional[str]:
+        """通知账本中记录该对比提醒的收件人（未设置邮箱时以Webhook地址作为收件人）"""
+        if config.get('notify_email'):
+            return config['notify_email']
+        if config.get('webhook_url'):
+            return f"webhook:{config['webhook_url']}"
+        return None
+    
+    def _already_notified(self, config: Dict, comparison_record: Dict) -> bool:
+        """当前对比状态是否已在通知账本中（有效期内已提醒过）"""
+        recipient = self._ledger_recipient(config)
+        if not recipient or not Config.NOTIFICATION_LEDGER_ENABLED:
+            return False
+        from app.notification_ledger import NotificationLedger
+        fingerprint = NotificationLedger.comparison_fingerprint(
+            config['id'], comparison_record.get('comparison_result', {}).get('status')
+        )
+        try:
+            return not NotificationLedger(self.redis).unseen(recipient, [fingerprint])[0]
+        except Exception as e:
+            self.logger.warning(f"读取通知账本失败，不做去重: {config['id']} - {str(e)}")
+            return False
+    
     def _should_send_notification(self, config: Dict, comparison_record: Dict) -> bool:
         """判断是否应该发送通知"""
         comparison_result = comparison_record.get('comparison_result', {})
@@ -467,6 +619,32 @@ class PriceComparison:
         
         return False
     
+    def _release_recovered_alert(self, config: Dict, comparison_record: Dict):
+        """价格差异回落到释放区间后解除提醒抑制，下次超过阈值时重新提醒（滞回，避免在阈值附近反复提醒）"""
+        recipient = self._ledger_recipient(config)
+        if not recipient or not Config.NOTIFICATION_LEDGER_ENABLED:
+            return
+        from app.notification_ledger import NotificationLedger
+        threshold = float(config.get('notify_conditions', {}).get('threshold', 5.0))
+        if NotificationLedger.comparison_released(comparison_record.get('comparison_result', {}), threshold):
+            try:
+                NotificationLedger(self.redis).release_comparison(recipient, config['id'])
+            except Exception as e:
+                self.logger.warning(f"解除价格对比提醒抑制失败: {config['id']} - {str(e)}")
+    
+    def _reserve_webhook_alert(self, config: Dict, comparison_record: Dict) -> Optional[Dict]:
+        """只配置了Webhook的对比，入队前记入通知账本（有邮箱时由邮件通知器记录），
+        返回随事件保存的账本信息，推送最终失败时由Webhook队列释放"""
+        if not Config.NOTIFICATION_LEDGER_ENABLED:
+            return None
+        from app.notification_ledger import NotificationLedger
+        fingerprint = NotificationLedger.comparison_fingerprint(
+            config['id'], comparison_record.get('comparison_result', {}).get('status')
+        )
+        ledger = {'recipient': self._ledger_recipient(config), 'fingerprints': {fingerprint: Config.LEDGER_COMPARISON_TTL}}
+        NotificationLedger(self.redis).record_each(ledger['recipient'], ledger['fingerprints'])
+        return ledger
+    
     def perform_all_comparisons(self) -> Dict:
         """执行所有活跃的价格对比检查"""
         self.logger.info("开始执行所有价格对比检查")
@@ -479,26 +657,44 @@ class PriceComparison:
             'successful_checks': 0,
             'failed_checks': 0,
             'notifications_needed': [],
+            'notifications_suppressed': [],
             'comparison_results': []
         }
         
         # 导入邮件通知模块
         from app.notification import EmailNotifier
-        notifier = EmailNotifier()
+        notifier = EmailNotifier(redis_client=self.redis)
+        webhook = WebhookNotifier(self.redis)
+        
+        # 每个商品URL只抓取一次（并发、限速），然后评估所有对比
+        from app.comparison_executor import ComparisonExecutor
+        executed = ComparisonExecutor(self).run(active_comparisons)
+        results['unique_listings'] = executed['unique_listings']
+        results['failed_listings'] = executed['failed_listings']
         
         for config in active_comparisons:
             comparison_id = config['id']
-            self.logger.info(f"检查对比配置: {comparison_id}")
-            
-            # 添加随机延迟避免频繁请求
-            time.sleep(random.uniform(5.0, 10.0))
-            
-            comparison_result = self.perform_comparison(comparison_id)
+            comparison_result = executed['results'].get(comparison_id)
             
             if comparison_result:
                 results['successful_checks'] += 1
                 results['comparison_results'].append(comparison_result)
                 
+                # 有效期内已提醒过，邮件和Webhook都不再发送
+                if comparison_result.get('notification_status') == 'suppressed':
+                    results['notifications_suppressed'].append(comparison_id)
+                self._release_recovered_alert(config, comparison_result)
+                
+                # 配置了Webhook地址时推送提醒事件
+                if comparison_result.get('notification_sent') and config.get('webhook_url'):
+                    try:
+                        ledger = None if config.get('notify_email') else self._reserve_webhook_alert(config, comparison_result)
+                        if not webhook.enqueue_comparison(config['webhook_url'], config, comparison_result, ledger=ledger) and ledger:
+                            from app.notification_ledger import NotificationLedger
+                            NotificationLedger(self.redis).release(ledger['recipient'], list(ledger['fingerprints']))
+                    except Exception as e:
+                        self.logger.error(f"加入Webhook事件失败: {config['name']} - {str(e)}")
+                
                 # 如果需要发送通知，发送邮件
                 if comparison_result.get('notification_sent'):
                     notify_email = config.get('notify_email')
@@ -540,6 +736,7 @@ class PriceComparison:
                 results['failed_checks'] += 1
         
         self.logger.info(f"价格对比检查完成 - 成功: {results['successful_checks']}, "
-                        f"失败: {results['failed_checks']}, 需要通知: {len(results['notifications_needed'])}")
+                        f"失败: {results['failed_checks']}, 需要通知: {len(results['notifications_needed'])}, "
+                        f"已提醒过: {len(results['notifications_suppressed'])}")
         
         return results 
\ No newline at end of file
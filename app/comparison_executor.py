@@ -0,0 +1,118 @@
+# 价格对比批量执行模块
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from app.config import Config
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class RequestThrottle:
+    """全局请求限速 - 保证相邻两次请求的开始时间至少间隔 min_interval 秒（带随机抖动）"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """等待直到允许发出下一个请求"""
+        with self._lock:
+            now = time.time()
+            start_at = max(now, self._next_allowed)
+            self._next_allowed = start_at + self.min_interval * random.uniform(1.0, 1.5)
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+class ComparisonExecutor:
+    """价格对比执行器 - 收集所有对比涉及的唯一商品URL，每个URL并发抓取一次后再评估所有对比"""
+
+    def __init__(self, comparison, max_workers: int = None, min_interval: float = None):
+        """初始化执行器（comparison 为 PriceComparison 实例）"""
+        self.comparison = comparison
+        self.scraper = comparison.scraper
+        self.max_workers = max_workers or Config.COMPARISON_MAX_WORKERS
+        self.throttle = RequestThrottle(
+            Config.COMPARISON_REQUEST_INTERVAL if min_interval is None else min_interval
+        )
+        self.logger = logger
+
+    @staticmethod
+    def collect_urls(configs: List[Dict]) -> List[str]:
+        """收集所有对比配置中的唯一商品URL（保持首次出现的顺序）"""
+        urls = []
+        seen = set()
+        for config in configs:
+            for side in ('my_listing', 'competitor_listing'):
+                url = config.get(side, {}).get('url')
+                if url and url not in seen:
+                    seen.add(url)
+                    urls.append(url)
+        return urls
+
+    def _fetch(self, url: str, bypass_cache: bool = False) -> Optional[Dict]:
+        """限速后抓取单个商品信息"""
+        self.throttle.wait()
+        try:
+            return self.scraper.get_single_listing_info(url, request_delay=False, bypass_cache=bypass_cache)
+        except Exception as e:
+            self.logger.error(f"抓取商品信息时出错: {url} - {str(e)}")
+            return None
+
+    def fetch_all(self, urls: List[str], bypass_cache: bool = False) -> Dict[str, Optional[Dict]]:
+        """获取所有商品URL的信息，返回 URL -> 商品信息
+
+        已监控店铺中数据足够新的商品直接使用爬取结果，其余URL并发抓取商品页面。
+        bypass_cache=True 时所有URL都抓取最新页面（仍然并发、限速）。
+        """
+        if not urls:
+            return {}
+
+        if bypass_cache:
+            split = {'resolved': {}, 'to_fetch': list(urls)}
+        else:
+            split = self.comparison.resolver.split_resolvable(urls)
+        fetched = dict(split['resolved'])
+        to_fetch = split['to_fetch']
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_fetch))) as pool:
+                fetched.update(zip(to_fetch, pool.map(lambda url: self._fetch(url, bypass_cache), to_fetch)))
+
+        failed = sum(1 for info in fetched.values() if not info)
+        self.logger.info(
+            f"获取商品信息完成 - 唯一URL: {len(urls)}, 店铺数据命中: {len(split['resolved'])}, "
+            f"页面抓取: {len(to_fetch)}, 失败: {failed}"
+        )
+        return fetched
+
+    def run(self, configs: List[Dict]) -> Dict:
+        """抓取所有唯一商品后评估每个对比配置"""
+        start_time = time.time()
+        urls = self.collect_urls(configs)
+        fetched = self.fetch_all(urls)
+
+        results = {}
+        for config in configs:
+            my_info = fetched.get(config['my_listing']['url'])
+            competitor_info = fetched.get(config['competitor_listing']['url'])
+            if not my_info or not competitor_info:
+                self.logger.error(f"对比 {config['id']} 缺少商品信息，跳过评估")
+                results[config['id']] = None
+                continue
+            results[config['id']] = self.comparison.evaluate_comparison(config, my_info, competitor_info)
+
+        self.logger.info(
+            f"批量价格对比完成 - 对比: {len(configs)}, 唯一URL: {len(urls)}, "
+            f"耗时: {time.time() - start_time:.2f}秒"
+        )
+        return {
+            'results': results,
+            'unique_listings': len(urls),
+            'failed_listings': sum(1 for info in fetched.values() if not info)
+        }
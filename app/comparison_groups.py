@@ -0,0 +1,343 @@
+# 价格对比分组模块（一对多 / 多对多批量对比）
+
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+from app.config import Config
+from app.utils import decode_value
+from app.notification_ledger import NotificationLedger
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 价格状态编码（与 create_comparison_record 的状态对应）
+STATUS_NAMES = ('unknown', 'equal', 'competitor_higher', 'competitor_lower')
+
+
+def evaluate_pairs(my_prices, competitor_prices, thresholds, owners, owner_count):
+    """向量化计算所有商品对的价格差异
+
+    参数均为等长数组（每个元素对应一个商品对）：我的价格、对手价格、差异阈值、
+    以及该商品对所属的 "分组内我的商品" 序号（用于计算排名）。
+    返回 difference / percentage / status / threshold_exceeded 数组，
+    以及每个 "分组内我的商品" 的价格排名（1 表示比所有对手都便宜）和对手数量。
+    """
+    import numpy as np
+
+    my_prices = np.asarray(my_prices, dtype=float)
+    competitor_prices = np.asarray(competitor_prices, dtype=float)
+    thresholds = np.asarray(thresholds, dtype=float)
+    owners = np.asarray(owners, dtype=np.int64)
+
+    valid = (my_prices > 0) & (competitor_prices > 0)
+    difference = np.where(valid, competitor_prices - my_prices, 0.0)
+    percentage = np.divide(difference * 100, my_prices, out=np.zeros_like(difference), where=valid)
+
+    status = np.zeros(len(difference), dtype=np.int8)
+    status[valid & (np.abs(difference) < 0.01)] = 1
+    status[valid & (difference >= 0.01)] = 2
+    status[valid & (difference <= -0.01)] = 3
+
+    threshold_exceeded = valid & (np.abs(difference) >= thresholds)
+
+    # 排名 = 比我便宜的有效对手数量 + 1
+    cheaper = (valid & (difference <= -0.01)).astype(np.int64)
+    ranks = np.bincount(owners, weights=cheaper, minlength=owner_count).astype(np.int64) + 1
+    competitors = np.bincount(owners, weights=valid.astype(np.int64), minlength=owner_count).astype(np.int64)
+
+    return {
+        'difference': np.round(difference, 2),
+        'percentage': np.round(percentage, 2),
+        'status': status,
+        'threshold_exceeded': threshold_exceeded,
+        'ranks': ranks,
+        'competitors': competitors
+    }
+
+
+class ComparisonGroupManager:
+    """价格对比分组 - 一个商品对比N个对手（listing），或一组商品对比一组对手（basket）"""
+
+    # Redis数据结构设计
+    # ==================
+    # 分组配置：comparison_group:config:{group_id}
+    # {
+    #     "id": "group_3",
+    #     "name": "耳机类目",
+    #     "type": "basket",                       # listing: 1个我的商品, basket: 多个我的商品
+    #     "my_listings": [{"url": "...", "item_id": "123", "title": "..."}],
+    #     "competitors": [{"url": "...", "item_id": "456", "title": "..."}],
+    #     "notify_email": "user@example.com",
+    #     "notify_conditions": {"higher": true, "lower": true, "threshold": 5.0},
+    #     "created_at": 1701234567,
+    #     "last_check": 1701234567,
+    #     "status": "active"
+    # }
+    # 分组ID计数器：comparison_group:next_id
+    # 分组索引：comparison_group:list (SET)
+    # 最新评估结果：comparison_group:result:{group_id}
+
+    LIST_KEY = "comparison_group:list"
+
+    def __init__(self, redis_client):
+        """初始化分组管理"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _config_key(self, group_id: str) -> str:
+        return f"comparison_group:config:{group_id}"
+
+    def _result_key(self, group_id: str) -> str:
+        return f"comparison_group:result:{group_id}"
+
+    def create_group(self, name: str, my_listing_urls: List[str], competitor_urls: List[str],
+                     notify_email: str = None, notify_conditions: Dict = None) -> Dict:
+        """创建对比分组"""
+        from app.comparison import PriceComparison
+        comparison = PriceComparison(redis_client=self.redis)
+
+        my_listing_urls = list(dict.fromkeys(url.strip() for url in my_listing_urls if url and url.strip()))
+        competitor_urls = list(dict.fromkeys(url.strip() for url in competitor_urls if url and url.strip()))
+        if not my_listing_urls:
+            raise ValueError("至少需要一个我的商品URL")
+        if not competitor_urls:
+            raise ValueError("至少需要一个竞争对手商品URL")
+        for url in my_listing_urls + competitor_urls:
+            if not comparison.validate_ebay_url(url):
+                raise ValueError(f"商品URL格式无效: {url}")
+
+        def listing(url):
+            return {'url': url, 'item_id': comparison.extract_ebay_item_id(url), 'title': None}
+
+        group = {
+            'id': f"group_{self.redis.incr('comparison_group:next_id')}",
+            'name': name or f"{len(my_listing_urls)} vs {len(competitor_urls)}",
+            'type': 'listing' if len(my_listing_urls) == 1 else 'basket',
+            'my_listings': [listing(url) for url in my_listing_urls],
+            'competitors': [listing(url) for url in competitor_urls],
+            'notify_email': notify_email,
+            'notify_conditions': notify_conditions or {'higher': True, 'lower': True, 'threshold': 5.0},
+            'created_at': int(time.time()),
+            'last_check': 0,
+            'status': 'active'
+        }
+
+        pipe = self.redis.pipeline()
+        pipe.set(self._config_key(group['id']), json.dumps(group))
+        pipe.sadd(self.LIST_KEY, group['id'])
+        pipe.execute()
+
+        self.logger.info(f"创建对比分组: {group['id']} ({len(my_listing_urls)} vs {len(competitor_urls)})")
+        return group
+
+    def get_group(self, group_id: str) -> Optional[Dict]:
+        """获取分组配置"""
+        raw = self.redis.get(self._config_key(group_id))
+        return json.loads(decode_value(raw)) if raw else None
+
+    def get_all_groups(self) -> List[Dict]:
+        """批量获取所有分组配置"""
+        group_ids = sorted(decode_value(group_id) for group_id in self.redis.smembers(self.LIST_KEY))
+        if not group_ids:
+            return []
+        raw_groups = self.redis.mget([self._config_key(group_id) for group_id in group_ids])
+        return [json.loads(decode_value(raw)) for raw in raw_groups if raw]
+
+    def get_latest_result(self, group_id: str) -> Optional[Dict]:
+        """获取分组最新评估结果"""
+        raw = self.redis.get(self._result_key(group_id))
+        return json.loads(decode_value(raw)) if raw else None
+
+    def delete_group(self, group_id: str) -> bool:
+        """删除分组"""
+        pipe = self.redis.pipeline()
+        pipe.srem(self.LIST_KEY, group_id)
+        pipe.delete(self._config_key(group_id), self._result_key(group_id))
+        return bool(pipe.execute()[0])
+
+    @staticmethod
+    def _should_notify(conditions: Dict, status: str, threshold_exceeded: bool) -> bool:
+        """判断商品对是否满足通知条件"""
+        if not threshold_exceeded:
+            return False
+        return (status == 'competitor_higher' and conditions.get('higher', False)) or \
+               (status == 'competitor_lower' and conditions.get('lower', False))
+
+    def evaluate_groups(self, groups: List[Dict], listings: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+        """用已获取的商品信息一次性评估所有分组，返回 分组ID -> 评估结果"""
+        my_prices, competitor_prices, thresholds, owners = [], [], [], []
+        pair_refs = []
+        owner_refs = []
+
+        # 展开为商品对数组
+        for group in groups:
+            threshold = float(group.get('notify_conditions', {}).get('threshold', 5.0))
+            for mine in group['my_listings']:
+                my_info = listings.get(mine['url']) or {}
+                owner = len(owner_refs)
+                owner_refs.append((group['id'], mine, my_info))
+                for competitor in group['competitors']:
+                    competitor_info = listings.get(competitor['url']) or {}
+                    my_prices.append(my_info.get('current') or 0)
+                    competitor_prices.append(competitor_info.get('current') or 0)
+                    thresholds.append(threshold)
+                    owners.append(owner)
+                    pair_refs.append((group, owner, competitor, competitor_info))
+
+        if not pair_refs:
+            return {}
+
+        arrays = evaluate_pairs(my_prices, competitor_prices, thresholds, owners, len(owner_refs))
+
+        # 组装结果
+        timestamp = int(time.time())
+        results = {}
+        listing_results = {}
+        for owner, (group_id, mine, my_info) in enumerate(owner_refs):
+            listing_result = {
+                'url': mine['url'],
+                'item_id': mine.get('item_id'),
+                'title': my_info.get('title') or mine.get('title'),
+                'current': my_info.get('current'),
+                'currency': my_info.get('currency', 'USD'),
+                'rank': int(arrays['ranks'][owner]),
+                'competitors_priced': int(arrays['competitors'][owner]),
+                'pairs': []
+            }
+            listing_results[owner] = listing_result
+            results.setdefault(group_id, {
+                'group_id': group_id,
+                'timestamp': timestamp,
+                'listings': [],
+                'alerts': 0
+            })['listings'].append(listing_result)
+
+        for index, (group, owner, competitor, competitor_info) in enumerate(pair_refs):
+            status = STATUS_NAMES[arrays['status'][index]]
+            threshold_exceeded = bool(arrays['threshold_exceeded'][index])
+            notify = self._should_notify(group.get('notify_conditions', {}), status, threshold_exceeded)
+            listing_results[owner]['pairs'].append({
+                'url': competitor['url'],
+                'item_id': competitor.get('item_id'),
+                'title': competitor_info.get('title') or competitor.get('title'),
+                'current': competitor_info.get('current'),
+                'difference': float(arrays['difference'][index]),
+                'percentage': float(arrays['percentage'][index]),
+                'status': status,
+                'threshold_exceeded': threshold_exceeded,
+                'notify': notify
+            })
+            if notify:
+                results[group['id']]['alerts'] += 1
+
+        return results
+
+    def perform_groups(self, groups: List[Dict], bypass_cache: bool = False) -> Dict[str, Dict]:
+        """获取分组涉及的所有商品并评估、保存结果"""
+        from app.comparison import PriceComparison
+        from app.comparison_executor import ComparisonExecutor
+
+        groups = [group for group in groups if group.get('status') == 'active']
+        if not groups:
+            return {}
+
+        comparison = PriceComparison(redis_client=self.redis)
+        urls = list(dict.fromkeys(
+            listing['url'] for group in groups for listing in group['my_listings'] + group['competitors']
+        ))
+        listings = ComparisonExecutor(comparison).fetch_all(urls, bypass_cache=bypass_cache)
+
+        start_time = time.time()
+        results = self.evaluate_groups(groups, listings)
+        self.logger.info(
+            f"分组对比评估完成 - 分组: {len(groups)}, 商品对: "
+            f"{sum(len(g['my_listings']) * len(g['competitors']) for g in groups)}, "
+            f"耗时: {(time.time() - start_time) * 1000:.1f}毫秒"
+        )
+
+        pipe = self.redis.pipeline()
+        for group in groups:
+            result = results.get(group['id'])
+            if not result:
+                continue
+            # 回填商品标题
+            for listing, listing_result in zip(group['my_listings'], result['listings']):
+                listing['title'] = listing_result['title']
+            for competitor, pair in zip(group['competitors'], result['listings'][0]['pairs']):
+                competitor['title'] = pair['title']
+            group['last_check'] = result['timestamp']
+            pipe.set(self._config_key(group['id']), json.dumps(group))
+            pipe.set(self._result_key(group['id']), json.dumps(result))
+        pipe.execute()
+        return results
+
+    def _dedupe_alerts(self, ledger, recipient: str, group: Dict, result: Dict):
+        """按通知账本过滤已提醒过的商品对，返回 (只保留新提醒的结果, 新提醒的指纹)
+
+        价格差异回落到释放区间的商品对先解除抑制（与单个价格对比相同的滞回规则）。
+        """
+        threshold = float(group.get('notify_conditions', {}).get('threshold', 5.0))
+        released = [
+            (listing['url'], pair['url'])
+            for listing in result['listings'] for pair in listing['pairs']
+            if ledger.comparison_released(pair, threshold)
+        ]
+        ledger.release_group_pairs(recipient, group['id'], released)
+
+        candidates = [
+            (listing, pair, ledger.group_pair_fingerprint(group['id'], listing['url'], pair['url'], pair['status']))
+            for listing in result['listings'] for pair in listing['pairs'] if pair['notify']
+        ]
+        flags = ledger.unseen(recipient, [fingerprint for _, _, fingerprint in candidates])
+        fresh = {id(pair) for (_, pair, _), flag in zip(candidates, flags) if flag}
+        fingerprints = [fingerprint for (_, _, fingerprint), flag in zip(candidates, flags) if flag]
+
+        listings = [
+            dict(listing, pairs=[dict(pair, notify=id(pair) in fresh) for pair in listing['pairs']])
+            for listing in result['listings']
+        ]
+        return dict(result, listings=listings, alerts=len(fresh)), fingerprints
+
+    def perform_all_groups(self, notifier=None) -> Dict:
+        """评估所有活跃分组，并为触发条件的分组发送通知（通知账本中已提醒过的商品对不重复提醒）"""
+        groups = self.get_all_groups()
+        results = self.perform_groups(groups)
+        stats = {'total_groups': len(results), 'alerts': 0, 'emails_sent': 0, 'suppressed': 0}
+        ledger = NotificationLedger(self.redis) if Config.NOTIFICATION_LEDGER_ENABLED else None
+
+        for group in groups:
+            result = results.get(group['id'])
+            recipient = group.get('notify_email')
+            if not result:
+                continue
+
+            fingerprints = []
+            if ledger and recipient:
+                try:
+                    deduped, fingerprints = self._dedupe_alerts(ledger, recipient, group, result)
+                    stats['suppressed'] += result['alerts'] - deduped['alerts']
+                    result = deduped
+                except Exception as e:
+                    self.logger.warning(f"读取通知账本失败，不做去重 (分组: {group['id']}): {str(e)}")
+
+            if not result['alerts']:
+                continue
+            stats['alerts'] += result['alerts']
+            if notifier and recipient:
+                # 入队前记录指纹，邮件最终没有送达时由发件箱释放
+                reserved = {fingerprint: Config.LEDGER_COMPARISON_TTL for fingerprint in fingerprints}
+                if reserved:
+                    try:
+                        ledger.record_each(recipient, reserved)
+                    except Exception as e:
+                        reserved = {}
+                        self.logger.warning(f"写入通知账本失败 (分组: {group['id']}): {str(e)}")
+                if notifier.notify_group_comparison(recipient, group, result, ledger=reserved or None):
+                    stats['emails_sent'] += 1
+                elif reserved:
+                    try:
+                        ledger.release(recipient, list(reserved))
+                    except Exception as e:
+                        self.logger.warning(f"释放通知账本指纹失败 (分组: {group['id']}): {str(e)}")
+        return stats
@@ -38,3 +38,95 @@ class Config:
     # 代理配置（如果使用）
     PROXY_LIST = []  # 代理服务器列表
     PROXY_FILE = None  # 代理文件路径
+    
+    # 快照保留配置（/scrape_all 产生的 all_items 快照）
+    SNAPSHOT_KEEP_LAST = int(os.environ.get('SNAPSHOT_KEEP_LAST') or 10)  # 每个店铺保留最近N个快照
+    SNAPSHOT_KEYFRAME_DAYS = int(os.environ.get('SNAPSHOT_KEYFRAME_DAYS') or 30)  # 每日关键帧保留天数
+    SNAPSHOT_COMPACT_INTERVAL = int(os.environ.get('SNAPSHOT_COMPACT_INTERVAL') or 3600)  # 压缩任务间隔（秒）
+    SNAPSHOT_LEGACY_TTL = int(os.environ.get('SNAPSHOT_LEGACY_TTL') or 7 * 24 * 3600)  # 旧版all_items_*键的过期时间
+    
+    # 店铺历史配置（update_store_data 每次结果的增量历史）
+    HISTORY_KEYFRAME_INTERVAL = int(os.environ.get('HISTORY_KEYFRAME_INTERVAL') or 24)  # 每N条记录写入一个完整关键帧
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS') or 90)  # 历史保留天数
+    
+    # 店铺删除配置
+    STORE_PURGE_BATCH_SIZE = int(os.environ.get('STORE_PURGE_BATCH_SIZE') or 500)  # 每批SCAN/UNLINK的键数量
+    STORE_PURGE_BACKGROUND_THRESHOLD = int(os.environ.get('STORE_PURGE_BACKGROUND_THRESHOLD') or 2000)  # 商品数超过该值时后台清理
+    
+    # 商品查询配置
+    ITEM_QUERY_CACHE_TTL = int(os.environ.get('ITEM_QUERY_CACHE_TTL') or 60)  # 过滤结果缓存时间（秒）
+    ITEM_QUERY_MAX_LIMIT = int(os.environ.get('ITEM_QUERY_MAX_LIMIT') or 100)  # 单页最大商品数量
+    
+    # 标题搜索配置
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL') or 60)  # 搜索结果缓存时间（秒）
+    SEARCH_MAX_PER_PAGE = int(os.environ.get('SEARCH_MAX_PER_PAGE') or 50)  # 单页最大结果数量
+    
+    # 价格对比执行配置
+    COMPARISON_MAX_WORKERS = int(os.environ.get('COMPARISON_MAX_WORKERS') or 4)  # 同时抓取商品页面的最大并发数
+    COMPARISON_REQUEST_INTERVAL = float(os.environ.get('COMPARISON_REQUEST_INTERVAL') or 2.0)  # 相邻两次抓取请求的最小间隔（秒）
+    LISTING_RESOLVER_MAX_AGE = int(os.environ.get('LISTING_RESOLVER_MAX_AGE') or 6 * 3600)  # 对比时可直接使用的店铺爬取数据最大时长（秒）
+    
+    # 单个商品信息缓存配置
+    LISTING_CACHE_TTL = int(os.environ.get('LISTING_CACHE_TTL') or 900)  # 缓存新鲜期（秒），期内直接返回
+    LISTING_CACHE_STALE_TTL = int(os.environ.get('LISTING_CACHE_STALE_TTL') or 3600)  # 过期后仍可返回旧结果并后台刷新的时长（秒）
+    COMPARISON_HISTORY_MAX_ENTRIES = int(os.environ.get('COMPARISON_HISTORY_MAX_ENTRIES') or 100)  # 每个对比保留的历史记录条数
+    COMPARISON_HISTORY_RETENTION_DAYS = int(os.environ.get('COMPARISON_HISTORY_RETENTION_DAYS') or 90)  # 对比历史保留天数
+    
+    # SMTP连接池配置
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE') or 2)  # 每个邮件账号的最大并发连接数
+    SMTP_POOL_IDLE_TIMEOUT = int(os.environ.get('SMTP_POOL_IDLE_TIMEOUT') or 60)  # 空闲连接超过该时长（秒）后重建
+    SMTP_POOL_MAX_MESSAGES = int(os.environ.get('SMTP_POOL_MAX_MESSAGES') or 50)  # 单个连接最多发送的邮件数
+    
+    # 通知发件箱配置
+    NOTIFICATION_OUTBOX_ENABLED = (os.environ.get('NOTIFICATION_OUTBOX_ENABLED') or 'true').lower() == 'true'  # 邮件先入队再后台投递
+    OUTBOX_POLL_INTERVAL = int(os.environ.get('OUTBOX_POLL_INTERVAL') or 10)  # 投递任务执行间隔（秒）
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE') or 50)  # 每次投递的最大邮件数
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 6)  # 超过该次数后移入死信
+    OUTBOX_BACKOFF_BASE = int(os.environ.get('OUTBOX_BACKOFF_BASE') or 60)  # 首次重试等待时间（秒），之后每次翻倍
+    OUTBOX_BACKOFF_MAX = int(os.environ.get('OUTBOX_BACKOFF_MAX') or 3600)  # 最长重试等待时间（秒）
+    OUTBOX_RETENTION = int(os.environ.get('OUTBOX_RETENTION') or 7 * 24 * 3600)  # 已发送邮件的保留时间（秒）
+    OUTBOX_LOCK_TIMEOUT = int(os.environ.get('OUTBOX_LOCK_TIMEOUT') or 300)  # 投递锁超时时间（秒）
+    OUTBOX_DEAD_RETENTION = int(os.environ.get('OUTBOX_DEAD_RETENTION') or 30 * 24 * 3600)  # 死信的保留时间（秒）
+    
+    # 通知摘要配置
+    DIGEST_WINDOW = int(os.environ.get('DIGEST_WINDOW') or 900)  # 同一收件人的通知合并窗口（秒），0 表示不合并
+    DIGEST_FLUSH_INTERVAL = int(os.environ.get('DIGEST_FLUSH_INTERVAL') or 60)  # 检查到期摘要的间隔（秒）
+    
+    # 邮件内容配置
+    EMAIL_MAX_ITEMS = int(os.environ.get('EMAIL_MAX_ITEMS') or 200)  # 单封邮件最多列出的商品数，超出部分只显示数量
+    
+    # 通知去重配置
+    NOTIFICATION_LEDGER_ENABLED = (os.environ.get('NOTIFICATION_LEDGER_ENABLED') or 'true').lower() == 'true'  # 同一事件不重复通知
+    LEDGER_NEW_LISTING_TTL = int(os.environ.get('LEDGER_NEW_LISTING_TTL') or 30 * 24 * 3600)  # 新上架商品的去重有效期（秒）
+    LEDGER_PRICE_CHANGE_TTL = int(os.environ.get('LEDGER_PRICE_CHANGE_TTL') or 24 * 3600)  # 同一商品变为同一价格的去重有效期（秒）
+    LEDGER_COMPARISON_TTL = int(os.environ.get('LEDGER_COMPARISON_TTL') or 24 * 3600)  # 价格对比持续超过阈值时的重复提醒间隔（秒）
+    LEDGER_COMPARISON_RELEASE_RATIO = float(os.environ.get('LEDGER_COMPARISON_RELEASE_RATIO') or 0.5)  # 价格差异低于阈值的该比例后才重新提醒
+    
+    # Webhook推送配置
+    WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET') or ''  # 签名密钥（HMAC-SHA256）
+    WEBHOOK_TIMEOUT = int(os.environ.get('WEBHOOK_TIMEOUT') or 10)  # 单次推送超时时间（秒）
+    WEBHOOK_MAX_WORKERS = int(os.environ.get('WEBHOOK_MAX_WORKERS') or 8)  # 并发推送的地址数（同时也是连接池大小）
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE') or 200)  # 每次推送最多包含的事件数
+    WEBHOOK_MAX_BATCHES = int(os.environ.get('WEBHOOK_MAX_BATCHES') or 100)  # 每轮最多推送的批次数
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS') or 8)  # 最多推送次数，超过后进入死信
+    WEBHOOK_BACKOFF_BASE = int(os.environ.get('WEBHOOK_BACKOFF_BASE') or 15)  # 第一次重试等待时间（秒），之后每次翻倍
+    WEBHOOK_BACKOFF_MAX = int(os.environ.get('WEBHOOK_BACKOFF_MAX') or 1800)  # 最长重试等待时间（秒）
+    WEBHOOK_DEAD_RETENTION = int(os.environ.get('WEBHOOK_DEAD_RETENTION') or 7 * 24 * 3600)  # 死信批次的保留时间（秒）
+    WEBHOOK_LOCK_TIMEOUT = int(os.environ.get('WEBHOOK_LOCK_TIMEOUT') or 300)  # 推送锁超时时间（秒）
+    WEBHOOK_POLL_INTERVAL = int(os.environ.get('WEBHOOK_POLL_INTERVAL') or 5)  # 检查待推送事件的间隔（秒）
+    
+    # 变动事件流配置
+    CHANGE_STREAM_ENABLED = (os.environ.get('CHANGE_STREAM_ENABLED') or 'true').lower() == 'true'  # 是否把店铺变动写入事件流
+    CHANGE_STREAM_MAXLEN = int(os.environ.get('CHANGE_STREAM_MAXLEN') or 10000)  # 每个店铺事件流保留的事件数（近似）
+    CHANGE_STREAM_GLOBAL_MAXLEN = int(os.environ.get('CHANGE_STREAM_GLOBAL_MAXLEN') or 100000)  # 全局事件流保留的事件数（近似）
+    CHANGE_FEED_MAX_LIMIT = int(os.environ.get('CHANGE_FEED_MAX_LIMIT') or 1000)  # 每次读取的最大事件数
+    CHANGE_STREAM_CLAIM_IDLE_MS = int(os.environ.get('CHANGE_STREAM_CLAIM_IDLE_MS') or 300000)  # 未确认事件超过该时间（毫秒）后可被其他消费者接管
+    
+    # 已见商品登记表配置
+    SEEN_REGISTRY_ENABLED = (os.environ.get('SEEN_REGISTRY_ENABLED') or 'true').lower() == 'true'  # 是否用登记表判断新上架
+    SEEN_BLOOM_BITS = int(os.environ.get('SEEN_BLOOM_BITS') or 2 ** 22)  # 每个店铺布隆过滤器的位数（默认512KB，约29万商品时误判率0.1%）
+    SEEN_BLOOM_HASHES = int(os.environ.get('SEEN_BLOOM_HASHES') or 10)  # 布隆过滤器的哈希函数个数（每个商品置位的位置数）
+    SEEN_EXACT_RETENTION_DAYS = int(os.environ.get('SEEN_EXACT_RETENTION_DAYS') or 180)  # 精确记录保留天数（超过后只保留在布隆过滤器中）
+    
+    # 下架判断配置
+    REMOVAL_CONFIRM_BATCH_SIZE = int(os.environ.get('REMOVAL_CONFIRM_BATCH_SIZE') or 10)  # 每次更新抽查的待确认商品数（0为不抽查）
@@ -0,0 +1,176 @@
+# 通知摘要合并模块（按收件人合并一段时间内的通知）
+
+import json
+import time
+import logging
+from typing import Dict, List
+from app.config import Config
+from app.utils import json_dumps, decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 摘要中保留的商品字段
+ITEM_FIELDS = ('id', 'title', 'url', 'price', 'currency', 'image_url', 'shipping', 'status', 'listing_date')
+
+
+def slim_item(item: Dict) -> Dict:
+    """只保留邮件中需要的商品字段"""
+    return {field: item.get(field) for field in ITEM_FIELDS if item.get(field) is not None}
+
+
+class NotificationDigest:
+    """通知摘要 - 同一收件人在合并窗口内的新上架、价格变动、价格对比、关键词命中和价格提醒通知合并为一封邮件"""
+
+    # Redis数据结构设计
+    # ==================
+    # 待合并通知：digest:pending:{email} (LIST, 每项为一条通知JSON)
+    # {
+    #     "kind": "new_listings",       # new_listings, price_changes, comparison, watchlist_matches, price_rule_alerts
+    #     "store_name": "store_a",      # 价格对比通知为对比名称
+    #     "payload": {...},
+    #     "created_at": 1701234567,
+    #     "ledger": {"new:123": 2592000}  # 通知账本指纹 -> 有效期（可为空），随摘要邮件投递
+    # }
+    # 到期时间：digest:due (ZSET, member=收件人, score=第一条通知时间+合并窗口)
+
+    DUE_KEY = "digest:due"
+
+    def __init__(self, redis_client, window: int = None):
+        """初始化通知摘要（window 为合并窗口，单位秒）"""
+        self.redis = redis_client
+        self.window = Config.DIGEST_WINDOW if window is None else window
+        self.logger = logger
+
+    def _pending_key(self, recipient: str) -> str:
+        return f"digest:pending:{recipient}"
+
+    def add(self, recipient: str, kind: str, store_name: str, payload: Dict, ledger: Dict[str, int] = None) -> bool:
+        """加入一条通知，收件人的第一条通知开始计算合并窗口"""
+        entry = {
+            'kind': kind,
+            'store_name': store_name,
+            'payload': payload,
+            'created_at': int(time.time())
+        }
+        if ledger:
+            entry['ledger'] = ledger
+        pipe = self.redis.pipeline()
+        pipe.rpush(self._pending_key(recipient), json_dumps(entry))
+        pipe.zadd(self.DUE_KEY, {recipient: entry['created_at'] + self.window}, nx=True)
+        pipe.execute()
+        return True
+
+    def add_new_listings(self, recipient: str, store_name: str, items: List[Dict], ledger: Dict[str, int] = None) -> bool:
+        return self.add(recipient, 'new_listings', store_name, {'items': [slim_item(item) for item in items]}, ledger)
+
+    def add_price_changes(self, recipient: str, store_name: str, price_changes: List[Dict],
+                          ledger: Dict[str, int] = None) -> bool:
+        changes = [
+            {'item': slim_item(change.get('item', {})), 'old_price': change.get('old_price'), 'new_price': change.get('new_price')}
+            for change in price_changes
+        ]
+        return self.add(recipient, 'price_changes', store_name, {'changes': changes}, ledger)
+
+    def add_comparison(self, recipient: str, comparison_config: Dict, comparison_result: Dict,
+                       ledger: Dict[str, int] = None) -> bool:
+        config = {
+            'id': comparison_config.get('id'),
+            'name': comparison_config.get('name'),
+            'my_listing': comparison_config.get('my_listing', {}),
+            'competitor_listing': comparison_config.get('competitor_listing', {})
+        }
+        return self.add(recipient, 'comparison', config['name'] or config['id'],
+                        {'config': config, 'result': comparison_result}, ledger)
+
+    def add_watchlist_matches(self, recipient: str, store_name: str, matches: List[Dict]) -> bool:
+        return self.add(recipient, 'watchlist_matches', store_name, {'matches': matches})
+
+    def add_price_rule_alerts(self, recipient: str, store_name: str, alerts: List[Dict]) -> bool:
+        return self.add(recipient, 'price_rule_alerts', store_name, {'alerts': alerts})
+
+    def _take_pending(self, recipient: str) -> List[Dict]:
+        """取出收件人的所有待合并通知"""
+        pipe = self.redis.pipeline()
+        pipe.lrange(self._pending_key(recipient), 0, -1)
+        pipe.delete(self._pending_key(recipient))
+        pipe.zrem(self.DUE_KEY, recipient)
+        raw_entries = pipe.execute()[0]
+        return [json.loads(decode_value(raw)) for raw in raw_entries]
+
+    @staticmethod
+    def group_entries(entries: List[Dict]) -> Dict:
+        """按店铺分组，同一店铺的多次通知合并（商品按ID去重，后出现的覆盖先出现的）"""
+        stores = {}
+        comparisons = []
+        watchlist_matches = {}
+        price_rule_alerts = []
+        for entry in entries:
+            if entry['kind'] == 'comparison':
+                comparisons.append(entry['payload'])
+                continue
+            if entry['kind'] == 'watchlist_matches':
+                # 同一关键词命中同一商品只列出一次
+                for match in entry['payload']['matches']:
+                    watchlist_matches[(match.get('keyword_id'), match.get('item', {}).get('id'))] = match
+                continue
+            if entry['kind'] == 'price_rule_alerts':
+                price_rule_alerts.extend(entry['payload']['alerts'])
+                continue
+            section = stores.setdefault(entry['store_name'], {'new_listings': {}, 'price_changes': {}})
+            if entry['kind'] == 'new_listings':
+                for item in entry['payload']['items']:
+                    section['new_listings'][item.get('id')] = item
+            elif entry['kind'] == 'price_changes':
+                for change in entry['payload']['changes']:
+                    item_id = change['item'].get('id')
+                    previous = section['price_changes'].get(item_id)
+                    if previous:
+                        # 窗口内多次变价时保留最初的原价
+                        change = dict(change, old_price=previous['old_price'])
+                    section['price_changes'][item_id] = change
+        return {
+            'stores': {
+                store_name: {
+                    'new_listings': list(section['new_listings'].values()),
+                    'price_changes': [c for c in section['price_changes'].values() if c['old_price'] != c['new_price']]
+                }
+                for store_name, section in stores.items()
+            },
+            'comparisons': comparisons,
+            'watchlist_matches': list(watchlist_matches.values()),
+            'price_rule_alerts': price_rule_alerts
+        }
+
+    def flush_due(self, notifier, force: bool = False) -> Dict:
+        """为合并窗口已到期的收件人发送摘要邮件（force=True 时忽略窗口）"""
+        stats = {'recipients': 0, 'notifications': 0, 'emails_sent': 0}
+        max_score = '+inf' if force else int(time.time())
+
+        for recipient in self.redis.zrangebyscore(self.DUE_KEY, '-inf', max_score):
+            recipient = decode_value(recipient)
+            entries = self._take_pending(recipient)
+            if not entries:
+                continue
+
+            stats['recipients'] += 1
+            stats['notifications'] += len(entries)
+            ledger = {}
+            for entry in entries:
+                ledger.update(entry.get('ledger') or {})
+            if notifier.notify_digest(recipient, self.group_entries(entries), ledger=ledger):
+                stats['emails_sent'] += 1
+            else:
+                # 发送失败时放回，下次重试
+                pipe = self.redis.pipeline()
+                for entry in entries:
+                    pipe.rpush(self._pending_key(recipient), json_dumps(entry))
+                pipe.zadd(self.DUE_KEY, {recipient: int(time.time())}, nx=True)
+                pipe.execute()
+
+        if stats['recipients']:
+            self.logger.info(
+                f"发送通知摘要 - 收件人: {stats['recipients']}, "
+                f"合并通知: {stats['notifications']}, 邮件: {stats['emails_sent']}封"
+            )
+        return stats
@@ -0,0 +1,82 @@
+# 邮件模板模块（Jinja模板编译后缓存，与Flask应用共用同一个模板环境）
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, List, Tuple
+from app.config import Config
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模板目录（与 Flask 的 template_folder 相同，邮件模板位于 email/ 子目录）
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+_env = None
+_env_lock = threading.Lock()
+
+
+def format_money(value, currency: str = '$') -> str:
+    """格式化价格（无法转换为数值时原样显示）"""
+    try:
+        return f"{currency}{float(value):,.2f}"
+    except (TypeError, ValueError):
+        return f"{currency}{value}"
+
+
+def format_thousands(value) -> str:
+    """格式化数量（千位分隔）"""
+    return f"{int(value or 0):,}"
+
+
+def _register_filters(env):
+    env.filters['money'] = format_money
+    env.filters['thousands'] = format_thousands
+
+
+def init_email_templates(env):
+    """使用Flask应用的模板环境渲染邮件（在 create_app 中调用）"""
+    global _env
+    _register_filters(env)
+    with _env_lock:
+        _env = env
+
+
+def get_email_env():
+    """获取模板环境：优先使用Flask应用的环境，独立运行（脚本、测试）时创建一个"""
+    global _env
+    if _env is None:
+        with _env_lock:
+            if _env is None:
+                from jinja2 import Environment, FileSystemLoader, select_autoescape
+                env = Environment(
+                    loader=FileSystemLoader(TEMPLATE_DIR),
+                    autoescape=select_autoescape(['html']),
+                    auto_reload=False,  # 模板只编译一次，之后直接使用缓存
+                )
+                _register_filters(env)
+                _env = env
+    return _env
+
+
+def render_email(name: str, **context) -> Tuple[str, str]:
+    """渲染邮件模板，返回 (HTML正文, 纯文本正文)"""
+    env = get_email_env()
+    context.setdefault('sent_at', time.strftime('%Y-%m-%d %H:%M:%S'))
+    html = env.get_template(f"email/{name}.html").render(**context)
+    text = env.get_template(f"email/{name}.txt").render(**context)
+    return html, text
+
+
+class ItemBudget:
+    """邮件商品数量上限 - 多个列表共用同一个额度，超出部分只显示数量"""
+
+    def __init__(self, limit: int = None):
+        self.remaining = Config.EMAIL_MAX_ITEMS if limit is None else limit
+
+    def take(self, items: List) -> Dict:
+        """截取列表，返回 {'items': 展示的部分, 'total': 总数, 'more': 未展示的数量}"""
+        shown = list(items[:max(self.remaining, 0)])
+        self.remaining -= len(shown)
+        return {'items': shown, 'total': len(items), 'more': len(items) - len(shown)}
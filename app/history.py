@@ -0,0 +1,251 @@
+# 店铺历史状态模块
+
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from app.config import Config
+from app.utils import json_dumps, decode_value
+from app.snapshots import (
+    VOLATILE_FIELDS, normalize_items, compute_items_delta, apply_items_delta
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class StoreHistory:
+    """店铺历史引擎 - 每次更新保存为增量，定期保存完整关键帧，支持按时间点还原"""
+
+    # Redis数据结构设计
+    # ==================
+    # 有历史记录的店铺：history:stores (SET)
+    # 历史索引：history:{store_name}:index (ZSET, member=时间戳, score=时间戳)
+    # 关键帧索引：history:{store_name}:keyframes (ZSET, member=时间戳, score=时间戳)
+    # 最新状态摘要：history:{store_name}:head -> "{timestamp}:{sha1}"
+    # 历史数据：history:{store_name}:{timestamp}
+    # 关键帧: {"type": "keyframe", "timestamp": 1701234567, "items": [...]}
+    # 增量:   {"type": "delta", "timestamp": 1701320967, "prev": 1701234567,
+    #          "delta": {"added": {...}, "removed": [...], "changed": {...}, "order": [...]}}
+
+    STORES_KEY = "history:stores"
+
+    def __init__(self, redis_client, keyframe_interval: int = None, retention_days: int = None):
+        """初始化店铺历史引擎"""
+        self.redis = redis_client
+        self.keyframe_interval = keyframe_interval or Config.HISTORY_KEYFRAME_INTERVAL
+        self.retention_days = retention_days or Config.HISTORY_RETENTION_DAYS
+        self.logger = logger
+
+    def _index_key(self, store_name: str) -> str:
+        return f"history:{store_name}:index"
+
+    def _keyframes_key(self, store_name: str) -> str:
+        return f"history:{store_name}:keyframes"
+
+    def _head_key(self, store_name: str) -> str:
+        return f"history:{store_name}:head"
+
+    def _record_key(self, store_name: str, timestamp: int) -> str:
+        return f"history:{store_name}:{timestamp}"
+
+    @staticmethod
+    def _state_digest(items: List[Dict]) -> str:
+        """计算商品状态摘要（忽略易变字段）"""
+        stripped = [
+            {field: value for field, value in item.items() if field not in VOLATILE_FIELDS}
+            for item in items
+        ]
+        return hashlib.sha1(json.dumps(stripped, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _latest_score(self, key: str, max_ts) -> Optional[int]:
+        """获取有序集合中不大于max_ts的最大时间戳"""
+        result = self.redis.zrevrangebyscore(key, max_ts, '-inf', start=0, num=1)
+        if not result:
+            return None
+        return int(decode_value(result[0]))
+
+    def record_update(self, store_name: str, items: List[Dict],
+                      previous_items: List[Dict] = None, timestamp: int = None) -> Dict:
+        """记录一次店铺更新，返回写入的历史记录摘要"""
+        timestamp = int(timestamp or time.time())
+        items = normalize_items(items)
+
+        head = decode_value(self.redis.get(self._head_key(store_name)))
+        head_ts = int(head.split(':', 1)[0]) if head else None
+
+        record = None
+        if head_ts is not None and head_ts < timestamp:
+            # 距离上一个关键帧的增量数量达到间隔时写入新的关键帧
+            keyframe_ts = self._latest_score(self._keyframes_key(store_name), head_ts)
+            chain_length = self.redis.zcount(self._index_key(store_name), f"({keyframe_ts}", head_ts) if keyframe_ts else 0
+
+            if keyframe_ts is not None and chain_length + 1 < self.keyframe_interval:
+                # 调用方提供的上次数据与历史最新状态一致时直接使用，否则从历史还原
+                base_items = None
+                if previous_items is not None:
+                    normalized_previous = normalize_items(previous_items)
+                    if head.split(':', 1)[1] == self._state_digest(normalized_previous):
+                        base_items = normalized_previous
+                if base_items is None:
+                    head_state = self.get_store_state(store_name, head_ts)
+                    base_items = head_state['items'] if head_state else None
+
+                if base_items is not None:
+                    record = {
+                        'type': 'delta',
+                        'timestamp': timestamp,
+                        'prev': head_ts,
+                        'delta': compute_items_delta(base_items, items)
+                    }
+
+        is_keyframe = record is None
+        if is_keyframe:
+            record = {
+                'type': 'keyframe',
+                'timestamp': timestamp,
+                'items': items
+            }
+
+        pipe = self.redis.pipeline()
+        pipe.set(self._record_key(store_name, timestamp), json_dumps(record))
+        pipe.zadd(self._index_key(store_name), {str(timestamp): timestamp})
+        if is_keyframe:
+            pipe.zadd(self._keyframes_key(store_name), {str(timestamp): timestamp})
+        pipe.set(self._head_key(store_name), f"{timestamp}:{self._state_digest(items)}")
+        pipe.sadd(self.STORES_KEY, store_name)
+        pipe.execute()
+
+        summary = {'timestamp': timestamp, 'type': record['type']}
+        if not is_keyframe:
+            delta = record['delta']
+            summary.update({
+                'added': len(delta['added']),
+                'removed': len(delta['removed']),
+                'changed': len(delta['changed'])
+            })
+        self.logger.info(f"记录店铺历史: {store_name} - {summary}")
+        return summary
+
+    def get_store_state(self, store_name: str, timestamp: int = None) -> Optional[Dict]:
+        """还原店铺在指定时间点的状态（一个关键帧 + 一段短增量链）"""
+        max_ts = int(timestamp) if timestamp is not None else '+inf'
+
+        entry_ts = self._latest_score(self._index_key(store_name), max_ts)
+        if entry_ts is None:
+            return None
+
+        keyframe_ts = self._latest_score(self._keyframes_key(store_name), entry_ts)
+        if keyframe_ts is None:
+            self.logger.error(f"店铺 {store_name} 在 {entry_ts} 之前没有关键帧")
+            return None
+
+        chain = [
+            int(decode_value(ts))
+            for ts in self.redis.zrangebyscore(self._index_key(store_name), keyframe_ts, entry_ts)
+        ]
+        raw_records = self.redis.mget([self._record_key(store_name, ts) for ts in chain])
+
+        items = None
+        for ts, raw in zip(chain, raw_records):
+            if not raw:
+                self.logger.error(f"店铺历史记录缺失: {store_name} - {ts}")
+                return None
+            record = json.loads(decode_value(raw))
+            if record.get('type') == 'keyframe':
+                items = record.get('items', [])
+            else:
+                items = apply_items_delta(items, record.get('delta', {}), ts)
+
+        return {
+            'store_name': store_name,
+            'timestamp': entry_ts,
+            'items': items
+        }
+
+    def diff_states(self, store_name: str, from_ts: int, to_ts: int) -> Optional[Dict]:
+        """比较店铺在两个时间点之间的变化"""
+        from_state = self.get_store_state(store_name, from_ts)
+        to_state = self.get_store_state(store_name, to_ts)
+        if not from_state or not to_state:
+            return None
+
+        from_dict = {item.get('id'): item for item in from_state['items'] if item.get('id')}
+        delta = compute_items_delta(from_state['items'], to_state['items'])
+
+        changed = []
+        for item_id, patch in delta['changed'].items():
+            old_item = from_dict.get(item_id, {})
+            fields = {
+                field: {'old': old_item.get(field), 'new': value}
+                for field, value in patch['set'].items()
+            }
+            for field in patch['unset']:
+                fields[field] = {'old': old_item.get(field), 'new': None}
+            changed.append({
+                'id': item_id,
+                'title': patch['set'].get('title', old_item.get('title')),
+                'fields': fields
+            })
+
+        return {
+            'store_name': store_name,
+            'from_timestamp': from_state['timestamp'],
+            'to_timestamp': to_state['timestamp'],
+            'added': list(delta['added'].values()),
+            'removed': [from_dict[item_id] for item_id in delta['removed']],
+            'changed': changed
+        }
+
+    def list_history(self, store_name: str, limit: int = 50) -> List[Dict]:
+        """列出店铺最近的历史时间点（最新的在前面）"""
+        timestamps = self.redis.zrevrange(self._index_key(store_name), 0, limit - 1)
+        keyframes = {
+            int(decode_value(ts))
+            for ts in self.redis.zrange(self._keyframes_key(store_name), 0, -1)
+        }
+        return [
+            {'timestamp': int(decode_value(ts)),
+             'type': 'keyframe' if int(decode_value(ts)) in keyframes else 'delta'}
+            for ts in timestamps
+        ]
+
+    def prune(self, store_name: str, now: int = None) -> int:
+        """清理超出保留期的历史，保证保留期内的时间点仍可还原"""
+        now = int(now or time.time())
+        cutoff = now - self.retention_days * 24 * 3600
+
+        # 保留期起点之前最近的关键帧之前的记录都不再需要
+        keyframe_ts = self._latest_score(self._keyframes_key(store_name), cutoff)
+        if keyframe_ts is None:
+            return 0
+
+        expired = [
+            int(decode_value(ts))
+            for ts in self.redis.zrangebyscore(self._index_key(store_name), '-inf', f"({keyframe_ts}")
+        ]
+        if not expired:
+            return 0
+
+        pipe = self.redis.pipeline()
+        for start in range(0, len(expired), 500):
+            batch = expired[start:start + 500]
+            pipe.unlink(*[self._record_key(store_name, ts) for ts in batch])
+            pipe.zrem(self._index_key(store_name), *[str(ts) for ts in batch])
+            pipe.zrem(self._keyframes_key(store_name), *[str(ts) for ts in batch])
+        pipe.execute()
+
+        self.logger.info(f"清理店铺历史: {store_name} - 删除 {len(expired)} 条")
+        return len(expired)
+
+    def prune_all(self) -> int:
+        """清理所有店铺超出保留期的历史"""
+        removed = 0
+        for store_name in self.redis.smembers(self.STORES_KEY):
+            store_name = decode_value(store_name)
+            try:
+                removed += self.prune(store_name)
+            except Exception as e:
+                self.logger.error(f"清理店铺历史时出错: {store_name} - {str(e)}")
+        return removed
@@ -15,9 +15,11 @@ from app.config import Config
 import logging.handlers
 from urllib.parse import urljoin
 from app.utils import is_valid_ebay_url
-from app.utils import json_dumps
+from app.utils import json_dumps, decode_value
 import subprocess
-from typing import Optional, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Tuple
 
 # 配置日志
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -665,11 +667,25 @@ class ImprovedEbayStoreScraper:
 
     def scrape_all_pages(self, url, max_pages=None):
         """爬取所有页面的商品信息"""
+        return self.scrape_pages_with_coverage(url, max_pages)[0]
+    
+    def scrape_pages_with_coverage(self, url, max_pages=None):
+        """爬取所有页面的商品信息，返回 (商品列表, 本次覆盖范围)"""
         self.logger.info(f"开始多页爬取eBay店铺: {url}")
         all_items = []
         page_num = 1
         current_url = url
         
+        # 记录本次覆盖的范围：成功解析的页码、店铺商品总数、是否已到最后一页
+        coverage = {
+            'pages': [],
+            'max_pages': max_pages,
+            'items': 0,
+            'total_results': None,
+            'reached_end': False
+        }
+        first_page_count = 0
+        
         # 确保URL中有正确的排序参数（最近上架优先）
         if '_sop=' not in current_url:
             separator = '&' if '?' in current_url else '?'
@@ -690,11 +706,32 @@ class ImprovedEbayStoreScraper:
             
             # 解析当前页面的商品信息
             items = self.parse_items_from_html(html_content)
+            if items and page_num > 1:
+                scraped_ids = {item.get('id') for item in all_items}
+                if all(item.get('id') in scraped_ids for item in items):
+                    # 超过最后一页时eBay会重复返回最后一页的商品
+                    self.logger.info(f"第 {page_num} 页与之前的商品重复，已到最后一页")
+                    coverage['reached_end'] = True
+                    break
+            
             if items:
                 all_items.extend(items)
+                coverage['pages'].append(page_num)
                 self.logger.info(f"第 {page_num} 页爬取成功，获取到 {len(items)} 个商品")
             else:
-                self.logger.warning(f"第 {page_num} 页没有找到商品")
+                # 没有商品可能是超过了最后一页，也可能是页面被拦截，不能确认已到最后一页
+                self.logger.warning(f"第 {page_num} 页没有找到商品，停止翻页")
+                break
+            
+            if page_num == 1:
+                first_page_count = len(items)
+                coverage['total_results'] = self._extract_total_results(html_content)
+            
+            # 已抓到店铺全部商品，或本页商品数少于第一页（最后一页），不再翻页
+            if (coverage['total_results'] and len(all_items) >= coverage['total_results']) or \
+                    (page_num > 1 and len(items) < first_page_count):
+                coverage['reached_end'] = True
+                break
             
             # 检查是否达到最大页数限制
             if max_pages and page_num >= max_pages:
@@ -760,8 +797,32 @@ class ImprovedEbayStoreScraper:
             # 添加延迟，避免频繁请求
             time.sleep(1)
         
-        self.logger.info(f"多页爬取完成，共爬取 {page_num-1} 页，获取 {len(all_items)} 个商品")
-        return all_items
+        coverage['items'] = len(all_items)
+        self.logger.info(f"多页爬取完成，共爬取 {len(coverage['pages'])} 页，获取 {len(all_items)} 个商品"
+                         f"{'（已到最后一页）' if coverage['reached_end'] else ''}")
+        return all_items, coverage
+    
+    def _extract_total_results(self, html_content):
+        """从搜索结果数量标题（如 "1,234 results"）中提取店铺商品总数，无法明确识别时返回 None
+
+        只采用唯一的结果数量标题中唯一的数字；"10,000+" 这样的下限或 "1-48 of 1,234" 这样有多个数字的标题
+        都不采用，避免误判总数后提前停止翻页。
+        """
+        try:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            headings = soup.select('.srp-controls__count-heading')
+            if len(headings) != 1:
+                return None
+            text = headings[0].get_text(' ', strip=True)
+            numbers = re.findall(r'\d[\d,]*\+?', text)
+            if len(numbers) != 1 or numbers[0].endswith('+'):
+                return None
+            if not re.search(r'results?|Results?|个结果|件商品', text):
+                return None
+            return int(numbers[0].replace(',', '')) or None
+        except Exception as e:
+            self.logger.warning(f"解析商品总数失败: {str(e)}")
+            return None
 
     def validate_url(self, url):
         """验证是否为有效的eBay URL"""
@@ -828,7 +889,8 @@ class ImprovedEbayStoreScraper:
         result = {
             'new_listings': [],
             'price_changes': [],
-            'removed_listings': []
+            'removed_listings': [],
+            'reappeared_listings': []  # 之前出现过、上次未抓到又重新出现的商品（不视为新上架）
         }
         
         try:
@@ -843,34 +905,45 @@ class ImprovedEbayStoreScraper:
                     self.logger.warning(f"解析之前的数据失败，将视为首次爬取")
             
             # 爬取当前数据
-            current_items = self.scrape_all_pages(store_url, max_pages=3)
+            current_items, coverage = self.scrape_pages_with_coverage(store_url, max_pages=3)
             if not current_items:
                 self.logger.error(f"未能获取到任何商品，可能URL有误或店铺暂时无法访问")
                 return result
             
             self.logger.info(f"成功获取 {len(current_items)} 个商品")
+            update_time = int(time.time())
             
-            # 保存当前数据
-            self.redis.set(f"store:{store_name}:items", json_dumps(current_items))
-            self.redis.set(f"store:{store_name}:last_update", int(time.time()))
-            
-            # 如果没有之前的数据，则所有商品都视为新上架
+            # 如果没有之前的数据（首次爬取或商品数据丢失），用已见商品登记表区分新上架和之前出现过的商品，
+            # 只有店铺还没有登记表时所有商品才视为新上架
             if not previous_items:
-                self.logger.info(f"没有找到之前的数据，将所有 {len(current_items)} 个商品视为新上架")
-                result['new_listings'] = current_items
+                self.save_store_items(store_name, current_items, previous_items, update_time, coverage)
+                result['new_listings'], result['reappeared_listings'] = self.classify_appeared_items(
+                    store_name, current_items
+                )
+                self.logger.info(f"没有找到之前的数据，{len(current_items)} 个商品中 "
+                                 f"{len(result['new_listings'])} 个视为新上架，"
+                                 f"{len(result['reappeared_listings'])} 个之前出现过")
+                self.record_seen_items(store_name, current_items, update_time)
+                self.publish_changes(store_name, result, update_time)
+                self.index_store_items(store_name, current_items, result['removed_listings'], current_items)
                 return result
             
             # 创建字典以便快速查找
             previous_items_dict = {item.get('id'): item for item in previous_items if item.get('id')}
             current_items_dict = {item.get('id'): item for item in current_items if item.get('id')}
             
-            # 检查新上架和价格变动的商品
+            # 上次结果中没有的商品：用已见商品登记表区分真正的新上架和重新出现的旧商品
+            appeared_items = [item for item_id, item in current_items_dict.items() if item_id not in previous_items_dict]
+            result['new_listings'], result['reappeared_listings'] = self.classify_appeared_items(
+                store_name, appeared_items, previous_items
+            )
+            for new_item in result['new_listings']:
+                self.logger.info(f"发现新上架商品: {new_item.get('title')}")
+            self.record_seen_items(store_name, current_items, update_time)
+            
+            # 检查价格变动的商品
             for item_id, current_item in current_items_dict.items():
-                if item_id not in previous_items_dict:
-                    # 新上架商品
-                    result['new_listings'].append(current_item)
-                    self.logger.info(f"发现新上架商品: {current_item.get('title')}")
-                else:
+                if item_id in previous_items_dict:
                     # 检查价格是否变动
                     previous_item = previous_items_dict[item_id]
                     prev_price = previous_item.get('price')
@@ -886,25 +959,59 @@ class ImprovedEbayStoreScraper:
                         result['price_changes'].append(price_change)
                         self.logger.info(f"发现价格变动商品: {current_item.get('title')} - 从 {prev_price} 变为 {curr_price}")
             
-            # 检查下架的商品
-            for item_id, previous_item in previous_items_dict.items():
-                if item_id not in current_items_dict:
-                    # 下架商品
-                    result['removed_listings'].append(previous_item)
-                    self.logger.info(f"发现下架商品: {previous_item.get('title')}")
+            # 新上架商品的关键词匹配（首次爬取不匹配，避免整店商品都触发提醒）
+            if result['new_listings']:
+                try:
+                    from app.watchlist import Watchlist
+                    Watchlist(self.redis).process_new_listings(store_name, result['new_listings'])
+                except Exception as e:
+                    self.logger.warning(f"关键词匹配失败: {store_name} - {str(e)}")
+            
+            # 只对发生价格变动的商品评估价格提醒规则
+            if result['price_changes']:
+                try:
+                    from app.price_rules import PriceRuleEngine
+                    PriceRuleEngine(self.redis).process_price_changes(store_name, result['price_changes'])
+                except Exception as e:
+                    self.logger.warning(f"价格提醒规则评估失败: {store_name} - {str(e)}")
+            
+            # 检查下架的商品：只有在本次抓取覆盖范围内消失的商品才视为下架，
+            # 范围之外的商品保留为待确认，按批抽查商品页面确认是否已下架
+            removed_items, unconfirmed_items = self.split_missing_items(previous_items, current_items_dict, coverage)
+            confirmed_removed, unconfirmed_items = self.confirm_missing_items(store_name, unconfirmed_items)
+            result['removed_listings'] = removed_items + confirmed_removed
+            for removed_item in result['removed_listings']:
+                self.logger.info(f"发现下架商品: {removed_item.get('title')}")
+            
+            # 保存当前数据（待确认的商品排在本次抓到的商品之后）；待确认的商品本次没有被看到，
+            # 标记后对比价格解析不再把它们的旧价格当作在售商品的最新价格
+            unconfirmed_items = [dict(item, unconfirmed=True) for item in unconfirmed_items]
+            stored_items = current_items + unconfirmed_items
+            coverage['unconfirmed_items'] = len(unconfirmed_items)
+            self.save_store_items(store_name, stored_items, previous_items, update_time, coverage)
             
             # 更新统计信息
             stats = {
-                'total_items': len(current_items),
+                'total_items': len(stored_items),
+                'scraped_items': len(current_items),
+                'unconfirmed_items': len(unconfirmed_items),
                 'new_listings': len(result['new_listings']),
                 'price_changes': len(result['price_changes']),
                 'removed_listings': len(result['removed_listings']),
+                'reappeared_listings': len(result['reappeared_listings']),
                 'last_update': int(time.time())
             }
             self.redis.set(f"store:{store_name}:stats", json_dumps(stats))
             
+            self.publish_changes(store_name, result, update_time)
+            # 重新出现的商品可能已在上次被移出索引，与新上架商品一起重新加入
+            self.index_store_items(store_name, stored_items, result['removed_listings'],
+                                   result['new_listings'] + result['reappeared_listings'])
+            
             self.logger.info(f"店铺 {store_name} 数据更新完成 - 新商品: {stats['new_listings']}, "
-                            f"价格变动: {stats['price_changes']}, 下架商品: {stats['removed_listings']}")
+                            f"重新出现: {stats['reappeared_listings']}, "
+                            f"价格变动: {stats['price_changes']}, 下架商品: {stats['removed_listings']}, "
+                            f"待确认: {stats['unconfirmed_items']}")
             
             return result
         
@@ -913,8 +1020,237 @@ class ImprovedEbayStoreScraper:
             # 返回空结果
             return result
     
-    def get_single_listing_info(self, listing_url: str, max_retries: int = 3) -> Optional[Dict]:
-        """获取单个eBay商品的价格和基本信息"""
+    def save_store_items(self, store_name, items, previous_items, update_time, coverage=None):
+        """保存店铺商品列表、更新时间和本次抓取的覆盖范围，并记录增量历史"""
+        self.redis.set(f"store:{store_name}:items", json_dumps(items))
+        self.redis.set(f"store:{store_name}:last_update", update_time)
+        if coverage is not None:
+            coverage['updated_at'] = update_time
+            if coverage.get('total_results'):
+                coverage['coverage_ratio'] = round(min(coverage.get('items', 0) / coverage['total_results'], 1.0), 4)
+            self.redis.set(f"store:{store_name}:coverage", json_dumps(coverage))
+        
+        # 记录增量历史，用于按时间点还原店铺状态
+        try:
+            from app.history import StoreHistory
+            StoreHistory(self.redis).record_update(store_name, items, previous_items, update_time)
+        except Exception as e:
+            self.logger.warning(f"记录店铺历史失败: {store_name} - {str(e)}")
+    
+    def split_missing_items(self, previous_items, current_items_dict, coverage):
+        """把本次没有抓到的商品分为覆盖范围内消失的（下架）和范围之外的（待确认），返回 (下架, 待确认)"""
+        missing = [item for item in previous_items if item.get('id') and item.get('id') not in current_items_dict]
+        if not missing or coverage.get('reached_end'):
+            # 已抓到最后一页，没抓到的商品都已下架
+            return missing, []
+        
+        # 店铺按最近上架排序，商品之间的先后顺序不变：上次排在本次仍抓到的最后一个商品之前的商品，
+        # 如果还在售就一定会出现在本次结果中
+        anchor = None
+        for index, item in enumerate(previous_items):
+            if item.get('id') in current_items_dict:
+                anchor = index
+        if anchor is None:
+            # 与上次结果没有重叠，无法确定覆盖范围
+            return [], missing
+        
+        removed, unconfirmed = [], []
+        for index, item in enumerate(previous_items):
+            if item.get('id') and item.get('id') not in current_items_dict:
+                (removed if index < anchor else unconfirmed).append(item)
+        return removed, unconfirmed
+    
+    def confirm_missing_items(self, store_name, unconfirmed_items):
+        """抽查一批待确认商品的商品页面，返回 (确认下架, 仍待确认)
+
+        只有商品页面显示已售出/已结束，或页面已不存在时才确认下架；抓取失败的商品继续待确认。
+        抽查与价格对比共用并发数和请求间隔配置，避免逐个抓取拖慢店铺更新。
+        """
+        if not unconfirmed_items or Config.REMOVAL_CONFIRM_BATCH_SIZE <= 0:
+            return [], list(unconfirmed_items)
+        
+        # 按最近一次被看到的时间排序，最久没看到的优先抽查
+        last_seen = {}
+        if Config.SEEN_REGISTRY_ENABLED:
+            try:
+                from app.seen_registry import SeenRegistry
+                entries = SeenRegistry(self.redis).lookup(store_name, [item.get('id') for item in unconfirmed_items])
+                last_seen = {item_id: entry.get('last_seen') or 0 for item_id, entry in entries.items() if entry}
+            except Exception as e:
+                self.logger.warning(f"查询已见商品登记表失败: {store_name} - {str(e)}")
+        
+        batch = sorted(
+            (item for item in unconfirmed_items if item.get('url')),
+            key=lambda item: last_seen.get(item.get('id'), 0)
+        )[:Config.REMOVAL_CONFIRM_BATCH_SIZE]
+        if not batch:
+            return [], list(unconfirmed_items)
+        
+        from app.comparison_executor import RequestThrottle
+        throttle = RequestThrottle(Config.COMPARISON_REQUEST_INTERVAL)
+        
+        def check(item):
+            throttle.wait()
+            try:
+                return self.check_listing_removed(item['url'])
+            except Exception as e:
+                self.logger.warning(f"抽查商品页面失败: {item.get('id')} - {str(e)}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=min(Config.COMPARISON_MAX_WORKERS, len(batch))) as pool:
+            outcomes = dict(zip((item.get('id') for item in batch), pool.map(check, batch)))
+        
+        removed = [item for item in batch if outcomes.get(item.get('id')) is True]
+        confirmed_active = [item for item in batch if outcomes.get(item.get('id')) is False]
+        removed_ids = {item.get('id') for item in removed}
+        remaining = [item for item in unconfirmed_items if item.get('id') not in removed_ids]
+        
+        if confirmed_active:
+            # 确认仍在售的商品更新最近出现时间，下次抽查其他商品
+            self.record_seen_items(store_name, confirmed_active)
+        self.logger.info(f"抽查待确认商品: {store_name} - 抽查 {len(batch)} 个, "
+                         f"确认在售 {len(confirmed_active)} 个, 下架 {len(removed)} 个, 仍待确认 {len(remaining)} 个")
+        return removed, remaining
+    
+    def check_listing_removed(self, listing_url: str) -> Optional[bool]:
+        """抓取商品页面判断商品是否已下架：已售出/已结束或页面不存在返回 True，在售返回 False，无法判断返回 None"""
+        html_content, page_status = self._get_single_listing_page(listing_url)
+        if page_status == 'not_found':
+            return True
+        if not html_content:
+            return None
+        item_info = self._parse_single_listing(html_content, listing_url)
+        if not item_info:
+            return None
+        return item_info.get('status') in ('sold', 'ended')
+    
+    def classify_appeared_items(self, store_name, appeared_items, previous_items=None):
+        """把上次结果中没有的商品分为真正的新上架和之前出现过的商品，返回 (新上架, 重新出现)"""
+        if not appeared_items or not Config.SEEN_REGISTRY_ENABLED:
+            return appeared_items, []
+        try:
+            from app.seen_registry import SeenRegistry
+            registry = SeenRegistry(self.redis)
+            if previous_items and not registry.is_initialized(store_name):
+                # 启用登记表之前已在监控的店铺，先登记上次的商品
+                registry.record(store_name, previous_items)
+            return registry.split_new(store_name, appeared_items)
+        except Exception as e:
+            self.logger.warning(f"查询已见商品登记表失败，按新上架处理: {store_name} - {str(e)}")
+            return appeared_items, []
+    
+    def record_seen_items(self, store_name, items, update_time=None):
+        """登记本次抓取到的商品"""
+        if not Config.SEEN_REGISTRY_ENABLED:
+            return
+        try:
+            from app.seen_registry import SeenRegistry
+            SeenRegistry(self.redis).record(store_name, items, update_time)
+        except Exception as e:
+            self.logger.warning(f"登记已见商品失败: {store_name} - {str(e)}")
+    
+    def publish_changes(self, store_name, changes, update_time=None):
+        """把本次检测到的变动写入事件流，供下游消费者回放和增量读取"""
+        if not Config.CHANGE_STREAM_ENABLED:
+            return
+        try:
+            from app.change_stream import ChangeStream
+            ChangeStream(self.redis).publish(store_name, changes, update_time)
+        except Exception as e:
+            self.logger.warning(f"写入变动事件流失败: {store_name} - {str(e)}")
+    
+    def index_store_items(self, store_name, current_items, removed_items=None, new_items=None):
+        """根据最新商品列表和差异结果更新店铺相关的索引"""
+        try:
+            from app.item_index import ItemStoreIndex
+            ItemStoreIndex(self.redis).update_store(store_name, current_items, removed_items)
+        except Exception as e:
+            self.logger.warning(f"更新商品店铺索引失败: {store_name} - {str(e)}")
+        
+        try:
+            from app.item_query import ItemQueryIndex
+            ItemQueryIndex(self.redis).update_store(store_name, current_items)
+        except Exception as e:
+            self.logger.warning(f"更新商品查询索引失败: {store_name} - {str(e)}")
+        
+        try:
+            from app.search import TitleSearchIndex
+            TitleSearchIndex(self.redis).update_store(store_name, current_items, new_items, removed_items)
+        except Exception as e:
+            self.logger.warning(f"更新标题搜索索引失败: {store_name} - {str(e)}")
+    
+    def get_single_listing_info(self, listing_url: str, max_retries: int = 3,
+                                request_delay: bool = True, bypass_cache: bool = False) -> Optional[Dict]:
+        """获取单个eBay商品的价格和基本信息（优先使用缓存，bypass_cache=True 时强制抓取页面）
+        
+        缓存在 LISTING_CACHE_TTL 内直接返回；过期但仍在 LISTING_CACHE_STALE_TTL 内时先返回旧结果，
+        同时在后台线程重新抓取。request_delay=False 时由调用方负责请求间隔，仅重试前等待。
+        """
+        item_id = self._extract_item_id_from_url(listing_url) if listing_url else None
+        
+        if not bypass_cache and item_id:
+            cached = self._get_cached_listing(item_id)
+            if cached:
+                age = int(time.time()) - cached.get('cached_at', 0)
+                if age <= Config.LISTING_CACHE_TTL:
+                    self.logger.info(f"使用商品信息缓存: {item_id} ({age}秒前)")
+                    return cached['info']
+                self.logger.info(f"商品信息缓存已过期 ({age}秒前)，返回旧结果并后台刷新: {item_id}")
+                self._revalidate_listing_async(listing_url, item_id, max_retries)
+                return cached['info']
+        
+        item_info = self._fetch_single_listing_info(listing_url, max_retries, request_delay)
+        if item_info and item_id:
+            self._cache_listing(item_id, item_info)
+        return item_info
+    
+    def _get_cached_listing(self, item_id: str) -> Optional[Dict]:
+        """读取商品信息缓存"""
+        if not self.redis:
+            return None
+        try:
+            cached = self.redis.get(f"listing_cache:{item_id}")
+            return json.loads(decode_value(cached)) if cached else None
+        except Exception as e:
+            self.logger.warning(f"读取商品信息缓存失败: {item_id} - {str(e)}")
+            return None
+    
+    def _cache_listing(self, item_id: str, item_info: Dict):
+        """写入商品信息缓存（Redis过期时间覆盖新鲜期和可用旧结果期）"""
+        if not self.redis:
+            return
+        try:
+            self.redis.set(
+                f"listing_cache:{item_id}",
+                json_dumps({'cached_at': int(time.time()), 'info': item_info}),
+                ex=Config.LISTING_CACHE_TTL + Config.LISTING_CACHE_STALE_TTL
+            )
+        except Exception as e:
+            self.logger.warning(f"写入商品信息缓存失败: {item_id} - {str(e)}")
+    
+    def _revalidate_listing_async(self, listing_url: str, item_id: str, max_retries: int):
+        """后台重新抓取商品信息并刷新缓存（同一商品同时只有一个刷新任务）"""
+        lock_key = f"listing_cache:{item_id}:refreshing"
+        try:
+            if not self.redis.set(lock_key, 1, nx=True, ex=120):
+                return
+        except Exception as e:
+            self.logger.warning(f"获取缓存刷新锁失败: {item_id} - {str(e)}")
+            return
+        
+        def revalidate():
+            try:
+                item_info = self._fetch_single_listing_info(listing_url, max_retries, True)
+                if item_info:
+                    self._cache_listing(item_id, item_info)
+            finally:
+                self.redis.delete(lock_key)
+        
+        threading.Thread(target=revalidate, daemon=True).start()
+    
+    def _fetch_single_listing_info(self, listing_url: str, max_retries: int = 3,
+                                   request_delay: bool = True) -> Optional[Dict]:
+        """抓取并解析单个商品页面"""
         self.logger.info(f"开始获取单个商品信息: {listing_url}")
         
         if not self.validate_url(listing_url):
@@ -927,7 +1263,8 @@ class ImprovedEbayStoreScraper:
                 delay = random.uniform(3.0, 8.0)
                 if attempt > 0:
                     self.logger.info(f"重试第 {attempt} 次，等待 {delay:.2f} 秒...")
-                time.sleep(delay)
+                if attempt > 0 or request_delay:
+                    time.sleep(delay)
                 
                 # 获取页面内容
                 html_content = self._get_single_listing_html(listing_url)
@@ -951,6 +1288,10 @@ class ImprovedEbayStoreScraper:
     
     def _get_single_listing_html(self, listing_url: str) -> Optional[str]:
         """获取单个商品页面的HTML内容"""
+        return self._get_single_listing_page(listing_url)[0]
+    
+    def _get_single_listing_page(self, listing_url: str) -> Tuple[Optional[str], str]:
+        """获取单个商品页面，返回 (HTML内容, 状态)，状态为 ok / not_found（商品页面不存在）/ error"""
         try:
             # 使用curl获取页面内容
             headers = {
@@ -976,26 +1317,26 @@ class ImprovedEbayStoreScraper:
             
             if result.returncode != 0:
                 self.logger.error(f"curl命令执行失败: {result.stderr}")
-                return None
+                return None, 'error'
             
             html_content = result.stdout
             if not html_content or len(html_content) < 1000:
                 self.logger.error("获取的HTML内容过短或为空")
-                return None
+                return None, 'error'
             
             # 检查是否被重定向到错误页面
             if "Page not found" in html_content or "Item not found" in html_content:
                 self.logger.error("商品页面不存在或已下架")
-                return None
+                return None, 'not_found'
                 
-            return html_content
+            return html_content, 'ok'
             
         except subprocess.TimeoutExpired:
             self.logger.error("获取页面内容超时")
-            return None
+            return None, 'error'
         except Exception as e:
             self.logger.error(f"获取单个商品页面HTML失败: {str(e)}")
-            return None
+            return None, 'error'
     
     def _parse_single_listing(self, html_content: str, listing_url: str) -> Optional[Dict]:
         """解析单个商品页面的信息"""
@@ -0,0 +1,94 @@
+# 商品到店铺的反向索引模块
+
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+from app.utils import decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class ItemStoreIndex:
+    """商品ID -> 店铺名称的反向索引，使商品查询不再需要遍历所有店铺"""
+
+    # Redis数据结构设计
+    # ==================
+    # 反向索引：item:store_index (HASH, field=商品ID, value=店铺名称)
+    # 店铺商品集合：store:{store_name}:item_ids (SET, 用于删除店铺时清理索引)
+
+    INDEX_KEY = "item:store_index"
+
+    def __init__(self, redis_client):
+        """初始化反向索引"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _store_ids_key(self, store_name: str) -> str:
+        return f"store:{store_name}:item_ids"
+
+    def update_store(self, store_name: str, current_items: List[Dict],
+                     removed_items: Iterable[Dict] = None):
+        """根据差异结果更新索引：登记当前商品，清理下架商品"""
+        current_ids = [item.get('id') for item in current_items if item.get('id')]
+        removed_ids = [item.get('id') for item in (removed_items or []) if item.get('id')]
+
+        pipe = self.redis.pipeline()
+        if current_ids:
+            pipe.hset(self.INDEX_KEY, mapping={item_id: store_name for item_id in current_ids})
+            pipe.sadd(self._store_ids_key(store_name), *current_ids)
+        if removed_ids:
+            pipe.srem(self._store_ids_key(store_name), *removed_ids)
+        pipe.execute()
+
+        if removed_ids:
+            self._remove_ids(store_name, removed_ids)
+
+    def _remove_ids(self, store_name: str, item_ids: List[str]):
+        """从索引中移除仍指向该店铺的商品ID"""
+        for start in range(0, len(item_ids), 1000):
+            batch = item_ids[start:start + 1000]
+            owners = self.redis.hmget(self.INDEX_KEY, batch)
+            owned = [
+                item_id for item_id, owner in zip(batch, owners)
+                if decode_value(owner) == store_name
+            ]
+            if owned:
+                self.redis.hdel(self.INDEX_KEY, *owned)
+
+    def lookup_store(self, item_id: str) -> Optional[str]:
+        """查询商品所属的店铺名称"""
+        return decode_value(self.redis.hget(self.INDEX_KEY, item_id))
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        """通过索引定位店铺并获取商品数据"""
+        store_name = self.lookup_store(item_id)
+        if not store_name:
+            return None
+
+        item_json = self.redis.hget(f"store:{store_name}:item_data", item_id)
+        if not item_json:
+            item_json = self.redis.get(f"store:{store_name}:item:{item_id}")
+        if item_json:
+            item = json.loads(decode_value(item_json))
+            item.setdefault('store_name', store_name)
+            return item
+
+        # 没有单独的商品键时，只在所属店铺的商品列表中查找
+        items_json = self.redis.get(f"store:{store_name}:items")
+        if not items_json:
+            return None
+
+        for item in json.loads(decode_value(items_json)):
+            if item.get('id') == item_id:
+                item['store_name'] = store_name
+                return item
+        return None
+
+    def remove_store(self, store_name: str):
+        """删除店铺时清理该店铺的所有索引项"""
+        item_ids = [decode_value(item_id) for item_id in self.redis.smembers(self._store_ids_key(store_name))]
+        if item_ids:
+            self._remove_ids(store_name, item_ids)
+        self.redis.delete(self._store_ids_key(store_name))
+        self.logger.info(f"已清理店铺 {store_name} 的商品索引 ({len(item_ids)} 个)")
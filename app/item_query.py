@@ -0,0 +1,337 @@
+# 店铺商品查询索引模块
+
+import json
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.config import Config
+from redis.exceptions import WatchError
+from app.utils import json_dumps, decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 支持的布尔过滤条件（对应商品字段）
+FLAG_FILTERS = ('is_new_listing', 'is_yesterday_listing', 'free_returns')
+
+# 支持的排序方式 -> 索引名称
+SORT_INDEXES = {
+    'default': 'order',
+    'price': 'price',
+    'listing_date': 'listed'
+}
+
+
+class ItemQueryIndex:
+    """店铺商品查询索引 - 写入时维护有序集合和集合索引，分页查询只读取一页数据"""
+
+    # Redis数据结构设计
+    # ==================
+    # 商品数据：store:{store_name}:item_data (HASH, field=商品ID, value=商品JSON)
+    # 排序索引：store:{store_name}:idx:order   (ZSET, score=爬取顺序)
+    #           store:{store_name}:idx:price   (ZSET, score=价格)
+    #           store:{store_name}:idx:listed  (ZSET, score=上架时间戳)
+    # 过滤索引：store:{store_name}:idx:is_new_listing / is_yesterday_listing / free_returns (SET)
+    #           store:{store_name}:idx:format:{buy_format} (SET)
+    #           store:{store_name}:idx:formats (SET, 所有购买方式)
+    # 索引版本：store:{store_name}:idx:version (每次更新有变化时递增，用于失效查询缓存)
+    # 查询缓存：store:{store_name}:query:{signature} (ZSET, 短期过期)
+
+    def __init__(self, redis_client):
+        """初始化商品查询索引"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _data_key(self, store_name: str) -> str:
+        return f"store:{store_name}:item_data"
+
+    def _idx_key(self, store_name: str, name: str) -> str:
+        return f"store:{store_name}:idx:{name}"
+
+    @staticmethod
+    def _listing_timestamp(item: Dict) -> float:
+        """获取商品上架时间戳，没有解析出日期时使用爬取时间"""
+        parsed_date = item.get('parsed_date')
+        if isinstance(parsed_date, str):
+            try:
+                parsed_date = datetime.fromisoformat(parsed_date)
+            except ValueError:
+                parsed_date = None
+        if isinstance(parsed_date, datetime):
+            return parsed_date.timestamp()
+        return float(item.get('timestamp') or 0)
+
+    @staticmethod
+    def _content(item: Dict) -> Dict:
+        """商品内容（不含每次爬取都会变化的爬取时间）"""
+        return {key: value for key, value in item.items() if key != 'timestamp'}
+
+    def update_store(self, store_name: str, items: List[Dict]):
+        """根据最新商品列表增量更新店铺索引：与已保存的商品数据比较，只写入新增、变化和删除的部分
+
+        商品的爬取时间保留首次写入时的值（只有爬取时间变化的商品不重写），
+        没有解析出上架日期的商品按首次出现的时间排序。
+        读取旧数据期间索引被其他进程更新时重试。
+        """
+        new_items = {}
+        order = {}
+        for position, item in enumerate(json.loads(json_dumps(items))):
+            item_id = item.get('id')
+            if not item_id or item_id in new_items:
+                continue
+            new_items[item_id] = item
+            order[item_id] = position
+
+        version_key = self._idx_key(store_name, 'version')
+        for _ in range(3):
+            try:
+                with self.redis.pipeline() as pipe:
+                    pipe.watch(version_key)
+                    old_items = {
+                        decode_value(item_id): json.loads(decode_value(raw))
+                        for item_id, raw in pipe.hgetall(self._data_key(store_name)).items()
+                    }
+                    old_order = {
+                        decode_value(item_id): score
+                        for item_id, score in pipe.zrange(self._idx_key(store_name, 'order'), 0, -1, withscores=True)
+                    }
+                    old_formats = {decode_value(f) for f in pipe.smembers(self._idx_key(store_name, 'formats'))}
+                    changes = self._write_changes(pipe, store_name, new_items, order,
+                                                  old_items, old_order, old_formats)
+                break
+            except WatchError:
+                self.logger.info(f"店铺商品索引被并发更新，重试: {store_name}")
+        else:
+            raise RuntimeError(f"店铺商品索引更新冲突: {store_name}")
+
+        self.logger.info(
+            f"更新店铺商品索引: {store_name} ({len(new_items)} 个商品，"
+            f"写入 {changes['changed']}，删除 {changes['removed']}，调整顺序 {changes['moved']})"
+        )
+        return changes
+
+    def _write_changes(self, pipe, store_name: str, new_items: Dict, order: Dict,
+                       old_items: Dict, old_order: Dict, old_formats: set) -> Dict:
+        """在事务中写入与旧数据的差异，没有差异时不写入也不递增索引版本"""
+        removed = [item_id for item_id in old_items if item_id not in new_items]
+        changed = [
+            item_id for item_id, item in new_items.items()
+            if item_id not in old_items or self._content(old_items[item_id]) != self._content(item)
+        ]
+        moved = {item_id: position for item_id, position in order.items() if old_order.get(item_id) != position}
+        new_formats = {item.get('buy_format') for item in new_items.values() if item.get('buy_format')}
+        changes = {'changed': len(changed), 'removed': len(removed), 'moved': len(moved)}
+
+        pipe.multi()
+        if not (removed or changed or moved or new_formats != old_formats):
+            pipe.execute()
+            return changes
+
+        for start in range(0, len(removed), 1000):
+            batch = removed[start:start + 1000]
+            pipe.hdel(self._data_key(store_name), *batch)
+            for name in ('order', 'price', 'listed'):
+                pipe.zrem(self._idx_key(store_name, name), *batch)
+            for flag in FLAG_FILTERS:
+                pipe.srem(self._idx_key(store_name, flag), *batch)
+        for item_id in removed:
+            buy_format = old_items[item_id].get('buy_format')
+            if buy_format:
+                pipe.srem(self._idx_key(store_name, f"format:{buy_format}"), item_id)
+
+        data = {}
+        prices = {}
+        listed = {}
+        for item_id in changed:
+            item = new_items[item_id]
+            old_item = old_items.get(item_id, {})
+            # 已保存过的商品保留首次写入时的爬取时间，上架时间排序不随内容变化而跳动
+            if old_item.get('timestamp'):
+                item['timestamp'] = old_item['timestamp']
+            data[item_id] = json_dumps(item)
+            prices[item_id] = float(item.get('price') or 0)
+            listed[item_id] = self._listing_timestamp(item)
+            for flag in FLAG_FILTERS:
+                if item.get(flag):
+                    pipe.sadd(self._idx_key(store_name, flag), item_id)
+                elif old_item.get(flag):
+                    pipe.srem(self._idx_key(store_name, flag), item_id)
+            buy_format = item.get('buy_format')
+            old_format = old_item.get('buy_format')
+            if old_format and old_format != buy_format:
+                pipe.srem(self._idx_key(store_name, f"format:{old_format}"), item_id)
+            if buy_format:
+                pipe.sadd(self._idx_key(store_name, f"format:{buy_format}"), item_id)
+
+        data_list = list(data.items())
+        for start in range(0, len(data_list), 1000):
+            pipe.hset(self._data_key(store_name), mapping=dict(data_list[start:start + 1000]))
+        for name, values in (('order', moved), ('price', prices), ('listed', listed)):
+            items_list = list(values.items())
+            for start in range(0, len(items_list), 1000):
+                pipe.zadd(self._idx_key(store_name, name), dict(items_list[start:start + 1000]))
+
+        # 购买方式列表；不再出现的购买方式索引需要删除
+        if new_formats - old_formats:
+            pipe.sadd(self._idx_key(store_name, 'formats'), *(new_formats - old_formats))
+        stale_formats = old_formats - new_formats
+        if stale_formats:
+            pipe.srem(self._idx_key(store_name, 'formats'), *stale_formats)
+            pipe.unlink(*[self._idx_key(store_name, f"format:{f}") for f in stale_formats])
+
+        pipe.incr(self._idx_key(store_name, 'version'))
+        pipe.execute()
+        return changes
+
+    def count_items(self, store_name: str) -> int:
+        """获取店铺已索引的商品数量"""
+        return self.redis.hlen(self._data_key(store_name))
+
+    def get_item(self, store_name: str, item_id: str) -> Optional[Dict]:
+        """获取店铺中的单个商品"""
+        item_json = self.redis.hget(self._data_key(store_name), item_id)
+        return json.loads(decode_value(item_json)) if item_json else None
+
+    def _load_items(self, store_name: str, item_ids: List[str]) -> List[Dict]:
+        """批量获取一页商品数据"""
+        if not item_ids:
+            return []
+        raw_items = self.redis.hmget(self._data_key(store_name), item_ids)
+        return [json.loads(decode_value(raw)) for raw in raw_items if raw]
+
+    def get_page(self, store_name: str, page: int = 1, per_page: int = 20) -> Dict:
+        """按爬取顺序获取指定页的商品"""
+        start = max(page - 1, 0) * per_page
+        item_ids = [
+            decode_value(item_id)
+            for item_id in self.redis.zrange(self._idx_key(store_name, 'order'), start, start + per_page - 1)
+        ]
+        return {
+            'items': self._load_items(store_name, item_ids),
+            'total': self.redis.zcard(self._idx_key(store_name, 'order'))
+        }
+
+    @staticmethod
+    def encode_cursor(score: float, skip: int) -> str:
+        """编码分页游标（最后返回的商品分数，以及该分数下已返回的商品数）"""
+        raw = json.dumps([score, skip]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[Tuple[float, int]]:
+        """解码分页游标，无效时返回None"""
+        try:
+            score, skip = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if not isinstance(skip, int) or isinstance(skip, bool) or skip < 0:
+                return None
+            return float(score), skip
+        except Exception:
+            return None
+
+    def _resolve_query_key(self, store_name: str, sort_key: str, filters: Dict) -> Tuple[str, Optional[float], Optional[float]]:
+        """确定分页使用的有序集合以及分数范围
+
+        没有集合过滤条件时直接在排序索引上分页；否则在Redis端求交集并短期缓存。
+        """
+        min_price = filters.get('min_price')
+        max_price = filters.get('max_price')
+        has_price_range = min_price is not None or max_price is not None
+
+        set_keys = [self._idx_key(store_name, flag) for flag in FLAG_FILTERS if filters.get(flag)]
+        if filters.get('buy_format'):
+            set_keys.append(self._idx_key(store_name, f"format:{filters['buy_format']}"))
+
+        sort_index = self._idx_key(store_name, SORT_INDEXES[sort_key])
+
+        # 按价格排序时价格范围就是分数范围
+        if not set_keys and (not has_price_range or sort_key == 'price'):
+            return sort_index, min_price, max_price
+
+        version = decode_value(self.redis.get(self._idx_key(store_name, 'version'))) or '0'
+        signature = hashlib.sha1(json.dumps(
+            [version, sort_key, sorted(set_keys), min_price, max_price], sort_keys=True
+        ).encode('utf-8')).hexdigest()[:16]
+        query_key = f"store:{store_name}:query:{signature}"
+
+        if not self.redis.exists(query_key):
+            pipe = self.redis.pipeline()
+            if has_price_range and sort_key != 'price':
+                # 先按价格范围筛选，再与排序索引求交集
+                price_key = f"{query_key}:price"
+                price_weights = {self._idx_key(store_name, 'price'): 1}
+                price_weights.update({key: 0 for key in set_keys})
+                pipe.zinterstore(price_key, price_weights)
+                if min_price is not None:
+                    pipe.zremrangebyscore(price_key, '-inf', f"({min_price}")
+                if max_price is not None:
+                    pipe.zremrangebyscore(price_key, f"({max_price}", '+inf')
+                pipe.zinterstore(query_key, {sort_index: 1, price_key: 0})
+                pipe.unlink(price_key)
+            else:
+                weights = {sort_index: 1}
+                weights.update({key: 0 for key in set_keys})
+                pipe.zinterstore(query_key, weights)
+            pipe.expire(query_key, Config.ITEM_QUERY_CACHE_TTL)
+            pipe.execute()
+
+        if sort_key == 'price':
+            return query_key, min_price, max_price
+        return query_key, None, None
+
+    def query_items(self, store_name: str, filters: Dict = None, sort: str = 'default',
+                    descending: bool = False, cursor: str = None, limit: int = 20) -> Dict:
+        """按条件查询店铺商品（游标分页）"""
+        filters = filters or {}
+        sort_key = sort if sort in SORT_INDEXES else 'default'
+        limit = max(1, min(limit, Config.ITEM_QUERY_MAX_LIMIT))
+
+        query_key, min_score, max_score = self._resolve_query_key(store_name, sort_key, filters)
+        lower = min_score if min_score is not None else '-inf'
+        upper = max_score if max_score is not None else '+inf'
+
+        # 从游标所在分数开始读取，直接跳过该分数下已返回的并列商品，每页只读取一次
+        position = self.decode_cursor(cursor) if cursor else None
+        skip = 0
+        if position:
+            if descending:
+                upper = position[0]
+            else:
+                lower = position[0]
+            skip = position[1]
+
+        if descending:
+            rows = self.redis.zrevrangebyscore(query_key, upper, lower, start=skip, num=limit + 1, withscores=True)
+        else:
+            rows = self.redis.zrangebyscore(query_key, lower, upper, start=skip, num=limit + 1, withscores=True)
+        rows = [(decode_value(member), score) for member, score in rows]
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more and rows:
+            last_score = rows[-1][1]
+            returned = sum(1 for _, score in rows if score == last_score)
+            if position and last_score == position[0]:
+                returned += skip
+            next_cursor = self.encode_cursor(last_score, returned)
+
+        if min_score is not None or max_score is not None:
+            total = self.redis.zcount(
+                query_key,
+                min_score if min_score is not None else '-inf',
+                max_score if max_score is not None else '+inf'
+            )
+        else:
+            total = self.redis.zcard(query_key)
+
+        return {
+            'items': self._load_items(store_name, [member for member, _ in rows]),
+            'next_cursor': next_cursor,
+            'total': total
+        }
+
+    def get_buy_formats(self, store_name: str) -> List[str]:
+        """获取店铺商品的所有购买方式"""
+        return sorted(decode_value(f) for f in self.redis.smembers(self._idx_key(store_name, 'formats')))
@@ -0,0 +1,109 @@
+# 商品价格解析模块（优先复用监控店铺的爬取数据）
+
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+from app.config import Config
+from app.item_index import ItemStoreIndex
+from app.utils import decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class ListingPriceResolver:
+    """商品价格解析器 - 商品出现在已监控店铺足够新的爬取结果中时直接使用，否则抓取商品页面"""
+
+    def __init__(self, redis_client, scraper, max_age: int = None):
+        """初始化解析器（max_age 为店铺数据的最大可用时长，单位秒）"""
+        self.redis = redis_client
+        self.scraper = scraper
+        self.index = ItemStoreIndex(redis_client)
+        self.max_age = Config.LISTING_RESOLVER_MAX_AGE if max_age is None else max_age
+        self.logger = logger
+
+    def extract_item_id(self, url: str) -> Optional[str]:
+        """从商品URL中提取商品ID"""
+        return self.scraper._extract_item_id_from_url(url)
+
+    @staticmethod
+    def _to_listing_info(item: Dict, url: str, store_name: str, last_update: int) -> Dict:
+        """将店铺商品数据转换为与 get_single_listing_info 相同的结构"""
+        return {
+            'id': item.get('id'),
+            'title': item.get('title'),
+            'url': url,
+            'current': item.get('price') or 0,
+            'currency': item.get('currency') or 'USD',
+            'status': 'active',  # 出现在店铺最新爬取结果中即为在售
+            'image_url': item.get('image_url'),
+            'seller_info': item.get('seller_info'),
+            'scraped_at': last_update,
+            'source': 'store_data',
+            'store_name': store_name
+        }
+
+    def resolve_from_store_many(self, listings: Dict[str, str]) -> Dict[str, Dict]:
+        """批量从店铺数据解析商品（listings 为 URL -> 商品ID），返回命中的 URL -> 商品信息"""
+        listings = {url: item_id for url, item_id in listings.items() if item_id}
+        if not listings:
+            return {}
+
+        urls = list(listings.keys())
+        stores = self.redis.hmget(ItemStoreIndex.INDEX_KEY, [listings[url] for url in urls])
+        located = [(url, decode_value(store)) for url, store in zip(urls, stores) if store]
+        if not located:
+            return {}
+
+        pipe = self.redis.pipeline(transaction=False)
+        for url, store_name in located:
+            pipe.get(f"store:{store_name}:last_update")
+            pipe.hget(f"store:{store_name}:item_data", listings[url])
+        responses = pipe.execute()
+
+        now = int(time.time())
+        resolved = {}
+        for index, (url, store_name) in enumerate(located):
+            last_update, raw_item = responses[index * 2], responses[index * 2 + 1]
+            if not last_update or not raw_item:
+                continue
+            last_update = int(decode_value(last_update))
+            if now - last_update > self.max_age:
+                continue
+            item = json.loads(decode_value(raw_item))
+            if item.get('unconfirmed'):
+                # 本次店铺爬取没有看到该商品（待确认是否下架），需要抓取商品页面
+                continue
+            resolved[url] = self._to_listing_info(item, url, store_name, last_update)
+        return resolved
+
+    def resolve(self, url: str, item_id: str = None, request_delay: bool = True,
+                bypass_cache: bool = False) -> Optional[Dict]:
+        """解析单个商品信息，店铺数据不可用时回退到抓取商品页面（bypass_cache=True 时直接抓取最新页面）"""
+        if bypass_cache:
+            return self.scraper.get_single_listing_info(url, request_delay=request_delay, bypass_cache=True)
+
+        item_id = item_id or self.extract_item_id(url)
+        try:
+            resolved = self.resolve_from_store_many({url: item_id})
+        except Exception as e:
+            self.logger.warning(f"从店铺数据解析商品失败: {url} - {str(e)}")
+            resolved = {}
+
+        if url in resolved:
+            self.logger.info(f"使用店铺 {resolved[url]['store_name']} 的爬取数据: {url}")
+            return resolved[url]
+        return self.scraper.get_single_listing_info(url, request_delay=request_delay)
+
+    def split_resolvable(self, urls: List[str]) -> Dict:
+        """将URL分为可由店铺数据解析的部分和需要抓取的部分"""
+        try:
+            resolved = self.resolve_from_store_many({url: self.extract_item_id(url) for url in urls})
+        except Exception as e:
+            self.logger.warning(f"批量从店铺数据解析商品失败: {str(e)}")
+            resolved = {}
+        return {
+            'resolved': resolved,
+            'to_fetch': [url for url in urls if url not in resolved]
+        }
@@ -6,14 +6,156 @@ from email.mime.text import MIMEText
 import logging
 from app.config import Config  # 只导入Config类
 import time
+import atexit
+import threading
+from app.email_templates import render_email, ItemBudget
+from app.notification_ledger import NotificationLedger
 
 # 配置日志
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class SMTPConnectionPool:
+    """SMTP连接池 - 复用已登录的连接发送多封邮件，连接失效时自动重连"""
+    
+    def __init__(self, server, port, username, password, use_ssl=False, use_tls=False,
+                 size=None, idle_timeout=None, max_messages=None):
+        """初始化连接池"""
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.use_tls = use_tls
+        self.size = size or Config.SMTP_POOL_SIZE
+        self.idle_timeout = Config.SMTP_POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.max_messages = max_messages or Config.SMTP_POOL_MAX_MESSAGES
+        self.logger = logging.getLogger('app.notification')
+        
+        self._idle = []  # 空闲连接: {'smtp', 'created_at', 'last_used', 'sent'}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.stats = {'connections_opened': 0, 'messages_sent': 0, 'reconnects': 0}
+    
+    def _connect(self):
+        """建立并登录一个新连接"""
+        if self.use_ssl:
+            self.logger.info(f"正在使用SSL连接到 {self.server}:{self.port}")
+            smtp = smtplib.SMTP_SSL(self.server, self.port, timeout=10)
+        else:
+            self.logger.info(f"正在使用TLS/无加密连接到 {self.server}:{self.port}")
+            smtp = smtplib.SMTP(self.server, self.port, timeout=10)
+            if self.use_tls:
+                smtp.starttls()
+        smtp.login(self.username, self.password)
+        self.stats['connections_opened'] += 1
+        now = time.time()
+        return {'smtp': smtp, 'created_at': now, 'last_used': now, 'sent': 0}
+    
+    def _close(self, conn):
+        """关闭连接（忽略关闭时的错误）"""
+        try:
+            conn['smtp'].quit()
+        except Exception:
+            try:
+                conn['smtp'].close()
+            except Exception:
+                pass
+    
+    def _acquire(self):
+        """获取一个可用连接：优先复用空闲连接，过期或达到发送上限时重建"""
+        self._slots.acquire()
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn and (time.time() - conn['last_used'] > self.idle_timeout or conn['sent'] >= self.max_messages):
+                self._close(conn)
+                conn = None
+            return conn or self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def _release(self, conn):
+        """归还连接"""
+        if conn is not None:
+            conn['last_used'] = time.time()
+            with self._lock:
+                self._idle.append(conn)
+        self._slots.release()
+    
+    @staticmethod
+    def _is_connection_error(error):
+        """判断是否为连接层面的错误（需要重建连接），收件人被拒等业务错误不算"""
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code == 421  # 服务器即将关闭连接
+        # smtplib.SMTPException 继承自 OSError，其余SMTP错误不视为连接错误
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    
+    def sendmail(self, sender, recipient, message):
+        """通过池中的连接发送邮件，连接已失效时重连并重试一次"""
+        conn = self._acquire()
+        try:
+            try:
+                result = conn['smtp'].sendmail(sender, recipient, message)
+            except Exception as e:
+                if not self._is_connection_error(e):
+                    raise
+                # 服务器关闭了空闲连接，换新连接重试
+                self.logger.warning(f"SMTP连接失效，重新连接后重试: {e}")
+                self._close(conn)
+                conn = None
+                conn = self._connect()
+                self.stats['reconnects'] += 1
+                result = conn['smtp'].sendmail(sender, recipient, message)
+            conn['sent'] += 1
+            self.stats['messages_sent'] += 1
+            return result
+        except Exception as e:
+            if conn is not None and self._is_connection_error(e):
+                self._close(conn)
+                conn = None
+            raise
+        finally:
+            self._release(conn)
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+
+# 按邮件服务器和账号共享的连接池
+_smtp_pools = {}
+_smtp_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(server, port, username, password, use_ssl=False, use_tls=False):
+    """获取（或创建）共享的SMTP连接池"""
+    key = (server, port, username, use_ssl, use_tls)
+    with _smtp_pools_lock:
+        pool = _smtp_pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(server, port, username, password, use_ssl=use_ssl, use_tls=use_tls)
+            _smtp_pools[key] = pool
+        return pool
+
+
+@atexit.register
+def close_smtp_pools():
+    """进程退出时关闭所有SMTP连接"""
+    with _smtp_pools_lock:
+        pools = list(_smtp_pools.values())
+    for pool in pools:
+        pool.close()
+
 class EmailNotifier:
-    def __init__(self):
-        """初始化邮件通知器"""
+    def __init__(self, redis_client=None):
+        """初始化邮件通知器（传入redis_client且启用发件箱时，邮件先入队再由后台任务投递）"""
         self.server = Config.MAIL_SERVER
         self.port = Config.MAIL_PORT
         self.use_tls = Config.MAIL_USE_TLS
@@ -22,6 +164,30 @@ class EmailNotifier:
         self.password = Config.MAIL_PASSWORD
         self.default_sender = Config.MAIL_DEFAULT_SENDER
         
+        # 通知发件箱
+        self.outbox = None
+        if redis_client is not None and Config.NOTIFICATION_OUTBOX_ENABLED:
+            from app.outbox import NotificationOutbox
+            self.outbox = NotificationOutbox(redis_client)
+        
+        # 通知账本：同一事件在有效期内不重复通知
+        self.ledger = None
+        if redis_client is not None and Config.NOTIFICATION_LEDGER_ENABLED:
+            from app.notification_ledger import NotificationLedger
+            self.ledger = NotificationLedger(redis_client)
+        
+        # 通知摘要：合并窗口内同一收件人的店铺变动和价格对比通知合并为一封邮件
+        self.digest = None
+        if redis_client is not None and Config.DIGEST_WINDOW > 0:
+            from app.digest import NotificationDigest
+            self.digest = NotificationDigest(redis_client)
+        
+        # 同一邮件账号的所有通知器共享连接池
+        self.pool = get_smtp_pool(
+            self.server, self.port, self.username, self.password,
+            use_ssl=self.use_ssl, use_tls=self.use_tls
+        )
+        
         # 初始化日志记录器
         self.logger = logging.getLogger('app.notification')
         if not self.logger.handlers:
@@ -31,9 +197,19 @@ class EmailNotifier:
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.WARNING)
     
-    def send_email(self, recipient, subject, body, is_html=True):
-        """发送邮件"""
-        server = None  #确保server在finally块中可用
+    def send_email(self, recipient, subject, body, is_html=True, text_body=None, ledger=None):
+        """发送邮件：启用发件箱时入队后立即返回，否则直接投递（text_body 为HTML邮件的纯文本版本，
+        ledger 为邮件包含的通知账本指纹，随消息保存，最终投递失败时释放）"""
+        if self.outbox is not None:
+            try:
+                self.outbox.enqueue(recipient, subject, body, is_html=is_html, text_body=text_body, ledger=ledger)
+                return True
+            except Exception as e:
+                self.logger.warning(f"邮件入队失败，改为直接发送 (收件人: {recipient}): {e}")
+        return self.deliver(recipient, subject, body, is_html, text_body)
+    
+    def deliver(self, recipient, subject, body, is_html=True, text_body=None):
+        """立即投递邮件（通过共享连接池复用已登录的SMTP连接）"""
         try:
             # 创建邮件
             msg = MIMEMultipart('alternative')
@@ -41,70 +217,70 @@ class EmailNotifier:
             msg['From'] = self.default_sender
             msg['To'] = recipient
             
-            # 添加邮件内容
+            # 添加邮件内容（multipart/alternative 中纯文本在前，HTML在后）
             if is_html:
+                if text_body:
+                    msg.attach(MIMEText(text_body, 'plain'))
                 msg.attach(MIMEText(body, 'html'))
             else:
                 msg.attach(MIMEText(body, 'plain'))
-            
-            # 连接到SMTP服务器并发送邮件
-            if self.use_ssl:
-                try:
-                    self.logger.info(f"正在尝试使用SSL连接到 {self.server}:{self.port} 发送邮件至 {recipient}")
-                    server = smtplib.SMTP_SSL(self.server, self.port, timeout=10) # 添加超时
-                    server.login(self.username, self.password)
-                    self.logger.info(f"SSL连接成功并登录，准备发送邮件至 {recipient}")
-                    result = server.sendmail(self.default_sender, recipient, msg.as_string())
-                    
-                    if not result:  # 空字典表示所有收件人都成功
-                        self.logger.info(f"邮件已成功发送至 {recipient} (SSL)")
-                        return True
-                    else:
-                        # result 是一个字典，键是发送失败的收件人，值是错误信息
-                        for failed_recipient, error_info in result.items():
-                            self.logger.error(f"通过SSL发送邮件至 {failed_recipient} 失败: {error_info}")
-                        return False
-                except smtplib.SMTPException as ssl_smtp_error:
-                    self.logger.error(f"SSL邮件发送过程中发生SMTP错误 (收件人: {recipient}): {ssl_smtp_error}", exc_info=True)
-                    return False
-                except Exception as ssl_error:
-                    self.logger.error(f"SSL邮件发送失败 (收件人: {recipient}): {ssl_error}", exc_info=True)
-                    return False #确保连接错误等也返回False
-            else: # 使用TLS或无加密
-                try:
-                    self.logger.info(f"正在尝试使用TLS/无加密连接到 {self.server}:{self.port} 发送邮件至 {recipient}")
-                    server = smtplib.SMTP(self.server, self.port, timeout=10) # 添加超时
-                    if self.use_tls:
-                        server.starttls()
-                    server.login(self.username, self.password)
-                    self.logger.info(f"TLS/无加密连接成功并登录，准备发送邮件至 {recipient}")
-                    result = server.sendmail(self.default_sender, recipient, msg.as_string())
-
-                    if not result: # 空字典表示所有收件人都成功
-                        self.logger.info(f"邮件已成功发送至 {recipient} (TLS/无加密)")
-                        return True
-                    else:
-                        for failed_recipient, error_info in result.items():
-                            self.logger.error(f"通过TLS/无加密发送邮件至 {failed_recipient} 失败: {error_info}")
-                        return False
-                except smtplib.SMTPException as smtp_error:
-                    self.logger.error(f"TLS/无加密邮件发送过程中发生SMTP错误 (收件人: {recipient}): {smtp_error}", exc_info=True)
-                    return False
-                except Exception as e:
-                    self.logger.error(f"TLS/无加密邮件发送失败 (收件人: {recipient}): {e}", exc_info=True)
-                    return False
-        
         except Exception as e:
             # 捕获邮件构建等早期阶段的错误
             self.logger.error(f"构建或准备发送邮件时发生意外错误 (收件人: {recipient}): {e}", exc_info=True)
             return False
-        finally:
-            if server:
-                try:
-                    server.quit()
-                    self.logger.info(f"已关闭与邮件服务器的连接 (针对 {recipient})")
-                except Exception as e:
-                    self.logger.warning(f"关闭邮件服务器连接时发生错误 (针对 {recipient}): {e}", exc_info=True)
+        
+        mode = 'SSL' if self.use_ssl else 'TLS/无加密'
+        try:
+            result = self.pool.sendmail(self.default_sender, recipient, msg.as_string())
+            
+            if not result:  # 空字典表示所有收件人都成功
+                self.logger.info(f"邮件已成功发送至 {recipient} ({mode})")
+                return True
+            else:
+                # result 是一个字典，键是发送失败的收件人，值是错误信息
+                for failed_recipient, error_info in result.items():
+                    self.logger.error(f"通过{mode}发送邮件至 {failed_recipient} 失败: {error_info}")
+                return False
+        except smtplib.SMTPException as smtp_error:
+            self.logger.error(f"{mode}邮件发送过程中发生SMTP错误 (收件人: {recipient}): {smtp_error}", exc_info=True)
+            return False
+        except Exception as e:
+            self.logger.error(f"{mode}邮件发送失败 (收件人: {recipient}): {e}", exc_info=True)
+            return False
+    
+    def _filter_notified(self, recipient, entries, fingerprint_func):
+        """过滤掉已经通知过该收件人的事件"""
+        if self.ledger is None or not entries:
+            return entries
+        try:
+            unseen = self.ledger.filter_unseen(recipient, entries, fingerprint_func)
+            if len(unseen) < len(entries):
+                self.logger.info(f"跳过 {len(entries) - len(unseen)} 条已通知过 {recipient} 的事件")
+            return unseen
+        except Exception as e:
+            self.logger.warning(f"读取通知账本失败，不做去重 (收件人: {recipient}): {e}")
+            return entries
+    
+    def _reserve_notified(self, recipient, fingerprints, ttl):
+        """入队或发送前记录事件指纹（避免投递前重复入队），返回 指纹 -> 有效期，未启用账本时为 None"""
+        if self.ledger is None:
+            return None
+        ledger = {fingerprint: ttl for fingerprint in fingerprints}
+        try:
+            self.ledger.record_each(recipient, ledger)
+        except Exception as e:
+            self.logger.warning(f"写入通知账本失败 (收件人: {recipient}): {e}")
+            return None
+        return ledger
+    
+    def _release_notified(self, recipient, ledger):
+        """通知没有发出，释放事件指纹"""
+        if not ledger:
+            return
+        try:
+            self.ledger.release(recipient, list(ledger))
+        except Exception as e:
+            self.logger.warning(f"释放通知账本指纹失败 (收件人: {recipient}): {e}")
     
     def notify_new_listings(self, recipient, store_name, new_items):
         """通知新上架商品"""
@@ -117,59 +293,39 @@ class EmailNotifier:
             self.logger.info(f"没有真正标记为'New listing'的商品，不为店铺 {store_name} 发送新上架通知给 {recipient}")
             return True # 认为操作成功，因为没有需要通知的内容
         
+        # 跳过已经通知过的商品（店铺数据丢失后重新爬取时不会把整店商品再通知一遍）
+        true_new_items = self._filter_notified(recipient, true_new_items, NotificationLedger.new_listing_fingerprint)
+        if not true_new_items:
+            return True
+        
+        ledger = self._reserve_notified(
+            recipient,
+            [NotificationLedger.new_listing_fingerprint(item) for item in true_new_items],
+            Config.LEDGER_NEW_LISTING_TTL
+        )
+        success = self._send_new_listings(recipient, store_name, true_new_items, ledger)
+        if not success:
+            self._release_notified(recipient, ledger)
+        return success
+    
+    def _send_new_listings(self, recipient, store_name, true_new_items, ledger=None):
+        """发送（或加入摘要）新上架商品通知"""
+        if self.digest is not None:
+            try:
+                return self.digest.add_new_listings(recipient, store_name, true_new_items, ledger=ledger)
+            except Exception as e:
+                self.logger.warning(f"新上架通知加入摘要失败，改为单独发送 (店铺: {store_name}): {e}")
+        
         try:
             subject = f'【eBay店铺监控】{store_name} 有新上架商品 ({len(true_new_items)}个)' # 更新标题以包含数量
-            
-            # 邮件HTML内容
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    .container {{ max-width: 800px; margin: 0 auto; font-family: Arial, sans-serif; }}
-                    .header {{ background-color: #00509d; color: white; padding: 15px; text-align: center; }}
-                    .item {{ border-bottom: 1px solid #eee; padding: 15px; margin-bottom: 15px; }}
-                    .item-image {{ max-width: 200px; max-height: 200px; }}
-                    .new-listing-badge {{ background-color: #ff4631; color: white; font-size: 12px; padding: 3px 8px; border-radius: 3px; margin-right: 10px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h2>{store_name} 新上架商品通知</h2>
-                        <p>发现 {len(true_new_items)} 个新上架商品</p>
-                    </div>
-            """
-            
-            for item in true_new_items:
-                price = item.get('price', 0)
-                shipping = item.get('shipping', '未知')
-                status = item.get('status', '未知')
-                listing_date = item.get('listing_date', '未知')
-                
-                html += f"""
-                    <div class="item">
-                        <h3>
-                            <span class="new-listing-badge">新上架</span>
-                            <a href="{item.get('url', '#')}">{item.get('title', '未知标题')}</a>
-                        </h3>
-                        <div>
-                            <img src="{item.get('image_url', '')}" class="item-image" alt="{item.get('title', '商品图片')}">
-                        </div>
-                        <p>价格: <strong>{item.get('currency', '$')}{price:.2f}</strong></p>
-                        <p>运费: {shipping}</p>
-                        <p>状态: {status}</p>
-                        <p>上架时间: <span style="color: #0066cc; font-weight: bold;">{listing_date}</span></p>
-                    </div>
-                """
-            
-            html += """
-                </div>
-            </body>
-            </html>
-            """
+            html, text = render_email(
+                'new_listings',
+                store_name=store_name,
+                listings=ItemBudget().take(true_new_items)
+            )
             
             # 使用统一的 send_email 方法
-            success = self.send_email(recipient, subject, html, is_html=True)
+            success = self.send_email(recipient, subject, html, is_html=True, text_body=text, ledger=ledger)
             if success:
                 self.logger.info(f"成功发送新上架商品通知邮件到 {recipient} (店铺: {store_name})")
             else:
@@ -186,266 +342,104 @@ class EmailNotifier:
             self.logger.info(f"店铺 {store_name}: 没有价格变动，不发送通知给 {recipient}") # 增加店铺和收件人信息
             return True
         
-        subject = f"【eBay店铺监控】{store_name} - {len(price_changes)} 个商品价格变动" # 统一邮件标题格式
+        price_changes = self._filter_notified(recipient, price_changes, NotificationLedger.price_change_fingerprint)
+        if not price_changes:
+            return True
         
-        # 构建HTML邮件内容
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ max-width: 800px; margin: 0 auto; }}
-                .header {{ background-color: #3498db; color: white; padding: 10px; text-align: center; }}
-                .item-list {{ padding: 10px; }}
-                .item {{ border-bottom: 1px solid #ddd; padding: 10px; margin-bottom: 10px; }}
-                .item-header {{ display: flex; justify-content: space-between; align-items: center;}}
-                .item-title {{ font-weight: bold; flex-grow: 1; margin-right: 10px;}}
-                .price-change {{ display: flex; align-items: baseline; }}
-                .old-price {{ text-decoration: line-through; color: #777; margin-right: 10px; }}
-                .new-price {{ font-weight: bold; margin-right: 5px;}}
-                .price-up {{ color: #e63946; }}
-                .price-down {{ color: #2ecc71; }}
-                .item-image-container {{ width: 100px; height: 100px; margin-right: 15px; float: left; overflow: hidden; display: flex; justify-content: center; align-items: center;}}
-                .item-image {{ max-width: 100%; max-height: 100%; object-fit: contain; }}
-                .item-details p {{ margin: 5px 0; }}
-                .clear {{ clear: both; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>{store_name} - 价格变动通知</h2>
-                    <p>{len(price_changes)} 个商品价格发生变化</p>
-                </div>
-                <div class="item-list">
-        """
+        ledger = self._reserve_notified(
+            recipient,
+            [NotificationLedger.price_change_fingerprint(change) for change in price_changes],
+            Config.LEDGER_PRICE_CHANGE_TTL
+        )
+        success = self._send_price_changes(recipient, store_name, price_changes, ledger)
+        if not success:
+            self._release_notified(recipient, ledger)
+        return success
+    
+    def _send_price_changes(self, recipient, store_name, price_changes, ledger=None):
+        """发送（或加入摘要）价格变动通知"""
+        if self.digest is not None:
+            try:
+                return self.digest.add_price_changes(recipient, store_name, price_changes, ledger=ledger)
+            except Exception as e:
+                self.logger.warning(f"价格变动通知加入摘要失败，改为单独发送 (店铺: {store_name}): {e}")
         
-        for change in price_changes:
-            item = change.get('item', {}) # 确保 item 存在
-            old_price = change.get('old_price', 0)
-            new_price = change.get('new_price', 0)
+        try:
+            subject = f"【eBay店铺监控】{store_name} - {len(price_changes)} 个商品价格变动" # 统一邮件标题格式
+            html, text = render_email(
+                'price_changes',
+                store_name=store_name,
+                changes=ItemBudget().take(price_changes)
+            )
             
-            # 确保价格是数值类型，以便进行比较和格式化
-            try:
-                old_price_float = float(old_price)
-                new_price_float = float(new_price)
-                price_diff = new_price_float - old_price_float
-            except (ValueError, TypeError):
-                price_diff = 0 # 如果价格无效，则差异为0
-                old_price_float = old_price # 保留原始值用于显示
-                new_price_float = new_price # 保留原始值用于显示
-
-
-            price_class = "price-up" if price_diff > 0 else ("price-down" if price_diff < 0 else "price-same")
-            price_sign = "+" if price_diff > 0 else ""
-            currency = item.get('currency', '$') # 从item获取货币符号
-
-            # 构建价格显示字符串，处理可能的非数值情况
-            old_price_display = f"{currency}{old_price_float:.2f}" if isinstance(old_price_float, (int, float)) else str(old_price)
-            new_price_display = f"{currency}{new_price_float:.2f}" if isinstance(new_price_float, (int, float)) else str(new_price)
-            price_diff_display = f"({price_sign}{currency}{price_diff:.2f})" if isinstance(price_diff, (int, float)) and price_diff != 0 else ""
+            # 使用统一的 send_email 方法
+            success = self.send_email(recipient, subject, html, is_html=True, text_body=text, ledger=ledger)
+            if success:
+                self.logger.info(f"成功发送价格变动通知邮件到 {recipient} (店铺: {store_name})")
+            else:
+                self.logger.error(f"发送价格变动通知邮件失败到 {recipient} (店铺: {store_name})")
+            return success
+        
+        except Exception as e:
+            self.logger.error(f"构建价格变动通知邮件时发生错误 (店铺: {store_name}, 收件人: {recipient}): {str(e)}", exc_info=True)
+            return False
 
+    @staticmethod
+    def _comparison_status(status: str):
+        """价格对比状态对应的 (状态文字, 颜色, 建议)"""
+        if status == 'competitor_higher':
+            return '竞争对手价格更高', '#28a745', '您的价格更有竞争力！'  # 绿色，对我们有利
+        if status == 'competitor_lower':
+            return '竞争对手价格更低', '#dc3545', '竞争对手价格更低，考虑调整定价策略'  # 红色，对我们不利
+        return '价格相近', '#6c757d', '价格相近，保持关注'
 
-            html += f"""
-                    <div class="item">
-                        <div class="item-image-container">
-                            <img class="item-image" src="{item.get('image_url', '')}" alt="商品图片">
-                        </div>
-                        <div class="item-details">
-                            <div class="item-header">
-                                <div class="item-title"><a href="{item.get('url', '#')}" target="_blank">{item.get('title', 'N/A')}</a></div>
-                                <div class="price-change">
-                                    <div class="old-price">{old_price_display}</div>
-                                    <div class="new-price {price_class}">{new_price_display}</div>
-                                    <div class="{price_class}">{price_diff_display}</div>
-                                </div>
-                            </div>
-                        </div>
-                        <div class="clear"></div>
-                    </div>
-            """
-        
-        html += """
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+    def notify_price_comparison(self, recipient: str, comparison_config: dict, comparison_result: dict) -> bool:
+        """发送价格对比通知邮件（价格差异持续超过阈值时，有效期内只提醒一次）"""
+        status = comparison_result.get('comparison_result', {}).get('status', 'unknown')
+        fingerprint = NotificationLedger.comparison_fingerprint(comparison_config.get('id'), status)
+        if not self._filter_notified(recipient, [fingerprint], lambda entry: entry):
+            return True
         
-        # 使用统一的 send_email 方法
-        success = self.send_email(recipient, subject, html, is_html=True)
-        if success:
-            self.logger.info(f"成功发送价格变动通知邮件到 {recipient} (店铺: {store_name})")
-        else:
-            self.logger.error(f"发送价格变动通知邮件失败到 {recipient} (店铺: {store_name})")
+        ledger = self._reserve_notified(recipient, [fingerprint], Config.LEDGER_COMPARISON_TTL)
+        success = self._send_price_comparison(recipient, comparison_config, comparison_result, ledger)
+        if not success:
+            self._release_notified(recipient, ledger)
         return success
-
-    def notify_price_comparison(self, recipient: str, comparison_config: dict, comparison_result: dict) -> bool:
-        """发送价格对比通知邮件"""
+    
+    def _send_price_comparison(self, recipient: str, comparison_config: dict, comparison_result: dict,
+                               ledger: dict = None) -> bool:
+        """发送（或加入摘要）价格对比通知"""
+        if self.digest is not None:
+            try:
+                return self.digest.add_comparison(recipient, comparison_config, comparison_result, ledger=ledger)
+            except Exception as e:
+                self.logger.warning(f"价格对比通知加入摘要失败，改为单独发送 (对比: {comparison_config.get('id')}): {e}")
+        
         try:
             comparison_name = comparison_config.get('name', '价格对比')
-            my_listing = comparison_config.get('my_listing', {})
-            competitor_listing = comparison_config.get('competitor_listing', {})
-            
-            # 获取对比结果
-            my_price_data = comparison_result.get('my_price', {})
-            competitor_price_data = comparison_result.get('competitor_price', {})
             result = comparison_result.get('comparison_result', {})
-            
-            my_price = my_price_data.get('current', 0)
-            competitor_price = competitor_price_data.get('current', 0)
-            difference = result.get('difference', 0)
-            percentage = result.get('percentage', 0)
             status = result.get('status', 'unknown')
-            
-            # 确定邮件主题和状态文本
-            if status == 'competitor_higher':
-                status_text = '竞争对手价格更高'
-                status_color = '#28a745'  # 绿色，对我们有利
-                advantage_text = '您的价格更有竞争力！'
-            elif status == 'competitor_lower':
-                status_text = '竞争对手价格更低'
-                status_color = '#dc3545'  # 红色，对我们不利
-                advantage_text = '竞争对手价格更低，考虑调整定价策略'
-            else:
-                status_text = '价格相近'
-                status_color = '#6c757d'  # 灰色
-                advantage_text = '价格相近，保持关注'
+            status_text, status_color, advantage_text = self._comparison_status(status)
             
             subject = f"【价格对比提醒】{comparison_name} - {status_text}"
-            
-            # 构建HTML邮件内容
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f8f9fa; }}
-                    .container {{ max-width: 800px; margin: 0 auto; background-color: white; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px 20px; text-align: center; }}
-                    .header h1 {{ margin: 0; font-size: 24px; }}
-                    .content {{ padding: 30px 20px; }}
-                    .comparison-card {{ border: 1px solid #e0e0e0; border-radius: 8px; margin: 20px 0; overflow: hidden; }}
-                    .card-header {{ background-color: #f8f9fa; padding: 15px 20px; border-bottom: 1px solid #e0e0e0; }}
-                    .card-body {{ padding: 20px; }}
-                    .price-section {{ display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px; }}
-                    .price-item {{ text-align: center; flex: 1; }}
-                    .price-label {{ font-size: 14px; color: #6c757d; margin-bottom: 5px; }}
-                    .price-value {{ font-size: 24px; font-weight: bold; color: #2c3e50; }}
-                    .vs-divider {{ font-size: 18px; color: #adb5bd; margin: 0 20px; }}
-                    .result-section {{ background-color: {status_color}; color: white; padding: 20px; text-align: center; border-radius: 8px; margin: 20px 0; }}
-                    .result-title {{ font-size: 18px; font-weight: bold; margin-bottom: 10px; }}
-                    .result-details {{ font-size: 16px; }}
-                    .product-info {{ background-color: #f8f9fa; padding: 15px; border-radius: 8px; margin: 15px 0; }}
-                    .product-title {{ font-weight: bold; color: #2c3e50; margin-bottom: 8px; }}
-                    .product-link {{ color: #007bff; text-decoration: none; }}
-                    .footer {{ background-color: #f8f9fa; padding: 20px; text-align: center; color: #6c757d; font-size: 12px; }}
-                    .badge {{ display: inline-block; padding: 6px 12px; border-radius: 20px; font-size: 12px; font-weight: bold; }}
-                    .badge-success {{ background-color: #28a745; color: white; }}
-                    .badge-danger {{ background-color: #dc3545; color: white; }}
-                    .badge-secondary {{ background-color: #6c757d; color: white; }}
-                    @media (max-width: 600px) {{
-                        .price-section {{ flex-direction: column; }}
-                        .vs-divider {{ margin: 10px 0; }}
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🔔 价格对比提醒</h1>
-                        <p>{comparison_name}</p>
-                    </div>
-                    
-                    <div class="content">
-                        <div class="result-section">
-                            <div class="result-title">{advantage_text}</div>
-                            <div class="result-details">
-                                价格差异: <strong>${abs(difference):.2f}</strong> ({abs(percentage):.1f}%)
-                            </div>
-                        </div>
-                        
-                        <div class="comparison-card">
-                            <div class="card-header">
-                                <h3 style="margin: 0;">💰 价格对比详情</h3>
-                            </div>
-                            <div class="card-body">
-                                <div class="price-section">
-                                    <div class="price-item">
-                                        <div class="price-label">我的商品价格</div>
-                                        <div class="price-value">${my_price:.2f}</div>
-                                        <div class="badge badge-success">我的价格</div>
-                                    </div>
-                                    <div class="vs-divider">VS</div>
-                                    <div class="price-item">
-                                        <div class="price-label">竞争对手价格</div>
-                                        <div class="price-value">${competitor_price:.2f}</div>
-                                        <div class="badge badge-danger">竞争对手</div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <div class="comparison-card">
-                            <div class="card-header">
-                                <h3 style="margin: 0;">📋 商品信息</h3>
-                            </div>
-                            <div class="card-body">
-                                <div class="product-info">
-                                    <div class="product-title">我的商品</div>
-                                    <div>{my_listing.get('title', '商品标题')}</div>
-                                    <div><a href="{my_listing.get('url', '#')}" class="product-link" target="_blank">查看商品详情 →</a></div>
-                                </div>
-                                
-                                <div class="product-info">
-                                    <div class="product-title">竞争对手商品</div>
-                                    <div>{competitor_listing.get('title', '商品标题')}</div>
-                                    <div><a href="{competitor_listing.get('url', '#')}" class="product-link" target="_blank">查看商品详情 →</a></div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <div style="margin-top: 30px; padding: 20px; background-color: #e3f2fd; border-radius: 8px;">
-                            <h4 style="margin-top: 0; color: #1976d2;">💡 建议操作</h4>
-                            <ul style="margin-bottom: 0;">
-            """
-            
-            # 根据对比结果添加建议
-            if status == 'competitor_higher':
-                html += """
-                                <li>您的价格更有优势，可以考虑保持当前定价</li>
-                                <li>如果销量不错，可以考虑适当提价</li>
-                                <li>继续监控竞争对手是否调价</li>
-                """
-            elif status == 'competitor_lower':
-                html += """
-                                <li>竞争对手价格更低，建议评估是否需要调价</li>
-                                <li>分析竞争对手商品的质量和服务差异</li>
-                                <li>考虑通过其他方式提升竞争力（如免邮、快速发货等）</li>
-                """
-            else:
-                html += """
-                                <li>价格相近，关注其他竞争因素</li>
-                                <li>继续监控价格变化趋势</li>
-                                <li>考虑通过服务差异化获得竞争优势</li>
-                """
-            
-            html += f"""
-                            </ul>
-                        </div>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>此邮件由eBay价格监控系统自动发送</p>
-                        <p>检查时间: {time.strftime('%Y-%m-%d %H:%M:%S')}</p>
-                        <p>配置ID: {comparison_config.get('id', 'N/A')}</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            html, text = render_email(
+                'price_comparison',
+                comparison_name=comparison_name,
+                comparison_id=comparison_config.get('id', 'N/A'),
+                my_listing=comparison_config.get('my_listing', {}),
+                competitor_listing=comparison_config.get('competitor_listing', {}),
+                my_price=comparison_result.get('my_price', {}).get('current', 0),
+                competitor_price=comparison_result.get('competitor_price', {}).get('current', 0),
+                difference=result.get('difference', 0),
+                percentage=result.get('percentage', 0),
+                status=status,
+                status_text=status_text,
+                status_color=status_color,
+                advantage_text=advantage_text
+            )
             
             # 发送邮件
-            success = self.send_email(recipient, subject, html, is_html=True)
+            success = self.send_email(recipient, subject, html, is_html=True, text_body=text, ledger=ledger)
             if success:
                 self.logger.info(f"成功发送价格对比通知邮件到 {recipient} (对比: {comparison_name})")
             else:
@@ -457,92 +451,138 @@ class EmailNotifier:
             self.logger.error(f"构建价格对比通知邮件时发生错误 (收件人: {recipient}): {str(e)}", exc_info=True)
             return False
 
-def send_notification_email(recipient_email, changes, store_id):
-    """发送商品变动通知邮件"""
-    try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f'【eBay店铺监控】店铺 {store_id} 有新变化'
-        msg['From'] = Config.MAIL_USERNAME
-        msg['To'] = recipient_email
-        
-        # 构建HTML邮件内容
-        html_content = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ max-width: 600px; margin: 0 auto; }}
-                .section {{ margin-bottom: 20px; }}
-                .item {{ margin-bottom: 10px; border-bottom: 1px solid #eee; padding-bottom: 10px; }}
-                .price-change {{ color: red; font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>eBay店铺监控 - 变化通知</h2>
-                <p>您监控的店铺 {store_id} 有以下变化：</p>
-        """
-        
-        # 新上架商品
-        if changes['new_items']:
-            html_content += """
-                <div class="section">
-                    <h3>新上架商品</h3>
-            """
+    def notify_group_comparison(self, recipient: str, group: dict, result: dict, ledger: dict = None) -> bool:
+        """发送对比分组通知邮件（只列出满足通知条件的商品对，ledger 为其中商品对的通知账本指纹）"""
+        try:
+            group_name = group.get('name', '价格对比分组')
+            subject = f"【价格对比提醒】{group_name} - {result.get('alerts', 0)} 个商品对超过阈值"
             
-            for item in changes['new_items']:
-                html_content += f"""
-                    <div class="item">
-                        <p><strong>{item['title']}</strong></p>
-                        <p>价格: ${item['price']}</p>
-                        <p><a href="{item['url']}">查看商品</a></p>
-                    </div>
-                """
+            budget = ItemBudget()
+            listings = []
+            for listing in result.get('listings', []):
+                pairs = [pair for pair in listing.get('pairs', []) if pair.get('notify')]
+                if pairs:
+                    listings.append(dict(listing, pairs=budget.take(pairs)))
+            html, text = render_email(
+                'group_comparison',
+                group_name=group_name,
+                alerts=result.get('alerts', 0),
+                listings=listings
+            )
             
-            html_content += "</div>"
+            success = self.send_email(recipient, subject, html, is_html=True, text_body=text, ledger=ledger)
+            if success:
+                self.logger.info(f"成功发送对比分组通知邮件到 {recipient} (分组: {group_name})")
+            else:
+                self.logger.error(f"发送对比分组通知邮件失败到 {recipient} (分组: {group_name})")
+            return success
+        
+        except Exception as e:
+            self.logger.error(f"构建对比分组通知邮件时发生错误 (收件人: {recipient}): {str(e)}", exc_info=True)
+            return False
+
+    def notify_digest(self, recipient: str, digest: dict, ledger: dict = None) -> bool:
+        """发送通知摘要邮件（按店铺分节列出新上架和价格变动，之后列出价格对比提醒、价格提醒和关键词命中）"""
+        stores = {name: section for name, section in digest.get('stores', {}).items()
+                  if section.get('new_listings') or section.get('price_changes')}
+        comparisons = digest.get('comparisons', [])
+        watchlist_matches = digest.get('watchlist_matches', [])
+        price_rule_alerts = digest.get('price_rule_alerts', [])
+        if not stores and not comparisons and not watchlist_matches and not price_rule_alerts:
+            return True
         
-        # 价格变化商品
-        if changes['price_changes']:
-            html_content += """
-                <div class="section">
-                    <h3>价格变化商品</h3>
-            """
+        try:
+            new_count = sum(len(section['new_listings']) for section in stores.values())
+            change_count = sum(len(section['price_changes']) for section in stores.values())
+            summary = []
+            if new_count:
+                summary.append(f"{new_count} 个新上架")
+            if change_count:
+                summary.append(f"{change_count} 个价格变动")
+            if comparisons:
+                summary.append(f"{len(comparisons)} 条价格对比提醒")
+            if price_rule_alerts:
+                summary.append(f"{len(price_rule_alerts)} 条价格提醒")
+            if watchlist_matches:
+                summary.append(f"{len(watchlist_matches)} 个关键词命中")
+            summary = '，'.join(summary)
+            subject = f"【eBay店铺监控】{len(stores)} 个店铺 - {summary}" if stores else f"【eBay店铺监控】{summary}"
             
-            for change in changes['price_changes']:
-                item = change['item']
-                html_content += f"""
-                    <div class="item">
-                        <p><strong>{item['title']}</strong></p>
-                        <p>原价: ${change['old_price']} → 现价: <span class="price-change">${change['new_price']}</span></p>
-                        <p><a href="{item['url']}">查看商品</a></p>
-                    </div>
-                """
+            comparison_rows = []
+            for entry in comparisons:
+                config = entry.get('config', {})
+                record = entry.get('result', {})
+                result = record.get('comparison_result', {})
+                comparison_rows.append({
+                    'name': config.get('name') or config.get('id'),
+                    'status': result.get('status', 'unknown'),
+                    'status_text': self._comparison_status(result.get('status', 'unknown'))[0],
+                    'my_price': record.get('my_price', {}).get('current') or 0,
+                    'competitor_price': record.get('competitor_price', {}).get('current') or 0,
+                    'difference': result.get('difference', 0),
+                    'percentage': result.get('percentage', 0),
+                    'my_url': config.get('my_listing', {}).get('url'),
+                    'competitor_url': config.get('competitor_listing', {}).get('url')
+                })
             
-            html_content += "</div>"
-        
-        # 下架商品
-        if changes['removed_items']:
-            html_content += """
-                <div class="section">
-                    <h3>已下架商品</h3>
-            """
+            # 关键词命中按关键词分组
+            keyword_groups = {}
+            for match in watchlist_matches:
+                keyword_groups.setdefault(match.get('keyword', '未知关键词'), []).append(match)
             
-            for item in changes['removed_items']:
-                html_content += f"""
-                    <div class="item">
-                        <p><strong>{item['title']}</strong></p>
-                        <p>价格: ${item['price']}</p>
-                    </div>
-                """
+            # 对比提醒优先占用数量上限，其余按店铺顺序分配，最后是价格提醒和关键词命中
+            budget = ItemBudget()
+            comparison_rows = budget.take(comparison_rows)
+            store_sections = [
+                {
+                    'name': name,
+                    'new_listings': budget.take(section['new_listings']),
+                    'price_changes': budget.take(section['price_changes'])
+                }
+                for name, section in stores.items()
+            ]
+            html, text = render_email(
+                'digest',
+                summary=summary,
+                comparisons=comparison_rows,
+                stores=store_sections,
+                price_rule_alerts=budget.take(price_rule_alerts),
+                keywords=[{'keyword': keyword, 'matches': budget.take(matches)}
+                          for keyword, matches in keyword_groups.items()]
+            )
             
-            html_content += "</div>"
+            success = self.send_email(recipient, subject, html, is_html=True, text_body=text, ledger=ledger)
+            if success:
+                self.logger.info(
+                    f"成功发送通知摘要邮件到 {recipient} ({len(stores)} 个店铺, "
+                    f"{len(comparisons)} 条对比提醒, {len(price_rule_alerts)} 条价格提醒, "
+                    f"{len(watchlist_matches)} 个关键词命中)"
+                )
+            else:
+                self.logger.error(f"发送通知摘要邮件失败到 {recipient}")
+            return success
         
-        html_content += """
-            </div>
-        </body>
-        </html>
-        """
+        except Exception as e:
+            self.logger.error(f"构建通知摘要邮件时发生错误 (收件人: {recipient}): {str(e)}", exc_info=True)
+            return False
+
+def send_notification_email(recipient_email, changes, store_id):
+    """发送商品变动通知邮件"""
+    try:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = f'【eBay店铺监控】店铺 {store_id} 有新变化'
+        msg['From'] = Config.MAIL_USERNAME
+        msg['To'] = recipient_email
         
+        budget = ItemBudget()
+        html_content, text_content = render_email(
+            'store_changes',
+            store_id=store_id,
+            new_items=budget.take(changes['new_items']),
+            price_changes=budget.take(changes['price_changes']),
+            removed_items=budget.take(changes['removed_items'])
+        )
+        msg.attach(MIMEText(text_content, 'plain'))
         msg.attach(MIMEText(html_content, 'html'))
         
         # 发送邮件
@@ -555,4 +595,4 @@ def send_notification_email(recipient_email, changes, store_id):
     
     except Exception as e:
         logger.error(f"发送邮件失败: {str(e)}")
-        return False 
\ No newline at end of file
+        return False 
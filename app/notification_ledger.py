@@ -0,0 +1,113 @@
+# 通知去重模块（按收件人记录已发送事件的指纹，抑制重复通知）
+
+import time
+import logging
+from typing import Dict, List
+from app.config import Config
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class NotificationLedger:
+    """通知账本 - 同一收件人在有效期内不会重复收到同一事件的通知"""
+
+    # Redis数据结构设计
+    # ==================
+    # 已通知事件：notify_ledger:{email} (ZSET, member=事件指纹, score=指纹过期时间)
+    # 事件指纹：
+    #     new:{item_id}                     新上架商品
+    #     price:{item_id}:{new_price}       商品价格变为某个价格
+    #     comparison:{comparison_id}:{status}  价格对比提醒（competitor_higher / competitor_lower）
+    #     group:{group_id}:{my_url}|{competitor_url}:{status}  对比分组中的一个商品对
+    # 指纹在通知入队（发件箱、摘要、Webhook队列）时写入，避免投递前重复入队；
+    # 消息最终投递失败（进入死信）时随消息携带的指纹一起释放，下次检测到时重新通知
+
+    COMPARISON_STATUSES = ('competitor_higher', 'competitor_lower')
+
+    def __init__(self, redis_client):
+        """初始化通知账本"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _ledger_key(self, recipient: str) -> str:
+        return f"notify_ledger:{recipient}"
+
+    @staticmethod
+    def new_listing_fingerprint(item: Dict) -> str:
+        return f"new:{item.get('id')}"
+
+    @staticmethod
+    def price_change_fingerprint(change: Dict) -> str:
+        return f"price:{change.get('item', {}).get('id')}:{change.get('new_price')}"
+
+    @staticmethod
+    def comparison_fingerprint(comparison_id: str, status: str) -> str:
+        return f"comparison:{comparison_id}:{status}"
+
+    @staticmethod
+    def group_pair_fingerprint(group_id: str, my_url: str, competitor_url: str, status: str) -> str:
+        return f"group:{group_id}:{my_url}|{competitor_url}:{status}"
+
+    def unseen(self, recipient: str, fingerprints: List[str]) -> List[bool]:
+        """返回每个指纹是否未通知过（或已过期）"""
+        if not fingerprints:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for fingerprint in fingerprints:
+            pipe.zscore(self._ledger_key(recipient), fingerprint)
+        now = time.time()
+        return [score is None or float(score) <= now for score in pipe.execute()]
+
+    def filter_unseen(self, recipient: str, entries: List[Dict], fingerprint_func) -> List[Dict]:
+        """过滤掉已通知过的事件"""
+        flags = self.unseen(recipient, [fingerprint_func(entry) for entry in entries])
+        return [entry for entry, flag in zip(entries, flags) if flag]
+
+    def record(self, recipient: str, fingerprints: List[str], ttl: int):
+        """记录已通知的事件（ttl 秒内不再重复通知），同时清理过期指纹"""
+        self.record_each(recipient, {fingerprint: ttl for fingerprint in fingerprints})
+
+    def record_each(self, recipient: str, ttls: Dict[str, int]):
+        """记录已通知的事件（ttls 为 指纹 -> 有效期秒数），同时清理过期指纹"""
+        if not ttls:
+            return
+        now = int(time.time())
+        key = self._ledger_key(recipient)
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {fingerprint: now + ttl for fingerprint, ttl in ttls.items()})
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.expire(key, max(max(ttls.values()), Config.LEDGER_NEW_LISTING_TTL))
+        pipe.execute()
+
+    def release(self, recipient: str, fingerprints: List[str]):
+        """删除事件指纹（通知最终没有送达时调用，下次检测到时重新通知）"""
+        if fingerprints:
+            self.redis.zrem(self._ledger_key(recipient), *fingerprints)
+
+    def release_comparison(self, recipient: str, comparison_id: str):
+        """价格差异回落后解除价格对比提醒的抑制，下次超过阈值时重新提醒"""
+        self.release(
+            recipient, [self.comparison_fingerprint(comparison_id, status) for status in self.COMPARISON_STATUSES]
+        )
+
+    def release_group_pairs(self, recipient: str, group_id: str, pairs: List[tuple]):
+        """价格差异回落后解除分组商品对的提醒抑制（pairs 为 (我的商品URL, 对手商品URL) 列表）"""
+        if not pairs:
+            return
+        self.release(recipient, [
+            self.group_pair_fingerprint(group_id, my_url, competitor_url, status)
+            for my_url, competitor_url in pairs
+            for status in self.COMPARISON_STATUSES
+        ])
+
+    @staticmethod
+    def comparison_released(comparison_result: Dict, threshold: float) -> bool:
+        """价格差异是否已回落到释放区间（滞回：低于阈值的一定比例才重新计算）"""
+        status = comparison_result.get('status')
+        if status == 'unknown':
+            # 价格获取失败时保持原状态
+            return False
+        if status == 'equal':
+            return True
+        return abs(comparison_result.get('difference', 0)) < threshold * Config.LEDGER_COMPARISON_RELEASE_RATIO
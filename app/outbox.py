@@ -0,0 +1,231 @@
+# 通知发件箱模块（Redis持久化队列 + 后台投递）
+
+import json
+import time
+import random
+import logging
+from typing import Dict, List, Optional
+from app.config import Config
+from app.utils import decode_value, acquire_lock, release_lock, extend_lock
+from app.notification_ledger import NotificationLedger
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class NotificationOutbox:
+    """通知发件箱 - 生产方只负责入队，后台任务按到期时间投递，失败时指数退避重试，超过次数进入死信"""
+
+    # Redis数据结构设计
+    # ==================
+    # 消息：outbox:message:{message_id}
+    # {
+    #     "id": "msg_12",
+    #     "recipient": "user@example.com",
+    #     "subject": "...",
+    #     "body": "...",
+    #     "is_html": true,
+    #     "text_body": "...",           # HTML邮件的纯文本版本（可为空）
+    #     "status": "pending",          # pending, sent, dead
+    #     "attempts": 0,
+    #     "created_at": 1701234567,
+    #     "next_attempt_at": 1701234567,
+    #     "sent_at": null,
+    #     "last_error": null,
+    #     "ledger": {"new:123": 2592000}  # 邮件包含的通知账本指纹 -> 有效期（可为空），进入死信时释放
+    # }
+    # 消息ID计数器：outbox:next_id
+    # 待投递队列：outbox:queue (ZSET, member=消息ID, score=下次投递时间)
+    # 死信：outbox:dead (ZSET, member=消息ID, score=进入死信的时间，超过 OUTBOX_DEAD_RETENTION 后清理)
+    # 投递统计：outbox:stats (HASH, enqueued / sent / retried / dead)
+    # 投递锁：outbox:worker_lock (值为随机令牌，多进程部署时保证同一时间只有一个投递任务)
+
+    QUEUE_KEY = "outbox:queue"
+    DEAD_KEY = "outbox:dead"
+    STATS_KEY = "outbox:stats"
+    LOCK_KEY = "outbox:worker_lock"
+
+    def __init__(self, redis_client):
+        """初始化发件箱"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _message_key(self, message_id: str) -> str:
+        return f"outbox:message:{message_id}"
+
+    def enqueue(self, recipient: str, subject: str, body: str, is_html: bool = True,
+                deliver_at: int = None, text_body: str = None, ledger: Dict[str, int] = None) -> str:
+        """消息入队，返回消息ID（ledger 为邮件包含的通知账本指纹，投递失败进入死信时释放）"""
+        now = int(time.time())
+        message = {
+            'id': f"msg_{self.redis.incr('outbox:next_id')}",
+            'recipient': recipient,
+            'subject': subject,
+            'body': body,
+            'is_html': is_html,
+            'text_body': text_body,
+            'status': 'pending',
+            'attempts': 0,
+            'created_at': now,
+            'next_attempt_at': deliver_at or now,
+            'sent_at': None,
+            'last_error': None,
+            'ledger': ledger or None
+        }
+
+        pipe = self.redis.pipeline()
+        pipe.set(self._message_key(message['id']), json.dumps(message))
+        pipe.zadd(self.QUEUE_KEY, {message['id']: message['next_attempt_at']})
+        pipe.hincrby(self.STATS_KEY, 'enqueued', 1)
+        pipe.execute()
+
+        self.logger.info(f"邮件已加入发件箱: {message['id']} -> {recipient}")
+        return message['id']
+
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        """获取消息及其投递状态"""
+        raw = self.redis.get(self._message_key(message_id))
+        return json.loads(decode_value(raw)) if raw else None
+
+    def _save(self, pipe, message: Dict):
+        """写回消息，已发送的消息和死信只保留一段时间"""
+        if message['status'] == 'sent':
+            pipe.set(self._message_key(message['id']), json.dumps(message), ex=Config.OUTBOX_RETENTION)
+        elif message['status'] == 'dead':
+            pipe.set(self._message_key(message['id']), json.dumps(message), ex=Config.OUTBOX_DEAD_RETENTION)
+        else:
+            pipe.set(self._message_key(message['id']), json.dumps(message))
+
+    @staticmethod
+    def backoff_delay(attempts: int) -> int:
+        """第N次失败后的重试等待时间（指数退避，带抖动）"""
+        delay = min(Config.OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)), Config.OUTBOX_BACKOFF_MAX)
+        return int(delay * random.uniform(0.8, 1.2))
+
+    def deliver_due(self, notifier, limit: int = None) -> Dict:
+        """投递所有到期的消息（需持有投递锁，每条消息投递前延长锁，锁已失效时停止）"""
+        stats = {'sent': 0, 'retried': 0, 'dead': 0}
+        token = acquire_lock(self.redis, self.LOCK_KEY, Config.OUTBOX_LOCK_TIMEOUT)
+        if not token:
+            return stats
+
+        try:
+            now = int(time.time())
+            message_ids = [
+                decode_value(message_id)
+                for message_id in self.redis.zrangebyscore(
+                    self.QUEUE_KEY, '-inf', now, start=0, num=limit or Config.OUTBOX_BATCH_SIZE
+                )
+            ]
+            if not message_ids:
+                return stats
+
+            raw_messages = self.redis.mget([self._message_key(message_id) for message_id in message_ids])
+            for message_id, raw in zip(message_ids, raw_messages):
+                if not raw:
+                    self.redis.zrem(self.QUEUE_KEY, message_id)
+                    continue
+                if not extend_lock(self.redis, self.LOCK_KEY, token, Config.OUTBOX_LOCK_TIMEOUT):
+                    # 锁已超时并可能被其他进程获取，剩余消息留给下次投递
+                    self.logger.warning("发件箱投递锁已失效，停止本次投递")
+                    break
+                outcome = self._deliver(notifier, json.loads(decode_value(raw)))
+                stats[outcome] += 1
+        finally:
+            release_lock(self.redis, self.LOCK_KEY, token)
+
+        if any(stats.values()):
+            self.logger.info(f"发件箱投递完成 - 成功: {stats['sent']}, 重试: {stats['retried']}, 死信: {stats['dead']}")
+        return stats
+
+    def _deliver(self, notifier, message: Dict) -> str:
+        """投递单条消息并更新状态，返回 sent / retried / dead"""
+        now = int(time.time())
+        message['attempts'] += 1
+        try:
+            success = notifier.deliver(message['recipient'], message['subject'], message['body'],
+                                       message['is_html'], message.get('text_body'))
+            error = None if success else '邮件服务器未接受该邮件'
+        except Exception as e:
+            success, error = False, str(e)
+
+        pipe = self.redis.pipeline()
+        if success:
+            message.update({'status': 'sent', 'sent_at': now, 'last_error': None})
+            pipe.zrem(self.QUEUE_KEY, message['id'])
+            outcome = 'sent'
+        elif message['attempts'] >= Config.OUTBOX_MAX_ATTEMPTS:
+            message.update({'status': 'dead', 'last_error': error})
+            pipe.zrem(self.QUEUE_KEY, message['id'])
+            pipe.zadd(self.DEAD_KEY, {message['id']: now})
+            # 清理过期死信的索引（消息本身已按保留时间过期）
+            pipe.zremrangebyscore(self.DEAD_KEY, '-inf', now - Config.OUTBOX_DEAD_RETENTION)
+            outcome = 'dead'
+            self.logger.error(f"邮件投递失败 {message['attempts']} 次，移入死信: {message['id']} - {error}")
+        else:
+            message.update({'last_error': error, 'next_attempt_at': now + self.backoff_delay(message['attempts'])})
+            pipe.zadd(self.QUEUE_KEY, {message['id']: message['next_attempt_at']})
+            outcome = 'retried'
+            self.logger.warning(f"邮件投递失败，稍后重试: {message['id']} (第{message['attempts']}次) - {error}")
+        self._save(pipe, message)
+        pipe.hincrby(self.STATS_KEY, outcome, 1)
+        pipe.execute()
+        if outcome == 'dead':
+            self._release_ledger(message)
+        return outcome
+
+    def _release_ledger(self, message: Dict):
+        """邮件没有送达，释放其中事件的通知账本指纹（下次检测到时重新通知）"""
+        if not message.get('ledger'):
+            return
+        try:
+            NotificationLedger(self.redis).release(message['recipient'], list(message['ledger']))
+        except Exception as e:
+            self.logger.warning(f"释放通知账本指纹失败: {message['id']} - {e}")
+
+    def retry_dead(self, message_id: str) -> bool:
+        """将死信重新放回待投递队列"""
+        message = self.get_message(message_id)
+        if not message or message['status'] != 'dead':
+            return False
+
+        message.update({'status': 'pending', 'attempts': 0, 'next_attempt_at': int(time.time())})
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.DEAD_KEY, message_id)
+        pipe.zadd(self.QUEUE_KEY, {message_id: message['next_attempt_at']})
+        self._save(pipe, message)
+        pipe.execute()
+        # 重新投递期间同一事件不再重复入队
+        if message.get('ledger'):
+            NotificationLedger(self.redis).record_each(message['recipient'], message['ledger'])
+        return True
+
+    def get_dead_letters(self, limit: int = 50) -> List[Dict]:
+        """获取最近的死信（不含邮件正文）"""
+        message_ids = [decode_value(m) for m in self.redis.zrevrange(self.DEAD_KEY, 0, limit - 1)]
+        if not message_ids:
+            return []
+        raw_messages = self.redis.mget([self._message_key(message_id) for message_id in message_ids])
+        dead = []
+        for raw in raw_messages:
+            if raw:
+                message = json.loads(decode_value(raw))
+                message.pop('body', None)
+                message.pop('text_body', None)
+                dead.append(message)
+        return dead
+
+    def get_stats(self) -> Dict:
+        """获取发件箱统计"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(self.QUEUE_KEY)
+        pipe.zcount(self.QUEUE_KEY, '-inf', int(time.time()))
+        pipe.zcard(self.DEAD_KEY)
+        pipe.hgetall(self.STATS_KEY)
+        pending, due, dead, totals = pipe.execute()
+        return {
+            'pending': pending,
+            'due': due,
+            'dead': dead,
+            'totals': {decode_value(k): int(decode_value(v)) for k, v in totals.items()}
+        }
@@ -0,0 +1,240 @@
+# 商品价格阈值提醒规则模块
+
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+from app.utils import decode_value
+from app.digest import NotificationDigest
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class PriceRuleEngine:
+    """商品价格提醒规则引擎 - 规则按商品ID建立有序阈值索引，只对发生价格变动的商品做范围查询"""
+
+    # Redis数据结构设计
+    # ==================
+    # 规则配置：price_rule:config (HASH, field=规则ID)
+    # {
+    #     "id": "rule_12",
+    #     "item_id": "123456789",
+    #     "store_name": "store_a",       # 只对该店铺的价格变动生效（为空表示不限店铺）
+    #     "below_price": 99.0,            # 价格跌破该值时提醒（可选）
+    #     "change_pct": 10.0,             # 单次涨跌幅达到该百分比时提醒（可选）
+    #     "notify_email": "user@example.com",
+    #     "status": "active",             # active, paused
+    #     "created_at": 1701234567
+    # }
+    # 规则ID计数器：price_rule:next_id
+    # 最近触发时间：price_rule:last_triggered (HASH, field=规则ID, value=时间戳，单独存放以便原子更新)
+    # 跌破价格索引：price_rule:item:{item_id}:below (ZSET, member=规则ID, score=阈值价格)
+    # 涨跌幅索引：price_rule:item:{item_id}:pct (ZSET, member=规则ID, score=阈值百分比)
+    # 触发的提醒加入收件人的通知摘要（见 NotificationDigest），与其他通知合并发送
+
+    CONFIG_KEY = "price_rule:config"
+    LAST_TRIGGERED_KEY = "price_rule:last_triggered"
+
+    def __init__(self, redis_client):
+        """初始化规则引擎"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _below_key(self, item_id: str) -> str:
+        return f"price_rule:item:{item_id}:below"
+
+    def _pct_key(self, item_id: str) -> str:
+        return f"price_rule:item:{item_id}:pct"
+
+    def _index_rule(self, pipe, rule: Dict):
+        """将规则写入阈值索引"""
+        if rule.get('below_price') is not None:
+            pipe.zadd(self._below_key(rule['item_id']), {rule['id']: rule['below_price']})
+        if rule.get('change_pct') is not None:
+            pipe.zadd(self._pct_key(rule['item_id']), {rule['id']: rule['change_pct']})
+
+    def _unindex_rule(self, pipe, rule: Dict):
+        """从阈值索引中移除规则"""
+        pipe.zrem(self._below_key(rule['item_id']), rule['id'])
+        pipe.zrem(self._pct_key(rule['item_id']), rule['id'])
+
+    def create_rule(self, item_id: str, notify_email: str, below_price: float = None,
+                    change_pct: float = None, store_name: str = None) -> Dict:
+        """创建价格提醒规则"""
+        if not item_id:
+            raise ValueError("商品ID不能为空")
+        if below_price is None and change_pct is None:
+            raise ValueError("至少需要设置跌破价格或涨跌幅其中一项")
+        if below_price is not None and below_price <= 0:
+            raise ValueError("跌破价格必须大于0")
+        if change_pct is not None and change_pct <= 0:
+            raise ValueError("涨跌幅必须大于0")
+
+        rule = {
+            'id': f"rule_{self.redis.incr('price_rule:next_id')}",
+            'item_id': str(item_id),
+            'store_name': store_name,
+            'below_price': float(below_price) if below_price is not None else None,
+            'change_pct': float(change_pct) if change_pct is not None else None,
+            'notify_email': notify_email,
+            'status': 'active',
+            'created_at': int(time.time())
+        }
+
+        pipe = self.redis.pipeline()
+        pipe.hset(self.CONFIG_KEY, rule['id'], json.dumps(rule))
+        self._index_rule(pipe, rule)
+        pipe.execute()
+
+        self.logger.info(f"创建价格提醒规则: {rule['id']} - 商品 {rule['item_id']}")
+        return dict(rule, last_triggered_at=None)
+
+    @staticmethod
+    def _load_rule(raw, last_triggered) -> Dict:
+        """解析规则配置并附加最近触发时间"""
+        rule = json.loads(decode_value(raw))
+        rule['last_triggered_at'] = int(last_triggered) if last_triggered else None
+        return rule
+
+    def get_rule(self, rule_id: str) -> Optional[Dict]:
+        """获取单条规则"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hget(self.CONFIG_KEY, rule_id)
+        pipe.hget(self.LAST_TRIGGERED_KEY, rule_id)
+        raw, last_triggered = pipe.execute()
+        return self._load_rule(raw, last_triggered) if raw else None
+
+    def get_rules(self, item_id: str = None) -> List[Dict]:
+        """获取所有规则，可按商品ID过滤"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self.CONFIG_KEY)
+        pipe.hgetall(self.LAST_TRIGGERED_KEY)
+        raw_rules, last_triggered = pipe.execute()
+        last_triggered = {decode_value(rule_id): value for rule_id, value in last_triggered.items()}
+        rules = [
+            self._load_rule(raw, last_triggered.get(decode_value(rule_id)))
+            for rule_id, raw in raw_rules.items()
+        ]
+        if item_id:
+            rules = [rule for rule in rules if rule['item_id'] == item_id]
+        return sorted(rules, key=lambda rule: rule.get('created_at', 0))
+
+    def delete_rule(self, rule_id: str) -> bool:
+        """删除规则"""
+        rule = self.get_rule(rule_id)
+        if not rule:
+            return False
+
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.CONFIG_KEY, rule_id)
+        pipe.hdel(self.LAST_TRIGGERED_KEY, rule_id)
+        self._unindex_rule(pipe, rule)
+        pipe.execute()
+        return True
+
+    def set_status(self, rule_id: str, status: str) -> Optional[Dict]:
+        """启用或暂停规则（暂停的规则不在索引中，不参与评估）"""
+        rule = self.get_rule(rule_id)
+        if not rule:
+            return None
+
+        rule['status'] = status
+        config = {key: value for key, value in rule.items() if key != 'last_triggered_at'}
+        pipe = self.redis.pipeline()
+        pipe.hset(self.CONFIG_KEY, rule_id, json.dumps(config))
+        if status == 'active':
+            self._index_rule(pipe, rule)
+        else:
+            self._unindex_rule(pipe, rule)
+        pipe.execute()
+        return rule
+
+    def evaluate_changes(self, store_name: str, price_changes: List[Dict]) -> List[Dict]:
+        """评估价格变动可能触发的规则，返回触发记录
+
+        每个变动只在该商品的阈值索引上做范围查询：跌破规则取阈值落在 (新价格, 旧价格] 的规则，
+        即价格由阈值之上跌到阈值之下；涨跌幅规则取阈值不超过本次变动幅度的规则。
+        """
+        candidates = []
+        pipe = self.redis.pipeline(transaction=False)
+        for change in price_changes:
+            item_id = change.get('item', {}).get('id')
+            old_price = change.get('old_price')
+            new_price = change.get('new_price')
+            if not item_id or not old_price or new_price is None:
+                continue
+            pct = abs(new_price - old_price) / old_price * 100
+            pipe.zrangebyscore(self._below_key(item_id), f"({new_price}", old_price)
+            pipe.zrangebyscore(self._pct_key(item_id), 0, pct)
+            candidates.append((change, pct))
+        if not candidates:
+            return []
+
+        responses = pipe.execute()
+        triggered = []
+        for index, (change, pct) in enumerate(candidates):
+            below_ids = [decode_value(rule_id) for rule_id in responses[index * 2]]
+            pct_ids = [decode_value(rule_id) for rule_id in responses[index * 2 + 1]]
+            for rule_id in below_ids:
+                triggered.append((rule_id, 'below', change, pct))
+            for rule_id in pct_ids:
+                if rule_id not in below_ids:
+                    triggered.append((rule_id, 'change_pct', change, pct))
+        if not triggered:
+            return []
+
+        raw_rules = self.redis.hmget(self.CONFIG_KEY, list({rule_id for rule_id, _, _, _ in triggered}))
+        rules = {rule['id']: rule for rule in (json.loads(decode_value(raw)) for raw in raw_rules if raw)}
+
+        now = int(time.time())
+        alerts = []
+        for rule_id, reason, change, pct in triggered:
+            rule = rules.get(rule_id)
+            if not rule or rule.get('status') != 'active':
+                continue
+            # 指定了店铺的规则只对该店铺的价格变动生效
+            if rule.get('store_name') and rule['store_name'] != store_name:
+                continue
+            item = change['item']
+            alerts.append({
+                'rule_id': rule_id,
+                'reason': reason,
+                'notify_email': rule['notify_email'],
+                'store_name': store_name,
+                'below_price': rule.get('below_price'),
+                'change_pct': rule.get('change_pct'),
+                'old_price': change['old_price'],
+                'new_price': change['new_price'],
+                'actual_pct': round(pct, 2),
+                'item': {
+                    'id': item.get('id'),
+                    'title': item.get('title'),
+                    'url': item.get('url'),
+                    'currency': item.get('currency'),
+                    'image_url': item.get('image_url')
+                },
+                'triggered_at': now
+            })
+        return alerts
+
+    def process_price_changes(self, store_name: str, price_changes: List[Dict]) -> int:
+        """评估价格变动，并将触发的提醒加入收件人的通知摘要"""
+        alerts = self.evaluate_changes(store_name, price_changes)
+        if not alerts:
+            return 0
+
+        by_recipient = {}
+        for alert in alerts:
+            by_recipient.setdefault(alert['notify_email'], []).append(alert)
+        digest = NotificationDigest(self.redis)
+        for recipient, recipient_alerts in by_recipient.items():
+            digest.add_price_rule_alerts(recipient, store_name, recipient_alerts)
+
+        # 记录规则最近触发时间（单独的HASH字段，直接覆盖写入，不需要读取规则配置）
+        self.redis.hset(self.LAST_TRIGGERED_KEY, mapping={
+            alert['rule_id']: alert['triggered_at'] for alert in alerts
+        })
+
+        self.logger.info(f"店铺 {store_name} 触发 {len(alerts)} 条价格提醒")
+        return len(alerts)
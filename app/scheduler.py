@@ -9,6 +9,8 @@ import os
 from logging.handlers import TimedRotatingFileHandler
 from app.improved_scraper import ImprovedEbayStoreScraper as EbayStoreScraper
 from app.notification import EmailNotifier
+from app.webhook import WebhookNotifier
+from app.config import Config
 import json
 import time
 
@@ -65,7 +67,8 @@ def init_scheduler(app):
         
         # 初始化爬虫和邮件通知
         scraper = EbayStoreScraper(redis_client=app.redis_client)
-        notifier = EmailNotifier()
+        notifier = EmailNotifier(redis_client=app.redis_client)
+        webhook = WebhookNotifier(app.redis_client)
         
         # 记录总体统计信息
         total_stats = {
@@ -144,6 +147,13 @@ def init_scheduler(app):
                 if emails_sent > 0:
                     total_stats['emails_sent'] += emails_sent
                 
+                # 配置了Webhook地址时推送变动事件（由 webhook_delivery_job 批量发送）
+                if store_data.get('webhook_url'):
+                    try:
+                        webhook.enqueue_store_changes(store_data['webhook_url'], store_name, changes)
+                    except Exception as e:
+                        scheduler_logger.error(f"加入Webhook事件失败: {store_name} - {str(e)}")
+                
                 store_end_time = time.time()
                 store_duration = store_end_time - store_start_time
                 
@@ -196,6 +206,7 @@ def init_scheduler(app):
             scheduler_logger.info(f"成功检查: {comparison_results['successful_checks']}")
             scheduler_logger.info(f"失败检查: {comparison_results['failed_checks']}")
             scheduler_logger.info(f"发送通知: {len(comparison_results['notifications_needed'])}个")
+            scheduler_logger.info(f"已提醒过（不重复通知）: {len(comparison_results['notifications_suppressed'])}个")
             
             # 统计邮件发送成功率
             email_success = sum(1 for n in comparison_results['notifications_needed'] if n.get('email_sent', False))
@@ -212,8 +223,101 @@ def init_scheduler(app):
         except Exception as e:
             scheduler_logger.error(f"执行价格对比检查时出错: {str(e)}", exc_info=True)
         
+        # 执行价格对比分组评估
+        try:
+            from app.comparison_groups import ComparisonGroupManager
+            group_stats = ComparisonGroupManager(app.redis_client).perform_all_groups(notifier)
+            if group_stats['total_groups']:
+                scheduler_logger.info(
+                    f"对比分组评估 - 分组: {group_stats['total_groups']}, "
+                    f"超过阈值: {group_stats['alerts']}, 已提醒过: {group_stats['suppressed']}, "
+                    f"发送邮件: {group_stats['emails_sent']}封"
+                )
+        except Exception as e:
+            scheduler_logger.error(f"执行价格对比分组评估时出错: {str(e)}", exc_info=True)
+        
         return total_stats
     
+    @scheduler.scheduled_job(
+        IntervalTrigger(seconds=Config.SNAPSHOT_COMPACT_INTERVAL),
+        id='snapshot_compaction_job'
+    )
+    def snapshot_compaction_job():
+        """按保留策略压缩店铺快照"""
+        if not app.redis_client:
+            return
+        
+        try:
+            from app.snapshots import SnapshotRegistry
+            from app.history import StoreHistory
+            from app.seen_registry import SeenRegistry
+            stats = SnapshotRegistry(app.redis_client).compact_all()
+            history_removed = StoreHistory(app.redis_client).prune_all()
+            seen_removed = SeenRegistry(app.redis_client).prune_all()
+            scheduler_logger.info(
+                f"快照压缩完成 - 店铺: {stats['stores']}, "
+                f"删除快照: {stats['removed_snapshots']}, 旧版快照设置过期: {stats['legacy_expired']}, "
+                f"清理历史记录: {history_removed}, 清理已见商品记录: {seen_removed}"
+            )
+        except Exception as e:
+            scheduler_logger.error(f"压缩店铺快照时出错: {str(e)}", exc_info=True)
+    
+    @scheduler.scheduled_job(
+        IntervalTrigger(seconds=Config.OUTBOX_POLL_INTERVAL),
+        id='outbox_delivery_job'
+    )
+    def outbox_delivery_job():
+        """投递发件箱中到期的邮件"""
+        if not app.redis_client:
+            return
+        
+        try:
+            from app.outbox import NotificationOutbox
+            NotificationOutbox(app.redis_client).deliver_due(EmailNotifier())
+        except Exception as e:
+            scheduler_logger.error(f"投递发件箱邮件时出错: {str(e)}", exc_info=True)
+    
+    @scheduler.scheduled_job(
+        IntervalTrigger(seconds=Config.DIGEST_FLUSH_INTERVAL),
+        id='digest_flush_job'
+    )
+    def digest_flush_job():
+        """为合并窗口已到期的收件人发送通知摘要"""
+        if not app.redis_client:
+            return
+        
+        try:
+            from app.digest import NotificationDigest
+            NotificationDigest(app.redis_client).flush_due(EmailNotifier(redis_client=app.redis_client))
+        except Exception as e:
+            scheduler_logger.error(f"发送通知摘要时出错: {str(e)}", exc_info=True)
+    
+    @scheduler.scheduled_job(
+        IntervalTrigger(seconds=Config.WEBHOOK_POLL_INTERVAL),
+        id='webhook_delivery_job'
+    )
+    def webhook_delivery_job():
+        """批量推送待发送的Webhook事件"""
+        if not app.redis_client:
+            return
+        
+        try:
+            WebhookNotifier(app.redis_client).deliver_due()
+        except Exception as e:
+            scheduler_logger.error(f"推送Webhook事件时出错: {str(e)}", exc_info=True)
+    
+    @scheduler.scheduled_job(id='comparison_history_migration_job')
+    def comparison_history_migration_job():
+        """启动时迁移一次旧版对比历史记录（已迁移时直接返回）"""
+        if not app.redis_client:
+            return
+        
+        try:
+            from app.comparison import PriceComparison
+            PriceComparison(app.redis_client).migrate_legacy_history()
+        except Exception as e:
+            scheduler_logger.error(f"迁移旧版对比历史时出错: {str(e)}", exc_info=True)
+    
     # 启动调度器
     scheduler.start()
     
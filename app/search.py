@@ -0,0 +1,224 @@
+# 商品标题全文搜索模块
+
+import re
+import math
+import json
+import hashlib
+import logging
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List
+from app.config import Config
+from app.utils import decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 中文汉字和日文假名没有词间空格，单字成词
+CJK_CHARS = '\u3041-\u3096\u30a1-\u30fa\u30fc\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+
+# 分词：汉字、假名单字成词；其他文字（拉丁字母、数字、韩文、西里尔字母等）的连续串成词
+TOKEN_PATTERN = re.compile(f'[{CJK_CHARS}]|[^\\W_{CJK_CHARS}]+')
+
+# 日文浊音、半浊音符号（去掉重音符号时保留，重新组合为浊音假名）
+KANA_VOICING_MARKS = {'\u3099', '\u309a'}
+
+# 常见停用词，不参与索引
+STOP_WORDS = {'a', 'an', 'and', 'the', 'for', 'of', 'in', 'on', 'to', 'with', 'by', 'or', 'at'}
+
+
+def tokenize(text: str) -> List[str]:
+    """将标题规范化并切分为词项"""
+    if not text:
+        return []
+    # 去掉拉丁字母的重音符号后重新组合（韩文音节、浊音假名分解后需要组合回来）
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    normalized = ''.join(ch for ch in normalized if not unicodedata.combining(ch) or ch in KANA_VOICING_MARKS)
+    normalized = unicodedata.normalize('NFC', normalized)
+    return [token for token in TOKEN_PATTERN.findall(normalized) if token not in STOP_WORDS]
+
+
+class TitleSearchIndex:
+    """商品标题倒排索引 - 由店铺更新的差异结果增量维护，支持跨店铺排名搜索"""
+
+    # Redis数据结构设计
+    # ==================
+    # 倒排表：search:token:{token} (ZSET, member=商品ID, score=词频/sqrt(标题词数))
+    # 文档词项：search:doc_tokens (HASH, field=商品ID, value=空格分隔的词项)
+    # 已建立索引的店铺：search:stores (SET)
+    # 索引版本：search:version (每次增删商品时递增，用于失效查询缓存)
+    # 查询结果缓存：search:query:{signature} (ZSET, 短期过期，签名包含索引版本)
+
+    DOC_TOKENS_KEY = "search:doc_tokens"
+    STORES_KEY = "search:stores"
+    VERSION_KEY = "search:version"
+
+    def __init__(self, redis_client):
+        """初始化搜索索引"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def _token_key(self, token: str) -> str:
+        return f"search:token:{token}"
+
+    def add_items(self, items: Iterable[Dict]):
+        """将商品标题加入索引（已存在的商品会先移除旧词项）"""
+        items = [item for item in items if item.get('id')]
+        if not items:
+            return
+
+        self.remove_items([item['id'] for item in items])
+
+        pipe = self.redis.pipeline(transaction=False)
+        doc_tokens = {}
+        for item in items:
+            tokens = tokenize(item.get('title', ''))
+            if not tokens:
+                continue
+            weight = 1.0 / math.sqrt(len(tokens))
+            for token, count in Counter(tokens).items():
+                pipe.zadd(self._token_key(token), {item['id']: round(count * weight, 4)})
+            doc_tokens[item['id']] = ' '.join(sorted(set(tokens)))
+        if doc_tokens:
+            pipe.hset(self.DOC_TOKENS_KEY, mapping=doc_tokens)
+            pipe.incr(self.VERSION_KEY)
+        pipe.execute()
+
+    def remove_items(self, item_ids: List[str]):
+        """从索引中移除商品"""
+        item_ids = [item_id for item_id in item_ids if item_id]
+        if not item_ids:
+            return
+
+        for start in range(0, len(item_ids), 1000):
+            batch = item_ids[start:start + 1000]
+            stored_tokens = self.redis.hmget(self.DOC_TOKENS_KEY, batch)
+
+            pipe = self.redis.pipeline(transaction=False)
+            indexed = []
+            for item_id, tokens in zip(batch, stored_tokens):
+                if not tokens:
+                    continue
+                indexed.append(item_id)
+                for token in decode_value(tokens).split():
+                    pipe.zrem(self._token_key(token), item_id)
+            if indexed:
+                pipe.hdel(self.DOC_TOKENS_KEY, *indexed)
+                pipe.incr(self.VERSION_KEY)
+            pipe.execute()
+
+    def update_store(self, store_name: str, current_items: List[Dict],
+                     new_items: List[Dict] = None, removed_items: List[Dict] = None):
+        """根据差异结果增量更新索引，店铺首次索引时登记全部当前商品"""
+        if not self.redis.sismember(self.STORES_KEY, store_name):
+            self.add_items(current_items)
+            self.redis.sadd(self.STORES_KEY, store_name)
+            self.logger.info(f"建立店铺 {store_name} 的标题索引 ({len(current_items)} 个商品)")
+            return
+
+        if new_items:
+            self.add_items(new_items)
+        if removed_items:
+            self.remove_items([item.get('id') for item in removed_items])
+
+    def remove_store(self, store_name: str):
+        """删除店铺时移除其所有商品的索引"""
+        item_ids = [decode_value(item_id) for item_id in self.redis.smembers(f"store:{store_name}:item_ids")]
+        self.remove_items(item_ids)
+        self.redis.srem(self.STORES_KEY, store_name)
+
+    def search(self, query: str, store_name: str = None, page: int = 1, per_page: int = 20) -> Dict:
+        """搜索商品标题，按TF-IDF得分排序并分页"""
+        tokens = sorted(set(tokenize(query)))
+        page = max(page, 1)
+        per_page = max(1, min(per_page, Config.SEARCH_MAX_PER_PAGE))
+        empty = {'query': query, 'tokens': tokens, 'results': [], 'total': 0, 'page': page, 'per_page': per_page}
+        if not tokens:
+            return empty
+
+        # 计算每个词项的逆文档频率
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.VERSION_KEY)
+        pipe.hlen(self.DOC_TOKENS_KEY)
+        for token in tokens:
+            pipe.zcard(self._token_key(token))
+        version, total_docs, *counts = pipe.execute()
+        total_docs = total_docs or 1
+        weights = {
+            self._token_key(token): math.log(1 + total_docs / df)
+            for token, df in zip(tokens, counts) if df
+        }
+        if not weights:
+            return empty
+
+        # 优先要求包含所有词项，没有结果时放宽为包含任意词项
+        # 缓存键包含索引版本，索引更新后不再使用旧结果
+        version = decode_value(version) or '0'
+        signature = hashlib.sha1(json.dumps([version, tokens, store_name]).encode('utf-8')).hexdigest()[:16]
+        result_key = f"search:query:{signature}"
+        if not self.redis.exists(result_key):
+            store_weights = dict(weights)
+            if store_name:
+                store_weights[f"store:{store_name}:item_ids"] = 0
+
+            pipe = self.redis.pipeline()
+            if len(weights) == len(tokens):
+                pipe.zinterstore(result_key, store_weights)
+            pipe.expire(result_key, Config.SEARCH_CACHE_TTL)
+            pipe.execute()
+
+            if not self.redis.zcard(result_key) and len(tokens) > 1:
+                union_key = f"{result_key}:any"
+                pipe = self.redis.pipeline()
+                pipe.zunionstore(union_key, weights)
+                if store_name:
+                    pipe.zinterstore(result_key, {union_key: 1, f"store:{store_name}:item_ids": 0})
+                    pipe.unlink(union_key)
+                else:
+                    pipe.rename(union_key, result_key)
+                pipe.expire(result_key, Config.SEARCH_CACHE_TTL)
+                pipe.execute()
+
+        start = (page - 1) * per_page
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrevrange(result_key, start, start + per_page - 1, withscores=True)
+        pipe.zcard(result_key)
+        rows, total = pipe.execute()
+
+        results = self._load_results([(decode_value(member), score) for member, score in rows])
+        return {
+            'query': query,
+            'tokens': tokens,
+            'results': results,
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        }
+
+    def _load_results(self, rows: List) -> List[Dict]:
+        """批量获取搜索结果对应的商品数据"""
+        if not rows:
+            return []
+
+        item_ids = [item_id for item_id, _ in rows]
+        stores = self.redis.hmget("item:store_index", item_ids)
+
+        pipe = self.redis.pipeline(transaction=False)
+        for item_id, store_name in zip(item_ids, stores):
+            pipe.hget(f"store:{decode_value(store_name)}:item_data", item_id)
+        raw_items = pipe.execute()
+
+        results = []
+        for (item_id, score), store_name, raw in zip(rows, stores, raw_items):
+            item = json.loads(decode_value(raw)) if raw else {'id': item_id}
+            results.append({
+                'id': item_id,
+                'store_name': decode_value(store_name),
+                'score': round(score, 4),
+                'title': item.get('title'),
+                'price': item.get('price'),
+                'currency': item.get('currency'),
+                'url': item.get('url'),
+                'image_url': item.get('image_url')
+            })
+        return results
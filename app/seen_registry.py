@@ -0,0 +1,159 @@
+# 已见商品登记模块（记录店铺出现过的所有商品ID，区分真正的新上架和重新出现的旧商品）
+
+import time
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import Config
+from app.utils import decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class SeenRegistry:
+    """已见商品登记表 - 布隆过滤器记录所有出现过的商品，精确记录保存近期商品的首次/最近出现时间"""
+
+    # Redis数据结构设计
+    # ==================
+    # 有登记表的店铺：seen:stores (SET)
+    # 布隆过滤器：seen:{store_name}:bloom (BITMAP, SEEN_BLOOM_BITS 位, SEEN_BLOOM_HASHES 个哈希函数)
+    # 精确记录：seen:{store_name}:items (HASH, item_id -> "{first_seen}:{last_seen}")
+    # 超过 SEEN_EXACT_RETENTION_DAYS 天未出现的商品从精确记录中移除，之后只由布隆过滤器判断是否出现过
+
+    STORES_KEY = "seen:stores"
+
+    def __init__(self, redis_client, bloom_bits: int = None, bloom_hashes: int = None):
+        """初始化已见商品登记表"""
+        self.redis = redis_client
+        self.bloom_bits = bloom_bits or Config.SEEN_BLOOM_BITS
+        self.bloom_hashes = bloom_hashes or Config.SEEN_BLOOM_HASHES
+        self.logger = logger
+
+    def _bloom_key(self, store_name: str) -> str:
+        return f"seen:{store_name}:bloom"
+
+    def _items_key(self, store_name: str) -> str:
+        return f"seen:{store_name}:items"
+
+    def _bit_positions(self, item_id: str) -> List[int]:
+        """商品ID在布隆过滤器中的位置（双重哈希）"""
+        digest = hashlib.blake2b(str(item_id).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.bloom_hashes)]
+
+    @staticmethod
+    def _parse_entry(value) -> Optional[Dict]:
+        value = decode_value(value)
+        if not value:
+            return None
+        first_seen, _, last_seen = value.partition(':')
+        return {'first_seen': int(first_seen), 'last_seen': int(last_seen or first_seen)}
+
+    def is_initialized(self, store_name: str) -> bool:
+        """店铺是否已有登记表"""
+        return bool(self.redis.sismember(self.STORES_KEY, store_name))
+
+    def _bloom_contains(self, store_name: str, item_ids: List[str]) -> List[bool]:
+        """布隆过滤器判断（False 表示一定没出现过，True 表示可能出现过）"""
+        if not item_ids:
+            return []
+        key = self._bloom_key(store_name)
+        pipe = self.redis.pipeline(transaction=False)
+        for item_id in item_ids:
+            for position in self._bit_positions(item_id):
+                pipe.getbit(key, position)
+        bits = pipe.execute()
+        return [
+            all(bits[index * self.bloom_hashes:(index + 1) * self.bloom_hashes])
+            for index in range(len(item_ids))
+        ]
+
+    def lookup(self, store_name: str, item_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """查询商品是否出现过：先查精确记录，没有记录的再查布隆过滤器，从未出现过的为 None"""
+        found = {}
+        missing = []
+        for start in range(0, len(item_ids), 1000):
+            batch = item_ids[start:start + 1000]
+            for item_id, value in zip(batch, self.redis.hmget(self._items_key(store_name), batch)):
+                entry = self._parse_entry(value)
+                if entry:
+                    entry['source'] = 'exact'
+                    found[item_id] = entry
+                else:
+                    missing.append(item_id)
+
+        for item_id, maybe_seen in zip(missing, self._bloom_contains(store_name, missing)):
+            # 精确记录已过期的旧商品（或极少数布隆过滤器误判）
+            found[item_id] = {'first_seen': None, 'last_seen': None, 'source': 'bloom'} if maybe_seen else None
+        return found
+
+    def split_new(self, store_name: str, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """把商品分为从未出现过的（真正的新上架）和之前出现过的（重新上架、翻页位置变化）"""
+        seen = self.lookup(store_name, [item.get('id') for item in items if item.get('id')])
+        new_items = [item for item in items if not seen.get(item.get('id'))]
+        reappeared = [item for item in items if seen.get(item.get('id'))]
+        return new_items, reappeared
+
+    def record(self, store_name: str, items: Iterable[Dict], timestamp: int = None) -> int:
+        """登记本次出现的商品（保留首次出现时间，更新最近出现时间），返回首次登记的商品数"""
+        timestamp = int(timestamp or time.time())
+        item_ids = list(dict.fromkeys(item.get('id') for item in items if item.get('id')))
+        items_key = self._items_key(store_name)
+        bloom_key = self._bloom_key(store_name)
+
+        registered = 0
+        for start in range(0, len(item_ids), 1000):
+            batch = item_ids[start:start + 1000]
+            existing = self.redis.hmget(items_key, batch)
+
+            mapping = {}
+            pipe = self.redis.pipeline(transaction=False)
+            for item_id, value in zip(batch, existing):
+                entry = self._parse_entry(value)
+                if entry:
+                    mapping[item_id] = f"{entry['first_seen']}:{timestamp}"
+                else:
+                    # 没有精确记录的商品（首次出现或精确记录已过期）写入布隆过滤器
+                    mapping[item_id] = f"{timestamp}:{timestamp}"
+                    registered += 1
+                    for position in self._bit_positions(item_id):
+                        pipe.setbit(bloom_key, position, 1)
+            pipe.hset(items_key, mapping=mapping)
+            pipe.execute()
+
+        self.redis.sadd(self.STORES_KEY, store_name)
+        return registered
+
+    def get_item(self, store_name: str, item_id: str) -> Optional[Dict]:
+        """查询单个商品的登记信息"""
+        return self.lookup(store_name, [item_id]).get(item_id)
+
+    def prune(self, store_name: str, retention_days: int = None) -> int:
+        """移除长时间未出现的商品的精确记录（仍保留在布隆过滤器中），返回移除的数量"""
+        retention_days = retention_days or Config.SEEN_EXACT_RETENTION_DAYS
+        cutoff = int(time.time()) - retention_days * 86400
+        items_key = self._items_key(store_name)
+
+        stale = []
+        removed = 0
+        for item_id, value in self.redis.hscan_iter(items_key, count=1000):
+            entry = self._parse_entry(value)
+            if entry and entry['last_seen'] < cutoff:
+                stale.append(item_id)
+            if len(stale) >= 1000:
+                removed += self.redis.hdel(items_key, *stale)
+                stale = []
+        if stale:
+            removed += self.redis.hdel(items_key, *stale)
+        return removed
+
+    def prune_all(self) -> int:
+        """清理所有店铺的过期精确记录"""
+        removed = 0
+        for store_name in self.redis.smembers(self.STORES_KEY):
+            removed += self.prune(decode_value(store_name))
+        if removed:
+            self.logger.info(f"已见商品登记表清理完成，移除 {removed} 条过期精确记录")
+        return removed
@@ -0,0 +1,294 @@
+# 店铺快照注册表模块
+
+import json
+import time
+import bisect
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.config import Config
+from app.utils import json_dumps, decode_value
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 计算增量时忽略的易变字段（每次爬取都会变化）
+VOLATILE_FIELDS = ('timestamp',)
+
+
+def normalize_items(items: Optional[List[Dict]]) -> List[Dict]:
+    """将商品列表规范化为纯JSON结构（datetime等转为字符串），便于比较"""
+    return json.loads(json_dumps(items or []))
+
+
+def compute_items_delta(base_items: List[Dict], items: List[Dict]) -> Dict:
+    """计算两份商品列表之间的增量（新增、删除、变动字段）"""
+    base_dict = {item.get('id'): item for item in base_items if item.get('id')}
+    current_dict = {item.get('id'): item for item in items if item.get('id')}
+
+    added = {}
+    changed = {}
+    for item_id, item in current_dict.items():
+        old_item = base_dict.get(item_id)
+        if old_item is None:
+            added[item_id] = item
+            continue
+
+        set_fields = {
+            field: value for field, value in item.items()
+            if field not in VOLATILE_FIELDS and (field not in old_item or old_item[field] != value)
+        }
+        unset_fields = [
+            field for field in old_item
+            if field not in VOLATILE_FIELDS and field not in item
+        ]
+        if set_fields or unset_fields:
+            changed[item_id] = {'set': set_fields, 'unset': unset_fields}
+
+    removed = [item_id for item_id in base_dict if item_id not in current_dict]
+
+    return {
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        # 保留商品顺序（只存ID），还原时按此顺序输出
+        'order': [item.get('id') for item in items if item.get('id')]
+    }
+
+
+def apply_items_delta(base_items: List[Dict], delta: Dict, timestamp: int = None) -> List[Dict]:
+    """将增量应用到基准商品列表，返回新的商品列表"""
+    items_dict = {item.get('id'): dict(item) for item in base_items if item.get('id')}
+
+    for item_id in delta.get('removed', []):
+        items_dict.pop(item_id, None)
+
+    for item_id, patch in delta.get('changed', {}).items():
+        item = items_dict.get(item_id)
+        if item is None:
+            continue
+        item.update(patch.get('set', {}))
+        for field in patch.get('unset', []):
+            item.pop(field, None)
+
+    for item_id, item in delta.get('added', {}).items():
+        items_dict[item_id] = dict(item)
+
+    order = delta.get('order')
+    if order is None:
+        order = list(items_dict.keys())
+
+    items = [items_dict[item_id] for item_id in order if item_id in items_dict]
+
+    # 易变字段不参与增量，还原时统一使用快照时间
+    if timestamp:
+        for item in items:
+            item['timestamp'] = timestamp
+
+    return items
+
+
+def delta_is_empty(delta: Dict) -> bool:
+    """判断增量是否没有任何商品变化"""
+    return not (delta.get('added') or delta.get('removed') or delta.get('changed'))
+
+
+class SnapshotRegistry:
+    """店铺快照注册表 - 每日关键帧 + 相对关键帧的增量，按保留策略压缩"""
+
+    # Redis数据结构设计
+    # ==================
+    # 已登记快照的店铺：snapshot:stores (SET)
+    # 快照索引：snapshot:{store_name}:index (ZSET, member=时间戳, score=时间戳)
+    # 关键帧索引：snapshot:{store_name}:keyframes (ZSET, member=时间戳, score=时间戳)
+    # 快照数据：snapshot:{store_name}:{timestamp}
+    # 关键帧: {"type": "keyframe", "timestamp": 1701234567, "items": [...]}
+    # 增量:   {"type": "delta", "timestamp": 1701238167, "base": 1701234567, "delta": {...}}
+
+    STORES_KEY = "snapshot:stores"
+
+    def __init__(self, redis_client, keep_last: int = None, keyframe_days: int = None):
+        """初始化快照注册表"""
+        self.redis = redis_client
+        self.keep_last = keep_last if keep_last is not None else Config.SNAPSHOT_KEEP_LAST
+        self.keyframe_days = keyframe_days if keyframe_days is not None else Config.SNAPSHOT_KEYFRAME_DAYS
+        self.logger = logger
+
+    def _index_key(self, store_name: str) -> str:
+        return f"snapshot:{store_name}:index"
+
+    def _keyframes_key(self, store_name: str) -> str:
+        return f"snapshot:{store_name}:keyframes"
+
+    def snapshot_key(self, store_name: str, timestamp: int) -> str:
+        """获取快照数据的Redis键"""
+        return f"snapshot:{store_name}:{timestamp}"
+
+    @staticmethod
+    def _day(timestamp: int) -> str:
+        return datetime.fromtimestamp(timestamp).strftime('%Y%m%d')
+
+    def _latest_keyframe(self, store_name: str) -> Optional[int]:
+        """获取最近的关键帧时间戳"""
+        latest = self.redis.zrevrange(self._keyframes_key(store_name), 0, 0)
+        if not latest:
+            return None
+        return int(decode_value(latest[0]))
+
+    def _load_record(self, store_name: str, timestamp: int) -> Optional[Dict]:
+        raw = self.redis.get(self.snapshot_key(store_name, timestamp))
+        if not raw:
+            return None
+        try:
+            return json.loads(decode_value(raw))
+        except Exception as e:
+            self.logger.error(f"解析快照数据失败: {store_name} - {timestamp}: {e}")
+            return None
+
+    def save_snapshot(self, store_name: str, items: List[Dict], timestamp: int = None) -> str:
+        """登记一份快照，每天的第一份为关键帧，其余保存为相对关键帧的增量"""
+        timestamp = int(timestamp or time.time())
+        items = normalize_items(items)
+
+        record = None
+        keyframe_ts = self._latest_keyframe(store_name)
+        if (keyframe_ts is not None and keyframe_ts != timestamp
+                and self._day(keyframe_ts) == self._day(timestamp)):
+            keyframe = self._load_record(store_name, keyframe_ts)
+            if keyframe and keyframe.get('type') == 'keyframe':
+                record = {
+                    'type': 'delta',
+                    'timestamp': timestamp,
+                    'base': keyframe_ts,
+                    'delta': compute_items_delta(keyframe.get('items', []), items)
+                }
+
+        is_keyframe = record is None
+        if is_keyframe:
+            record = {
+                'type': 'keyframe',
+                'timestamp': timestamp,
+                'items': items
+            }
+
+        key = self.snapshot_key(store_name, timestamp)
+        pipe = self.redis.pipeline()
+        pipe.set(key, json_dumps(record))
+        pipe.zadd(self._index_key(store_name), {str(timestamp): timestamp})
+        if is_keyframe:
+            pipe.zadd(self._keyframes_key(store_name), {str(timestamp): timestamp})
+        pipe.sadd(self.STORES_KEY, store_name)
+        pipe.execute()
+
+        self.logger.info(f"登记店铺快照: {store_name} - {timestamp} ({record['type']}, {len(items)} 个商品)")
+        return key
+
+    def get_snapshot(self, store_name: str, timestamp: int) -> Optional[List[Dict]]:
+        """还原指定时间戳的快照商品列表"""
+        record = self._load_record(store_name, timestamp)
+        if not record:
+            return None
+
+        if record.get('type') == 'keyframe':
+            return record.get('items', [])
+
+        keyframe = self._load_record(store_name, record.get('base'))
+        if not keyframe:
+            self.logger.error(f"快照 {store_name} - {timestamp} 的关键帧缺失: {record.get('base')}")
+            return None
+
+        return apply_items_delta(keyframe.get('items', []), record.get('delta', {}), timestamp)
+
+    def list_snapshots(self, store_name: str) -> List[Dict]:
+        """列出店铺的所有快照（最新的在前面）"""
+        timestamps = [int(decode_value(ts)) for ts in self.redis.zrevrange(self._index_key(store_name), 0, -1)]
+        keyframes = {int(decode_value(ts)) for ts in self.redis.zrange(self._keyframes_key(store_name), 0, -1)}
+
+        return [
+            {'timestamp': ts, 'type': 'keyframe' if ts in keyframes else 'delta'}
+            for ts in timestamps
+        ]
+
+    def compact(self, store_name: str, now: int = None) -> int:
+        """按保留策略压缩单个店铺的快照：保留最近N个 + 保留期内的每日关键帧"""
+        now = int(now or time.time())
+        timestamps = [int(decode_value(ts)) for ts in self.redis.zrange(self._index_key(store_name), 0, -1)]
+        keyframes = sorted(int(decode_value(ts)) for ts in self.redis.zrange(self._keyframes_key(store_name), 0, -1))
+
+        if not timestamps:
+            self.redis.srem(self.STORES_KEY, store_name)
+            return 0
+
+        keep = set(timestamps[-self.keep_last:]) if self.keep_last > 0 else set()
+
+        # 保留的增量依赖其生成时最近的关键帧
+        for ts in list(keep):
+            position = bisect.bisect_right(keyframes, ts)
+            if position > 0:
+                keep.add(keyframes[position - 1])
+
+        cutoff = now - self.keyframe_days * 24 * 3600
+        keep.update(ts for ts in keyframes if ts >= cutoff)
+
+        removed = [ts for ts in timestamps if ts not in keep]
+        if not removed:
+            return 0
+
+        pipe = self.redis.pipeline()
+        for start in range(0, len(removed), 500):
+            batch = removed[start:start + 500]
+            pipe.unlink(*[self.snapshot_key(store_name, ts) for ts in batch])
+            pipe.zrem(self._index_key(store_name), *[str(ts) for ts in batch])
+            pipe.zrem(self._keyframes_key(store_name), *[str(ts) for ts in batch])
+        pipe.execute()
+
+        self.logger.info(f"压缩店铺快照: {store_name} - 删除 {len(removed)} 个，保留 {len(keep)} 个")
+        return len(removed)
+
+    def expire_legacy_snapshots(self, batch_size: int = 500) -> int:
+        """为旧版无过期时间的all_items_*键设置过期时间"""
+        expired = 0
+        batch = []
+        for key in self.redis.scan_iter(match="all_items_*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                expired += self._expire_batch(batch)
+                batch = []
+        if batch:
+            expired += self._expire_batch(batch)
+        return expired
+
+    def _expire_batch(self, keys: List) -> int:
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+        ttls = pipe.execute()
+
+        persistent = [key for key, ttl in zip(keys, ttls) if ttl == -1]
+        if not persistent:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for key in persistent:
+            pipe.expire(key, Config.SNAPSHOT_LEGACY_TTL)
+        pipe.execute()
+        return len(persistent)
+
+    def compact_all(self) -> Dict:
+        """压缩所有店铺的快照，并处理旧版快照键"""
+        stats = {'stores': 0, 'removed_snapshots': 0, 'legacy_expired': 0}
+
+        for store_name in self.redis.smembers(self.STORES_KEY):
+            store_name = decode_value(store_name)
+            try:
+                stats['removed_snapshots'] += self.compact(store_name)
+                stats['stores'] += 1
+            except Exception as e:
+                self.logger.error(f"压缩店铺快照时出错: {store_name} - {str(e)}")
+
+        try:
+            stats['legacy_expired'] = self.expire_legacy_snapshots()
+        except Exception as e:
+            self.logger.error(f"处理旧版快照键时出错: {str(e)}")
+
+        return stats
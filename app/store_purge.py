@@ -0,0 +1,113 @@
+# 店铺数据清理模块
+
+import re
+import time
+import logging
+import threading
+from typing import Dict, List
+from app.config import Config
+from app.utils import decode_value
+from app.item_index import ItemStoreIndex
+from app.search import TitleSearchIndex
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class StorePurger:
+    """店铺数据清理 - SCAN游标枚举店铺键，分批流水线UNLINK，大店铺交给后台线程"""
+
+    def __init__(self, redis_client, batch_size: int = None, background_threshold: int = None):
+        """初始化店铺清理器"""
+        self.redis = redis_client
+        self.batch_size = batch_size or Config.STORE_PURGE_BATCH_SIZE
+        self.background_threshold = background_threshold or Config.STORE_PURGE_BACKGROUND_THRESHOLD
+        self.logger = logger
+
+    @staticmethod
+    def _escape_pattern(value: str) -> str:
+        """转义SCAN匹配模式中的通配符"""
+        return re.sub(r'([*?\[\]\\])', r'\\\1', value)
+
+    def _key_patterns(self, store_name: str) -> List[str]:
+        """店铺相关的所有键模式"""
+        name = self._escape_pattern(store_name)
+        return [
+            f"store:{name}:*",
+            f"history:{name}:*",
+            f"snapshot:{name}:*",
+            f"seen:{name}:*"
+        ]
+
+    def purge_store(self, store_name: str, background: bool = None) -> Dict:
+        """删除店铺监控及其所有数据"""
+        # 先在一个事务中移除监控配置和主要数据键，店铺立即对所有读取方不可见
+        pipe = self.redis.pipeline()
+        pipe.unlink(
+            f"monitor:store:{store_name}",
+            f"store:{store_name}:items",
+            f"store:{store_name}:last_update",
+            f"store:{store_name}:stats",
+            f"changes:store:{store_name}"
+        )
+        pipe.srem("history:stores", store_name)
+        pipe.srem("snapshot:stores", store_name)
+        pipe.srem("seen:stores", store_name)
+        pipe.scard(f"store:{store_name}:item_ids")
+        item_count = pipe.execute()[-1]
+
+        if background is None:
+            background = item_count >= self.background_threshold
+
+        if background:
+            thread = threading.Thread(
+                target=self._purge_remaining,
+                args=(store_name,),
+                name=f"purge-store-{store_name}",
+                daemon=True
+            )
+            thread.start()
+            self.logger.info(f"店铺 {store_name} 有 {item_count} 个商品，已转入后台清理")
+            return {'store_name': store_name, 'background': True, 'deleted_keys': None}
+
+        deleted = self._purge_remaining(store_name)
+        return {'store_name': store_name, 'background': False, 'deleted_keys': deleted}
+
+    def _purge_remaining(self, store_name: str) -> int:
+        """清理索引并删除店铺剩余的键"""
+        start_time = time.time()
+        deleted = 0
+        try:
+            # 搜索索引和反向索引依赖店铺商品集合，需在删除店铺键之前清理
+            TitleSearchIndex(self.redis).remove_store(store_name)
+            ItemStoreIndex(self.redis).remove_store(store_name)
+
+            for pattern in self._key_patterns(store_name):
+                deleted += self._unlink_matching(pattern)
+
+            self.logger.info(f"店铺 {store_name} 数据清理完成，删除 {deleted} 个键，"
+                             f"耗时 {time.time() - start_time:.2f} 秒")
+        except Exception as e:
+            self.logger.error(f"清理店铺 {store_name} 数据时出错: {str(e)}", exc_info=True)
+        return deleted
+
+    def _unlink_matching(self, pattern: str) -> int:
+        """使用SCAN枚举匹配的键并分批UNLINK"""
+        deleted = 0
+        batch = []
+        for key in self.redis.scan_iter(match=pattern, count=self.batch_size):
+            batch.append(decode_value(key))
+            if len(batch) >= self.batch_size:
+                deleted += self._unlink_batch(batch)
+                batch = []
+        if batch:
+            deleted += self._unlink_batch(batch)
+        return deleted
+
+    def _unlink_batch(self, keys: List[str]) -> int:
+        """一次往返内发送多条UNLINK命令"""
+        pipe = self.redis.pipeline(transaction=False)
+        for start in range(0, len(keys), 100):
+            pipe.unlink(*keys[start:start + 100])
+        pipe.execute()
+        return len(keys)
@@ -4,6 +4,7 @@ import re
 import urllib.parse
 import logging
 import json
+import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -65,4 +66,41 @@ def json_dumps(obj):
 
 def json_loads(json_str):
     """JSON反序列化函数"""
-    return json.loads(json_str)
\ No newline at end of file
+    return json.loads(json_str)
+
+def decode_value(value):
+    """将Redis返回的bytes解码为字符串，其他类型原样返回"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+# 令牌匹配时才删除锁（锁已超时并被其他进程获取时不会误删）
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def acquire_lock(redis_client, key, timeout):
+    """获取带随机令牌的互斥锁，成功时返回令牌，已被占用时返回None"""
+    token = uuid.uuid4().hex
+    if redis_client.set(key, token, nx=True, ex=timeout):
+        return token
+    return None
+
+def release_lock(redis_client, key, token):
+    """释放自己持有的锁，返回是否释放成功"""
+    return bool(redis_client.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+
+# 令牌匹配时才延长锁的过期时间（毫秒）
+EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+def extend_lock(redis_client, key, token, timeout):
+    """延长自己持有的锁（重新计时 timeout 秒），锁已超时或被其他进程持有时返回False"""
+    return bool(redis_client.eval(EXTEND_LOCK_SCRIPT, 1, key, token, int(timeout * 1000)))
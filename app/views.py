@@ -6,6 +6,17 @@ import time
 from app.improved_scraper import ImprovedEbayStoreScraper as EbayStoreScraper
 from app.notification import EmailNotifier
 from app.comparison import PriceComparison
+from app.item_index import ItemStoreIndex
+from app.item_query import ItemQueryIndex
+from app.search import TitleSearchIndex
+from app.store_purge import StorePurger
+from app.watchlist import Watchlist
+from app.price_rules import PriceRuleEngine
+from app.comparison_groups import ComparisonGroupManager
+from app.outbox import NotificationOutbox
+from app.webhook import WebhookNotifier
+from app.change_stream import ChangeStream, InvalidCursor
+from app.seen_registry import SeenRegistry
 import re
 import urllib.parse
 from app.utils import is_valid_ebay_url
@@ -30,6 +41,7 @@ def add_store():
     try:
         store_url = request.form.get('store_url')
         notify_email = request.form.get('notify_email')
+        webhook_url = (request.form.get('webhook_url') or '').strip() or None
         
         # 使用通用验证函数
         if not is_valid_ebay_url(store_url):
@@ -38,6 +50,13 @@ def add_store():
                 'message': '请提供有效的eBay店铺URL'
             })
         
+        webhook_error = WebhookNotifier.check_url(webhook_url) if webhook_url else None
+        if webhook_error:
+            return jsonify({
+                'success': False,
+                'message': webhook_error
+            })
+        
         # 验证邮箱格式
         if notify_email and not re.match(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$', notify_email):
             return jsonify({
@@ -73,7 +92,8 @@ def add_store():
             'name': store_name,
             'url': store_url,
             'added_at': int(time.time()),
-            'notify_email': notify_email
+            'notify_email': notify_email,
+            'webhook_url': webhook_url
         }
         
         # 保存到Redis
@@ -115,22 +135,26 @@ def dashboard():
             # 如果店铺不存在，重定向到仪表盘首页
             return redirect(url_for('main.dashboard'))
         
-        # 获取该店铺的所有商品
-        items_json = current_app.redis_client.get(f"store:{store_name}:items")
-        if items_json:
-            items_data = json.loads(items_json)
-            
-            # 统计总商品数
-            total_items = len(items_data)
-            
+        # 从查询索引中只读取当前页的商品
+        query_index = ItemQueryIndex(current_app.redis_client)
+        page_data = query_index.get_page(store_name, page, per_page)
+        total_items = page_data['total']
+        paginated_items = page_data['items']
+        
+        # 索引尚未建立时回退到完整商品列表
+        if not total_items:
+            items_json = current_app.redis_client.get(f"store:{store_name}:items")
+            if items_json:
+                items_data = json.loads(items_json)
+                total_items = len(items_data)
+                start = (page - 1) * per_page
+                end = min(start + per_page, total_items)
+                paginated_items = items_data[start:end]
+        
+        if total_items:
             # 计算总页数
             pages = (total_items + per_page - 1) // per_page
             
-            # 对数据分页
-            start = (page - 1) * per_page
-            end = min(start + per_page, total_items)
-            paginated_items = items_data[start:end]
-            
             # 获取店铺信息
             try:
                 store_data = json.loads(store_data_json)
@@ -184,12 +208,13 @@ def get_all_stores():
                 # 获取附加信息
                 store_name = store_data.get('name')
                 
-                # 商品数量
-                items_json = current_app.redis_client.get(f"store:{store_name}:items")
-                item_count = 0
-                if items_json:
-                    items = json.loads(items_json.decode('utf-8') if isinstance(items_json, bytes) else items_json)
-                    item_count = len(items)
+                # 商品数量（优先使用查询索引，避免解析完整商品列表）
+                item_count = ItemQueryIndex(current_app.redis_client).count_items(store_name)
+                if not item_count:
+                    items_json = current_app.redis_client.get(f"store:{store_name}:items")
+                    if items_json:
+                        items = json.loads(items_json.decode('utf-8') if isinstance(items_json, bytes) else items_json)
+                        item_count = len(items)
                 
                 # 最后更新时间
                 last_updated = current_app.redis_client.get(f"store:{store_name}:last_update")
@@ -233,6 +258,110 @@ def get_stores():
     
     return jsonify(stores)
 
+# 店铺商品查询API（过滤、排序、游标分页）
+@main.route('/api/store/<store_name>/items')
+def query_store_items(store_name):
+    """按条件分页查询店铺商品"""
+    def flag(name):
+        return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+    
+    filters = {
+        'min_price': request.args.get('min_price', type=float),
+        'max_price': request.args.get('max_price', type=float),
+        'is_new_listing': flag('is_new_listing'),
+        'is_yesterday_listing': flag('is_yesterday_listing'),
+        'free_returns': flag('free_returns'),
+        'buy_format': request.args.get('buy_format')
+    }
+    
+    try:
+        query_index = ItemQueryIndex(current_app.redis_client)
+        result = query_index.query_items(
+            store_name,
+            filters=filters,
+            sort=request.args.get('sort', 'default'),
+            descending=request.args.get('order', 'asc').lower() == 'desc',
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 20, type=int)
+        )
+        
+        return jsonify({
+            'success': True,
+            'store_name': store_name,
+            'items': result['items'],
+            'total': result['total'],
+            'next_cursor': result['next_cursor'],
+            'buy_formats': query_index.get_buy_formats(store_name)
+        })
+    except Exception as e:
+        current_app.logger.error(f"查询店铺商品时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'查询商品失败: {str(e)}'
+        }), 500
+
+# 跨店铺商品标题搜索API
+@main.route('/api/search')
+def search_items():
+    """按标题搜索所有监控店铺的商品"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': '缺少必要参数: q'
+        }), 400
+    
+    try:
+        result = TitleSearchIndex(current_app.redis_client).search(
+            query,
+            store_name=request.args.get('store'),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int)
+        )
+        result['success'] = True
+        return jsonify(result)
+    except Exception as e:
+        current_app.logger.error(f"搜索商品时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'搜索失败: {str(e)}'
+        }), 500
+
+@main.route('/api/store/<store_name>/coverage')
+def get_store_coverage(store_name):
+    """获取店铺最近一次更新的抓取覆盖范围（抓取的页码、覆盖比例、待确认商品数）"""
+    coverage = current_app.redis_client.get(f"store:{store_name}:coverage")
+    if not coverage:
+        return jsonify({
+            'success': False,
+            'message': '店铺还没有覆盖范围记录'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'coverage': json.loads(coverage)
+    })
+
+@main.route('/api/store/<store_name>/seen/<item_id>')
+def get_seen_item(store_name, item_id):
+    """查询商品是否在店铺中出现过（首次/最近出现时间）"""
+    try:
+        entry = SeenRegistry(current_app.redis_client).get_item(store_name, item_id)
+        return jsonify({
+            'success': True,
+            'item_id': item_id,
+            'seen': entry is not None,
+            'first_seen': entry['first_seen'] if entry else None,
+            'last_seen': entry['last_seen'] if entry else None,
+            'source': entry['source'] if entry else None
+        })
+    except Exception as e:
+        current_app.logger.error(f"查询已见商品时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'查询失败: {str(e)}'
+        }), 500
+
 # 获取商品价格历史API
 @main.route('/api/item/<store_name>/<item_id>/price_history')
 def get_price_history(store_name, item_id):
@@ -268,6 +397,66 @@ def get_price_history(store_name, item_id):
         'history': history
     })
 
+# 获取店铺在指定时间点的状态API
+@main.route('/api/store/<store_name>/state')
+def get_store_state(store_name):
+    """还原店铺在指定时间点的商品状态"""
+    try:
+        from app.history import StoreHistory
+        history = StoreHistory(current_app.redis_client)
+
+        timestamp = request.args.get('ts', type=int)
+        state = history.get_store_state(store_name, timestamp)
+        if not state:
+            return jsonify({
+                'success': False,
+                'message': '该时间点之前没有店铺历史记录'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'store_name': store_name,
+            'timestamp': state['timestamp'],
+            'items': state['items'],
+            'total': len(state['items'])
+        })
+    except Exception as e:
+        current_app.logger.error(f"还原店铺状态时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取店铺状态失败: {str(e)}'
+        }), 500
+
+# 比较店铺两个时间点之间的变化API
+@main.route('/api/store/<store_name>/diff')
+def get_store_diff(store_name):
+    """比较店铺在两个时间点之间的商品变化"""
+    from_ts = request.args.get('from', type=int)
+    to_ts = request.args.get('to', type=int)
+    if from_ts is None:
+        return jsonify({
+            'success': False,
+            'message': '缺少必要参数: from'
+        }), 400
+
+    try:
+        from app.history import StoreHistory
+        diff = StoreHistory(current_app.redis_client).diff_states(store_name, from_ts, to_ts)
+        if not diff:
+            return jsonify({
+                'success': False,
+                'message': '指定时间点之前没有店铺历史记录'
+            }), 404
+
+        diff['success'] = True
+        return jsonify(diff)
+    except Exception as e:
+        current_app.logger.error(f"比较店铺状态时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'比较店铺状态失败: {str(e)}'
+        }), 500
+
 # 手动触发爬取
 @main.route('/api/scrape_now/<store_name>', methods=['POST'])
 def scrape_now(store_name):
@@ -288,7 +477,7 @@ def scrape_now(store_name):
     # 如果有设置通知邮箱并且有变动，发送邮件通知
     notify_email = store_data.get('notify_email')
     if notify_email:
-        notifier = EmailNotifier()
+        notifier = EmailNotifier(redis_client=current_app.redis_client)
         
         # 通知新上架商品
         if changes['new_listings']:
@@ -306,6 +495,9 @@ def scrape_now(store_name):
                 changes['price_changes']
             )
     
+    if store_data.get('webhook_url'):
+        WebhookNotifier(current_app.redis_client).enqueue_store_changes(store_data['webhook_url'], store_name, changes)
+    
     return jsonify({
         'success': True,
         'message': f'已手动爬取店铺 {store_name}',
@@ -319,43 +511,42 @@ def scrape_now(store_name):
 # 删除店铺监控
 @main.route('/api/store/<store_name>', methods=['DELETE'])
 def delete_store(store_name):
-    # 删除店铺监控配置
-    current_app.redis_client.delete(f"monitor:store:{store_name}")
-    
-    # 删除相关数据
-    keys_to_delete = []
-    keys_to_delete.extend(current_app.redis_client.keys(f"store:{store_name}:*"))
-    
-    for key in keys_to_delete:
-        current_app.redis_client.delete(key)
+    # 删除店铺监控配置及相关数据（大店铺在后台清理）
+    result = StorePurger(current_app.redis_client).purge_store(store_name)
     
     return jsonify({
         'success': True,
-        'message': f'已删除店铺 {store_name} 的监控'
+        'message': f'已删除店铺 {store_name} 的监控',
+        'background': result['background']
     })
 
 @main.route('/item/<item_id>')
 def item_details(item_id):
-    store_keys = current_app.redis_client.keys("monitor:store:*")
     item_data = None
     
-    for key in store_keys:
-        try:
-            store_name = key.split(':')[-1]
-            item_key = f"store:{store_name}:item:{item_id}"
-            item_json = current_app.redis_client.get(item_key)
-            
-            if item_json:
-                item_data = json.loads(item_json)
-                break
-        except Exception as e:
-            current_app.logger.error(f"获取商品数据时出错: {e}")
+    try:
+        # 通过反向索引直接定位商品所属店铺
+        item_data = ItemStoreIndex(current_app.redis_client).get_item(item_id)
+    except Exception as e:
+        current_app.logger.error(f"获取商品数据时出错: {e}")
     
     if not item_data:
         abort(404)
         
     return render_template('item_details.html', item=item_data)
 
+# 商品详情页使用的价格历史API（通过反向索引定位店铺）
+@main.route('/api/item/<item_id>/price_history')
+def get_item_price_history(item_id):
+    store_name = ItemStoreIndex(current_app.redis_client).lookup_store(item_id)
+    if not store_name:
+        return jsonify({
+            'item': {},
+            'history': []
+        })
+    
+    return get_price_history(store_name, item_id)
+
 @main.app_template_filter('default_if_none')
 def default_if_none(value, default_value="未知"):
     """如果值为None则返回默认值"""
@@ -412,7 +603,7 @@ def refresh_store_data():
         # 如果有邮箱和变更，发送通知
         if notify_email and (changes['new_listings'] or changes['price_changes']):
             try:
-                notifier = EmailNotifier()
+                notifier = EmailNotifier(redis_client=current_app.redis_client)
                 
                 if changes['new_listings']:
                     current_app.logger.info(f"发送新商品通知到: {notify_email}")
@@ -424,6 +615,12 @@ def refresh_store_data():
             except Exception as e:
                 current_app.logger.error(f"发送通知邮件失败: {e}")
         
+        if store_data.get('webhook_url'):
+            try:
+                WebhookNotifier(redis_client).enqueue_store_changes(store_data['webhook_url'], store_name, changes)
+            except Exception as e:
+                current_app.logger.error(f"加入Webhook事件失败: {e}")
+        
         # 构建消息
         message = f"已刷新店铺 {store_name} 的数据。"
         if changes['new_listings']:
@@ -463,31 +660,8 @@ def remove_store():
         # 获取Redis客户端
         redis_client = current_app.redis_client
         
-        # 删除店铺相关的所有数据
-        store_key = f"monitor:store:{store_name}"
-        store_items_key = f"store:{store_name}:items"
-        store_stats_key = f"store:{store_name}:stats"
-        store_update_key = f"store:{store_name}:last_update"
-        
-        # 获取店铺的所有商品
-        items_json = redis_client.get(store_items_key)
-        if items_json:
-            try:
-                items = json.loads(items_json)
-                # 删除每个商品的数据
-                for item in items:
-                    item_id = item.get('id')
-                    if item_id:
-                        redis_client.delete(f"store:{store_name}:item:{item_id}")
-                        redis_client.delete(f"store:{store_name}:price_history:{item_id}")
-            except:
-                pass
-        
-        # 删除主要的店铺键
-        redis_client.delete(store_key)
-        redis_client.delete(store_items_key)
-        redis_client.delete(store_stats_key)
-        redis_client.delete(store_update_key)
+        # 删除店铺相关的所有数据（大店铺在后台清理）
+        StorePurger(redis_client).purge_store(store_name)
         
         current_app.logger.info(f"已删除店铺监控: {store_name}")
         return jsonify({
@@ -514,6 +688,7 @@ def monitor_store():
     store_url = data['store_url']
     email = data['email']
     store_name = data.get('store_name', '')
+    webhook_url = data.get('webhook_url') or None
     
     # 使用通用验证函数
     if not is_valid_ebay_url(store_url):
@@ -522,6 +697,13 @@ def monitor_store():
             'message': '请提供有效的eBay店铺URL'
         }), 400
     
+    webhook_error = WebhookNotifier.check_url(webhook_url) if webhook_url else None
+    if webhook_error:
+        return jsonify({
+            'success': False,
+            'message': webhook_error
+        }), 400
+    
     # 如果没有提供店铺名称，尝试从URL提取
     if not store_name:
         if '_ssn=' in store_url:
@@ -537,6 +719,7 @@ def monitor_store():
         'url': store_url,
         'name': store_name,
         'notify_email': email,
+        'webhook_url': webhook_url,
         'added_at': int(time.time())
     }
     
@@ -553,6 +736,7 @@ def monitor_store():
         if items:
             current_app.redis_client.set(f"store:{store_name}:items", json.dumps(items))
             current_app.redis_client.set(f"store:{store_name}:last_update", int(time.time()))
+            scraper.index_store_items(store_name, items)
             
             # 记录店铺商品数量
             current_app.logger.info(f"初始爬取成功，店铺 {store_name} 有 {len(items)} 个商品")
@@ -673,7 +857,8 @@ def create_comparison():
             competitor_listing_url=data['competitor_listing_url'],
             notify_email=email,
             name=data.get('name'),
-            notify_conditions=notify_conditions
+            notify_conditions=notify_conditions,
+            webhook_url=data.get('webhook_url') or None
         )
         
         return jsonify({
@@ -700,12 +885,7 @@ def get_comparisons():
     """获取所有价格对比配置"""
     try:
         comparison = PriceComparison(redis_client=current_app.redis_client)
-        comparisons = comparison.get_all_comparisons()
-        
-        # 为每个配置添加最新的对比结果
-        for config in comparisons:
-            latest_result = comparison.get_latest_comparison_result(config['id'])
-            config['latest_result'] = latest_result
+        comparisons = comparison.get_all_comparisons_with_latest()
         
         return jsonify({
             'success': True,
@@ -763,18 +943,30 @@ def get_comparison_history(comparison_id):
                 'message': '找不到指定的对比配置'
             }), 404
         
-        # 获取历史记录
-        limit = request.args.get('limit', 20, type=int)
-        history = comparison.get_comparison_history(comparison_id, limit=limit)
+        # 获取历史记录（支持 start/end 时间范围和 cursor 分页）
+        page = comparison.get_comparison_history_page(
+            comparison_id,
+            limit=max(1, min(request.args.get('limit', 20, type=int), 500)),
+            start=request.args.get('start', type=int),
+            end=request.args.get('end', type=int),
+            cursor=request.args.get('cursor')
+        )
+        history = page['records']
         
         return jsonify({
             'success': True,
             'comparison_id': comparison_id,
             'config': config,
             'history': history,
-            'total': len(history)
+            'total': len(history),
+            'next_cursor': page['next_cursor']
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         current_app.logger.error(f"获取价格对比历史时出错: {str(e)}")
         return jsonify({
@@ -796,8 +988,10 @@ def manual_comparison_check(comparison_id):
                 'message': '找不到指定的对比配置'
             }), 404
         
-        # 执行对比检查
-        result = comparison.perform_comparison(comparison_id)
+        # 执行对比检查（refresh=1 时跳过商品信息缓存）
+        data = request.get_json(silent=True) or {}
+        bypass_cache = request.args.get('refresh') in ('1', 'true') or bool(data.get('refresh'))
+        result = comparison.perform_comparison(comparison_id, bypass_cache=bypass_cache)
         
         if result:
             return jsonify({
@@ -875,4 +1069,601 @@ def toggle_comparison_status(comparison_id):
         return jsonify({
             'success': False,
             'message': f'操作失败: {str(e)}'
-        }), 500 
\ No newline at end of file
+        }), 500 
+
+@main.route('/api/watchlist')
+def get_watchlist():
+    """获取所有监控关键词"""
+    try:
+        keywords = Watchlist(current_app.redis_client).get_keywords()
+        return jsonify({
+            'success': True,
+            'keywords': keywords,
+            'total': len(keywords)
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取监控关键词时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取列表失败: {str(e)}'
+        }), 500
+
+@main.route('/api/watchlist', methods=['POST'])
+def add_watchlist_keyword():
+    """添加监控关键词"""
+    try:
+        data = request.get_json() or {}
+        
+        # 验证必要参数
+        for field in ['keyword', 'notify_email']:
+            if not data.get(field):
+                return jsonify({
+                    'success': False,
+                    'message': f'缺少必要参数: {field}'
+                }), 400
+        
+        # 验证邮箱格式
+        email = data['notify_email']
+        if not re.match(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$', email):
+            return jsonify({
+                'success': False,
+                'message': '邮箱格式无效'
+            }), 400
+        
+        config = Watchlist(current_app.redis_client).add_keyword(
+            data['keyword'],
+            email,
+            stores=data.get('stores') or []
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': f'已添加监控关键词: {config["keyword"]}',
+            'keyword': config
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"添加监控关键词时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'添加失败: {str(e)}'
+        }), 500
+
+@main.route('/api/watchlist/<keyword_id>', methods=['DELETE'])
+def delete_watchlist_keyword(keyword_id):
+    """删除监控关键词"""
+    try:
+        if not Watchlist(current_app.redis_client).delete_keyword(keyword_id):
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的监控关键词'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'已删除监控关键词: {keyword_id}'
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"删除监控关键词时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'删除失败: {str(e)}'
+        }), 500
+
+@main.route('/api/price_rules')
+def get_price_rules():
+    """获取价格提醒规则，可按商品ID过滤"""
+    try:
+        rules = PriceRuleEngine(current_app.redis_client).get_rules(item_id=request.args.get('item_id'))
+        return jsonify({
+            'success': True,
+            'rules': rules,
+            'total': len(rules)
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取价格提醒规则时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取列表失败: {str(e)}'
+        }), 500
+
+@main.route('/api/price_rules', methods=['POST'])
+def create_price_rule():
+    """创建价格提醒规则"""
+    try:
+        data = request.get_json() or {}
+        
+        # 验证必要参数
+        for field in ['item_id', 'notify_email']:
+            if not data.get(field):
+                return jsonify({
+                    'success': False,
+                    'message': f'缺少必要参数: {field}'
+                }), 400
+        
+        # 验证邮箱格式
+        email = data['notify_email']
+        if not re.match(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$', email):
+            return jsonify({
+                'success': False,
+                'message': '邮箱格式无效'
+            }), 400
+        
+        below_price = data.get('below_price')
+        change_pct = data.get('change_pct')
+        rule = PriceRuleEngine(current_app.redis_client).create_rule(
+            str(data['item_id']),
+            email,
+            below_price=float(below_price) if below_price not in (None, '') else None,
+            change_pct=float(change_pct) if change_pct not in (None, '') else None,
+            store_name=ItemStoreIndex(current_app.redis_client).lookup_store(str(data['item_id']))
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': '价格提醒规则创建成功',
+            'rule': rule
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"创建价格提醒规则时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'创建失败: {str(e)}'
+        }), 500
+
+@main.route('/api/price_rules/<rule_id>', methods=['DELETE'])
+def delete_price_rule(rule_id):
+    """删除价格提醒规则"""
+    try:
+        if not PriceRuleEngine(current_app.redis_client).delete_rule(rule_id):
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的价格提醒规则'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'已删除价格提醒规则: {rule_id}'
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"删除价格提醒规则时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'删除失败: {str(e)}'
+        }), 500
+
+@main.route('/api/price_rules/<rule_id>/toggle', methods=['POST'])
+def toggle_price_rule(rule_id):
+    """切换价格提醒规则的状态（启用/暂停）"""
+    try:
+        engine = PriceRuleEngine(current_app.redis_client)
+        rule = engine.get_rule(rule_id)
+        if not rule:
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的价格提醒规则'
+            }), 404
+        
+        new_status = 'paused' if rule.get('status', 'active') == 'active' else 'active'
+        engine.set_status(rule_id, new_status)
+        status_text = '启用' if new_status == 'active' else '暂停'
+        
+        return jsonify({
+            'success': True,
+            'message': f'已{status_text}价格提醒规则: {rule_id}',
+            'status': new_status
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"切换价格提醒规则状态时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'操作失败: {str(e)}'
+        }), 500
+
+@main.route('/api/comparison_groups')
+def get_comparison_groups():
+    """获取所有价格对比分组及其最新评估结果"""
+    try:
+        manager = ComparisonGroupManager(current_app.redis_client)
+        groups = manager.get_all_groups()
+        for group in groups:
+            group['latest_result'] = manager.get_latest_result(group['id'])
+        
+        return jsonify({
+            'success': True,
+            'groups': groups,
+            'total': len(groups)
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取价格对比分组时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取列表失败: {str(e)}'
+        }), 500
+
+@main.route('/api/comparison_groups', methods=['POST'])
+def create_comparison_group():
+    """创建价格对比分组"""
+    try:
+        data = request.get_json() or {}
+        
+        # 验证必要参数
+        for field in ['my_listing_urls', 'competitor_urls']:
+            if not data.get(field) or not isinstance(data[field], list):
+                return jsonify({
+                    'success': False,
+                    'message': f'缺少必要参数: {field}'
+                }), 400
+        
+        email = data.get('notify_email')
+        if email and not re.match(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$', email):
+            return jsonify({
+                'success': False,
+                'message': '邮箱格式无效'
+            }), 400
+        
+        group = ComparisonGroupManager(current_app.redis_client).create_group(
+            data.get('name'),
+            data['my_listing_urls'],
+            data['competitor_urls'],
+            notify_email=email,
+            notify_conditions=data.get('notify_conditions')
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': '价格对比分组创建成功',
+            'group': group
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"创建价格对比分组时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'创建失败: {str(e)}'
+        }), 500
+
+@main.route('/api/comparison_groups/<group_id>', methods=['DELETE'])
+def delete_comparison_group(group_id):
+    """删除价格对比分组"""
+    try:
+        if not ComparisonGroupManager(current_app.redis_client).delete_group(group_id):
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的对比分组'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'已删除价格对比分组: {group_id}'
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"删除价格对比分组时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'删除失败: {str(e)}'
+        }), 500
+
+@main.route('/api/comparison_groups/<group_id>/check', methods=['POST'])
+def check_comparison_group(group_id):
+    """手动评估价格对比分组（refresh=1 时跳过商品信息缓存）"""
+    try:
+        manager = ComparisonGroupManager(current_app.redis_client)
+        group = manager.get_group(group_id)
+        if not group:
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的对比分组'
+            }), 404
+        
+        data = request.get_json(silent=True) or {}
+        bypass_cache = request.args.get('refresh') in ('1', 'true') or bool(data.get('refresh'))
+        result = manager.perform_groups([group], bypass_cache=bypass_cache).get(group_id)
+        
+        if result:
+            return jsonify({
+                'success': True,
+                'message': '分组价格评估完成',
+                'result': result
+            })
+        return jsonify({
+            'success': False,
+            'message': '分组价格评估失败（分组已暂停或无法获取商品信息）'
+        }), 500
+        
+    except Exception as e:
+        current_app.logger.error(f"评估价格对比分组时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'检查失败: {str(e)}'
+        }), 500
+
+@main.route('/api/outbox')
+def get_outbox_status():
+    """获取通知发件箱的投递统计和最近的死信"""
+    try:
+        outbox = NotificationOutbox(current_app.redis_client)
+        return jsonify({
+            'success': True,
+            'stats': outbox.get_stats(),
+            'dead_letters': outbox.get_dead_letters(limit=request.args.get('limit', 50, type=int))
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取发件箱状态时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取发件箱状态失败: {str(e)}'
+        }), 500
+
+@main.route('/api/outbox/<message_id>')
+def get_outbox_message(message_id):
+    """获取单条邮件的投递状态"""
+    message = NotificationOutbox(current_app.redis_client).get_message(message_id)
+    if not message:
+        return jsonify({
+            'success': False,
+            'message': '找不到指定的邮件'
+        }), 404
+    
+    message.pop('body', None)
+    return jsonify({
+        'success': True,
+        'message_status': message
+    })
+
+@main.route('/api/outbox/<message_id>/retry', methods=['POST'])
+def retry_outbox_message(message_id):
+    """将死信邮件重新加入投递队列"""
+    try:
+        if not NotificationOutbox(current_app.redis_client).retry_dead(message_id):
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的死信邮件'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'已重新加入投递队列: {message_id}'
+        })
+    except Exception as e:
+        current_app.logger.error(f"重试死信邮件时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'重试失败: {str(e)}'
+        }), 500
+
+@main.route('/api/store/<store_name>/webhook', methods=['POST'])
+def set_store_webhook(store_name):
+    """设置或清除店铺的Webhook地址（webhook_url 为空时清除）"""
+    try:
+        store_key = f"monitor:store:{store_name}"
+        store_data_json = current_app.redis_client.get(store_key)
+        if not store_data_json:
+            return jsonify({
+                'success': False,
+                'message': '店铺不存在'
+            }), 404
+        
+        data = request.get_json(silent=True) or {}
+        webhook_url = data.get('webhook_url') or None
+        webhook_error = WebhookNotifier.check_url(webhook_url) if webhook_url else None
+        if webhook_error:
+            return jsonify({
+                'success': False,
+                'message': webhook_error
+            }), 400
+        
+        store_data = json.loads(store_data_json)
+        store_data['webhook_url'] = webhook_url
+        current_app.redis_client.set(store_key, json.dumps(store_data))
+        
+        return jsonify({
+            'success': True,
+            'message': f'已设置店铺 {store_name} 的Webhook地址' if webhook_url else f'已清除店铺 {store_name} 的Webhook地址'
+        })
+    except Exception as e:
+        current_app.logger.error(f"设置店铺Webhook地址时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'设置失败: {str(e)}'
+        }), 500
+
+@main.route('/api/comparison/<comparison_id>/webhook', methods=['POST'])
+def set_comparison_webhook(comparison_id):
+    """设置或清除价格对比配置的Webhook地址（webhook_url 为空时清除）"""
+    try:
+        comparison = PriceComparison(redis_client=current_app.redis_client)
+        config = comparison.get_comparison_config(comparison_id)
+        if not config:
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的对比配置'
+            }), 404
+        
+        data = request.get_json(silent=True) or {}
+        webhook_url = data.get('webhook_url') or None
+        webhook_error = WebhookNotifier.check_url(webhook_url) if webhook_url else None
+        if webhook_error:
+            return jsonify({
+                'success': False,
+                'message': webhook_error
+            }), 400
+        
+        config['webhook_url'] = webhook_url
+        current_app.redis_client.set(f"comparison:config:{comparison_id}", json.dumps(config))
+        
+        return jsonify({
+            'success': True,
+            'message': f'已设置Webhook地址: {config.get("name", comparison_id)}' if webhook_url else f'已清除Webhook地址: {config.get("name", comparison_id)}'
+        })
+    except Exception as e:
+        current_app.logger.error(f"设置价格对比Webhook地址时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'设置失败: {str(e)}'
+        }), 500
+
+@main.route('/api/webhooks')
+def get_webhook_status():
+    """获取Webhook推送统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'configured': WebhookNotifier.is_configured(),
+            'stats': WebhookNotifier(current_app.redis_client).get_stats()
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取Webhook推送统计时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取Webhook推送统计失败: {str(e)}'
+        }), 500
+
+@main.route('/api/webhooks/<batch_id>/retry', methods=['POST'])
+def retry_webhook_batch(batch_id):
+    """将死信批次重新加入推送队列"""
+    try:
+        if not WebhookNotifier(current_app.redis_client).retry_dead(batch_id):
+            return jsonify({
+                'success': False,
+                'message': '找不到指定的死信批次'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'已重新加入推送队列: {batch_id}'
+        })
+    except Exception as e:
+        current_app.logger.error(f"重试Webhook死信批次时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'重试失败: {str(e)}'
+        }), 500
+
+@main.route('/api/changes')
+def get_changes():
+    """按游标增量读取变动事件（since 为上次返回的 cursor，since=now 只返回当前游标）"""
+    try:
+        stream = ChangeStream(current_app.redis_client)
+        store_name = request.args.get('store') or None
+        since = request.args.get('since') or None
+        
+        if since == 'now':
+            return jsonify({
+                'success': True,
+                'events': [],
+                'cursor': stream.latest_cursor(store_name),
+                'has_more': False,
+                'truncated': False
+            })
+        
+        feed = stream.read_since(since, store_name, limit=request.args.get('limit', 100, type=int))
+        feed['success'] = True
+        return jsonify(feed)
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"读取变动事件时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'读取变动事件失败: {str(e)}'
+        }), 500
+
+@main.route('/api/changes/groups')
+def get_change_groups():
+    """获取事件流上的消费组状态"""
+    try:
+        store_name = request.args.get('store') or None
+        return jsonify({
+            'success': True,
+            'groups': ChangeStream(current_app.redis_client).get_group_info(store_name)
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取消费组状态时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取消费组状态失败: {str(e)}'
+        }), 500
+
+@main.route('/api/changes/groups/<group>/read', methods=['POST'])
+def read_change_group(group):
+    """以消费组成员身份读取新事件（处理完成后调用 ack 接口确认）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        consumer = data.get('consumer')
+        if not consumer:
+            return jsonify({
+                'success': False,
+                'message': '缺少必要参数: consumer'
+            }), 400
+        
+        stream = ChangeStream(current_app.redis_client)
+        store_name = data.get('store') or None
+        count = int(data.get('count') or 100)
+        
+        # 先接管崩溃消费者遗留的未确认事件，再读取新事件
+        events = stream.claim_stale(group, consumer, store_name=store_name, count=count) if data.get('claim_stale') else []
+        events.extend(stream.read_group(group, consumer, store_name, count=max(count - len(events), 1)))
+        
+        return jsonify({
+            'success': True,
+            'events': events
+        })
+    except Exception as e:
+        current_app.logger.error(f"读取消费组事件时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'读取消费组事件失败: {str(e)}'
+        }), 500
+
+@main.route('/api/changes/groups/<group>/ack', methods=['POST'])
+def ack_change_group(group):
+    """确认消费组已处理的事件"""
+    try:
+        data = request.get_json(silent=True) or {}
+        event_ids = data.get('ids') or []
+        if not isinstance(event_ids, list):
+            return jsonify({
+                'success': False,
+                'message': 'ids 必须是事件ID列表'
+            }), 400
+        
+        acked = ChangeStream(current_app.redis_client).ack(group, event_ids, data.get('store') or None)
+        return jsonify({
+            'success': True,
+            'acked': acked
+        })
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"确认消费组事件时出错: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'确认失败: {str(e)}'
+        }), 500
@@ -0,0 +1,215 @@
+# 关键词监控（新上架商品关键词提醒）模块
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, List
+from app.utils import decode_value
+from app.search import tokenize
+from app.digest import NotificationDigest
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def normalize_phrase(text: str) -> str:
+    """规范化为以空格分隔的词项串，两端补空格以便按整词匹配"""
+    tokens = tokenize(text)
+    return f" {' '.join(tokens)} " if tokens else ''
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机 - 一次扫描文本即可找出所有命中的关键词"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [set()]
+
+    def add(self, pattern: str, value):
+        """添加一个模式串及其对应的值"""
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append(set())
+            state = next_state
+        self.outputs[state].add(value)
+
+    def build(self):
+        """按广度优先构建失败指针"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] |= self.outputs[self.fail[next_state]]
+        return self
+
+    def find(self, text: str) -> set:
+        """扫描文本，返回所有命中模式的值"""
+        state = 0
+        matched = set()
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.outputs[state]:
+                matched |= self.outputs[state]
+        return matched
+
+
+class Watchlist:
+    """关键词监控 - 将所有启用的关键词编译为一个自动机，对新上架商品标题单次扫描匹配"""
+
+    # Redis数据结构设计
+    # ==================
+    # 关键词配置：watchlist:keywords (HASH, field=关键词ID)
+    # {
+    #     "id": "kw_12",
+    #     "keyword": "vintage camera",
+    #     "notify_email": "user@example.com",
+    #     "stores": ["store_a"],          # 为空表示所有店铺
+    #     "status": "active",             # active, paused
+    #     "created_at": 1701234567
+    # }
+    # 关键词ID计数器：watchlist:next_id
+    # 配置版本：watchlist:version (关键词变化时递增，用于失效已编译的自动机)
+    # 命中记录加入收件人的通知摘要（见 NotificationDigest），与其他通知合并发送
+
+    KEYWORDS_KEY = "watchlist:keywords"
+    VERSION_KEY = "watchlist:version"
+
+    # 进程内缓存已编译的自动机
+    _compiled = {'version': None, 'automaton': None, 'keywords': {}}
+    _compile_lock = threading.Lock()
+
+    def __init__(self, redis_client):
+        """初始化关键词监控"""
+        self.redis = redis_client
+        self.logger = logger
+
+    def add_keyword(self, keyword: str, notify_email: str, stores: List[str] = None) -> Dict:
+        """添加监控关键词"""
+        if not normalize_phrase(keyword):
+            raise ValueError("关键词不能为空")
+
+        keyword_id = f"kw_{self.redis.incr('watchlist:next_id')}"
+        config = {
+            'id': keyword_id,
+            'keyword': keyword.strip(),
+            'notify_email': notify_email,
+            'stores': stores or [],
+            'status': 'active',
+            'created_at': int(time.time())
+        }
+
+        pipe = self.redis.pipeline()
+        pipe.hset(self.KEYWORDS_KEY, keyword_id, json.dumps(config))
+        pipe.incr(self.VERSION_KEY)
+        pipe.execute()
+
+        self.logger.info(f"添加监控关键词: {keyword_id} - {config['keyword']}")
+        return config
+
+    def delete_keyword(self, keyword_id: str) -> bool:
+        """删除监控关键词"""
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.KEYWORDS_KEY, keyword_id)
+        pipe.incr(self.VERSION_KEY)
+        removed = pipe.execute()[0]
+        return bool(removed)
+
+    def get_keywords(self) -> List[Dict]:
+        """获取所有监控关键词"""
+        keywords = [json.loads(decode_value(raw)) for raw in self.redis.hgetall(self.KEYWORDS_KEY).values()]
+        return sorted(keywords, key=lambda k: k.get('created_at', 0))
+
+    def _get_automaton(self):
+        """获取当前版本的自动机，关键词变化后重新编译"""
+        version = decode_value(self.redis.get(self.VERSION_KEY)) or '0'
+        compiled = Watchlist._compiled
+        if compiled['version'] == version:
+            return compiled['automaton'], compiled['keywords']
+
+        with Watchlist._compile_lock:
+            # 等待锁期间其他线程可能已编译好同一版本
+            compiled = Watchlist._compiled
+            if compiled['version'] == version:
+                return compiled['automaton'], compiled['keywords']
+
+            automaton = AhoCorasick()
+            keywords = {}
+            for config in self.get_keywords():
+                if config.get('status') != 'active':
+                    continue
+                phrase = normalize_phrase(config['keyword'])
+                if phrase:
+                    automaton.add(phrase, config['id'])
+                    keywords[config['id']] = config
+            automaton.build()
+
+            Watchlist._compiled = {'version': version, 'automaton': automaton, 'keywords': keywords}
+            self.logger.info(f"编译关键词自动机: {len(keywords)} 个关键词 (版本 {version})")
+            return automaton, keywords
+
+    def match_items(self, store_name: str, items: List[Dict]) -> List[Dict]:
+        """对商品标题进行匹配，返回命中记录"""
+        if not items:
+            return []
+
+        automaton, keywords = self._get_automaton()
+        if not keywords:
+            return []
+
+        matches = []
+        for item in items:
+            phrase = normalize_phrase(item.get('title', ''))
+            if not phrase:
+                continue
+            for keyword_id in automaton.find(phrase):
+                config = keywords[keyword_id]
+                if config['stores'] and store_name not in config['stores']:
+                    continue
+                matches.append({
+                    'keyword_id': keyword_id,
+                    'keyword': config['keyword'],
+                    'notify_email': config['notify_email'],
+                    'store_name': store_name,
+                    'item': {
+                        'id': item.get('id'),
+                        'title': item.get('title'),
+                        'url': item.get('url'),
+                        'price': item.get('price'),
+                        'currency': item.get('currency'),
+                        'image_url': item.get('image_url')
+                    },
+                    'matched_at': int(time.time())
+                })
+        return matches
+
+    def process_new_listings(self, store_name: str, new_items: List[Dict]) -> int:
+        """匹配新上架商品，并将命中记录加入收件人的通知摘要"""
+        matches = self.match_items(store_name, new_items)
+        if not matches:
+            return 0
+
+        by_recipient = {}
+        for match in matches:
+            by_recipient.setdefault(match['notify_email'], []).append(match)
+        digest = NotificationDigest(self.redis)
+        for recipient, recipient_matches in by_recipient.items():
+            digest.add_watchlist_matches(recipient, store_name, recipient_matches)
+
+        self.logger.info(f"店铺 {store_name} 有 {len(matches)} 条关键词命中")
+        return len(matches)
@@ -0,0 +1,391 @@
+# Webhook通知模块（按接收地址批量推送变动事件，签名 + 失败重试）
+
+import hmac
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.utils import json_dumps, decode_value, acquire_lock, release_lock, extend_lock
+from app.notification_ledger import NotificationLedger
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 所有推送共用一个会话，复用到同一接收地址的HTTP连接
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_webhook_session() -> requests.Session:
+    """获取（或创建）共享的HTTP会话"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=Config.WEBHOOK_MAX_WORKERS, pool_maxsize=Config.WEBHOOK_MAX_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Content-Type': 'application/json', 'User-Agent': 'webstation-webhook/1.0'})
+            _session = session
+        return _session
+
+
+def sign_payload(body: str, timestamp: int, secret: str = None) -> str:
+    """计算签名：HMAC-SHA256("{timestamp}.{body}")，接收方用同一密钥校验"""
+    secret = Config.WEBHOOK_SECRET if secret is None else secret
+    if not secret:
+        raise ValueError("未配置 WEBHOOK_SECRET，不能签名Webhook请求")
+    digest = hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+class WebhookNotifier:
+    """Webhook通知 - 变动事件按接收地址排队，后台任务批量、并发推送，失败时指数退避重试"""
+
+    # Redis数据结构设计
+    # ==================
+    # 接收地址：webhook:endpoints (HASH, endpoint_id -> URL, endpoint_id 为URL的哈希)
+    # 待推送事件：webhook:pending:{endpoint_id} (LIST, 每项为一个事件JSON)
+    # {
+    #     "type": "new_listings",       # new_listings, price_changes, removed_listings, comparison_alert
+    #     "source": "store_a",          # 店铺名称或对比配置ID
+    #     "data": {...},
+    #     "occurred_at": 1701234567,
+    #     "ledger": {"recipient": "webhook:https://...", "fingerprints": {"comparison:...": 86400}}  # 可为空，不推送
+    # }
+    # 有待推送事件的地址：webhook:dirty (SET)
+    # 推送批次：webhook:batch:{batch_id}
+    # {
+    #     "id": "batch_12",
+    #     "endpoint_id": "3f2a...",
+    #     "url": "https://...",
+    #     "body": "{\"events\": [...]}",
+    #     "events": 120,
+    #     "attempts": 0,
+    #     "created_at": 1701234567,
+    #     "last_error": null,
+    #     "ledger": [...]               # 批次中事件的通知账本信息，进入死信时释放
+    # }
+    # 批次ID计数器：webhook:next_batch_id
+    # 待推送批次：webhook:queue (ZSET, member=批次ID, score=下次推送时间)
+    # 等待重试的地址：webhook:retrying (HASH, endpoint_id -> 等待重试的批次序号，
+    #     该地址更新的批次在其推送成功或进入死信前暂缓推送，保持事件顺序)
+    # 死信：webhook:dead (ZSET, member=批次ID, score=进入死信的时间，超过 WEBHOOK_DEAD_RETENTION 后清理)
+    # 推送统计：webhook:stats (HASH, events / batches / sent / retried / dead)
+    # 推送锁：webhook:worker_lock (值为随机令牌)
+
+    ENDPOINTS_KEY = "webhook:endpoints"
+    DIRTY_KEY = "webhook:dirty"
+    QUEUE_KEY = "webhook:queue"
+    RETRYING_KEY = "webhook:retrying"
+    DEAD_KEY = "webhook:dead"
+    STATS_KEY = "webhook:stats"
+    LOCK_KEY = "webhook:worker_lock"
+
+    def __init__(self, redis_client, session: requests.Session = None):
+        """初始化Webhook通知"""
+        self.redis = redis_client
+        self.session = session or get_webhook_session()
+        self.logger = logger
+
+    @staticmethod
+    def endpoint_id(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()[:16]
+
+    def _pending_key(self, endpoint_id: str) -> str:
+        return f"webhook:pending:{endpoint_id}"
+
+    def _batch_key(self, batch_id: str) -> str:
+        return f"webhook:batch:{batch_id}"
+
+    @staticmethod
+    def _batch_seq(batch_id: str) -> int:
+        return int(batch_id.split('_')[1])
+
+    @staticmethod
+    def validate_url(url: str) -> bool:
+        """接收地址必须是 http(s) URL"""
+        return bool(url) and url.startswith(('http://', 'https://'))
+
+    @staticmethod
+    def is_configured() -> bool:
+        """是否配置了签名密钥（未配置时不接受Webhook地址，也不推送）"""
+        return bool(Config.WEBHOOK_SECRET)
+
+    @classmethod
+    def check_url(cls, url: str) -> Optional[str]:
+        """检查Webhook地址能否使用，返回错误信息（可以使用时返回 None）"""
+        if not cls.is_configured():
+            return '未配置 WEBHOOK_SECRET，不能设置Webhook地址'
+        if not cls.validate_url(url):
+            return 'Webhook地址必须以 http:// 或 https:// 开头'
+        return None
+
+    # ---------- 事件入队 ----------
+
+    def enqueue(self, url: str, event_type: str, source: str, data: Dict, ledger: Dict = None) -> bool:
+        """加入一个事件，等待与同一地址的其他事件一起推送（ledger 为事件的通知账本信息，推送最终失败时释放）"""
+        if self.check_url(url):
+            self.logger.warning(f"Webhook地址不可用，丢弃事件: {url} ({event_type})")
+            return False
+        endpoint_id = self.endpoint_id(url)
+        event = {'type': event_type, 'source': source, 'data': data, 'occurred_at': int(time.time())}
+        if ledger:
+            event['ledger'] = ledger
+        pipe = self.redis.pipeline()
+        pipe.hset(self.ENDPOINTS_KEY, endpoint_id, url)
+        pipe.rpush(self._pending_key(endpoint_id), json_dumps(event))
+        pipe.sadd(self.DIRTY_KEY, endpoint_id)
+        pipe.hincrby(self.STATS_KEY, 'events', 1)
+        pipe.execute()
+        return True
+
+    def enqueue_store_changes(self, url: str, store_name: str, changes: Dict) -> int:
+        """店铺变动（新上架、价格变动、下架）各作为一个事件入队，返回事件数"""
+        count = 0
+        for event_type, key in (('new_listings', 'new_listings'), ('price_changes', 'price_changes'),
+                                ('removed_listings', 'removed_listings')):
+            if changes.get(key):
+                self.enqueue(url, event_type, store_name, {'items': changes[key]})
+                count += 1
+        return count
+
+    def enqueue_comparison(self, url: str, config: Dict, record: Dict, ledger: Dict = None) -> bool:
+        """价格对比提醒事件"""
+        return self.enqueue(url, 'comparison_alert', config.get('id'), {
+            'name': config.get('name'),
+            'my_listing': config.get('my_listing', {}),
+            'competitor_listing': config.get('competitor_listing', {}),
+            'my_price': record.get('my_price', {}).get('current'),
+            'competitor_price': record.get('competitor_price', {}).get('current'),
+            'comparison_result': record.get('comparison_result', {})
+        }, ledger)
+
+    # ---------- 批量推送 ----------
+
+    def _create_batches(self) -> int:
+        """把每个地址的待推送事件打包成批次（每批最多 WEBHOOK_BATCH_SIZE 个事件）"""
+        created = 0
+        now = int(time.time())
+        for endpoint_id in self.redis.smembers(self.DIRTY_KEY):
+            endpoint_id = decode_value(endpoint_id)
+            url = decode_value(self.redis.hget(self.ENDPOINTS_KEY, endpoint_id))
+            pending_key = self._pending_key(endpoint_id)
+            # 先清除标记再打包，打包期间入队的新事件会重新标记
+            self.redis.srem(self.DIRTY_KEY, endpoint_id)
+
+            while True:
+                pipe = self.redis.pipeline()
+                pipe.lrange(pending_key, 0, Config.WEBHOOK_BATCH_SIZE - 1)
+                pipe.ltrim(pending_key, Config.WEBHOOK_BATCH_SIZE, -1)
+                raw_events = pipe.execute()[0]
+                if not raw_events:
+                    break
+
+                events = [json.loads(decode_value(raw)) for raw in raw_events]
+                # 通知账本信息只保存在批次中，不推送给接收方
+                ledger = [event.pop('ledger') for event in events if event.get('ledger')]
+                batch = {
+                    'id': f"batch_{self.redis.incr('webhook:next_batch_id')}",
+                    'endpoint_id': endpoint_id,
+                    'url': url,
+                    'body': json_dumps({'events': events}),
+                    'events': len(events),
+                    'attempts': 0,
+                    'created_at': now,
+                    'last_error': None,
+                    'ledger': ledger or None
+                }
+                pipe = self.redis.pipeline()
+                pipe.set(self._batch_key(batch['id']), json.dumps(batch))
+                pipe.zadd(self.QUEUE_KEY, {batch['id']: now})
+                pipe.hincrby(self.STATS_KEY, 'batches', 1)
+                pipe.execute()
+                created += 1
+        return created
+
+    @staticmethod
+    def backoff_delay(attempts: int) -> int:
+        """第N次失败后的重试等待时间（指数退避，带抖动）"""
+        delay = min(Config.WEBHOOK_BACKOFF_BASE * (2 ** (attempts - 1)), Config.WEBHOOK_BACKOFF_MAX)
+        return int(delay * random.uniform(0.8, 1.2))
+
+    def post(self, url: str, body: str) -> Optional[str]:
+        """推送一个批次，成功返回 None，失败返回错误信息"""
+        timestamp = int(time.time())
+        headers = {
+            'X-Webstation-Timestamp': str(timestamp),
+            'X-Webstation-Signature': sign_payload(body, timestamp)
+        }
+        try:
+            response = self.session.post(url, data=body.encode(), headers=headers, timeout=Config.WEBHOOK_TIMEOUT)
+            if 200 <= response.status_code < 300:
+                return None
+            return f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            return str(e)
+
+    def _deliver_endpoint(self, batches: List[Dict], token: str):
+        """按顺序推送同一地址的批次，某批失败后暂缓后面的批次（保持事件顺序）
+
+        每批推送前延长推送锁；锁已失效时停止，剩余批次留在队列中等待下次推送。
+        """
+        outcomes = []
+        for index, batch in enumerate(batches):
+            if not extend_lock(self.redis, self.LOCK_KEY, token, Config.WEBHOOK_LOCK_TIMEOUT):
+                self.logger.warning(f"Webhook推送锁已失效，停止推送: {batch['url']}")
+                break
+            error = self.post(batch['url'], batch['body'])
+            outcomes.append((batch, error))
+            if error:
+                return outcomes, batches[index + 1:]
+        return outcomes, []
+
+    def deliver_due(self, limit: int = None) -> Dict:
+        """打包新事件并推送所有到期的批次（不同地址并发推送，需持有推送锁）"""
+        stats = {'sent': 0, 'retried': 0, 'dead': 0, 'events': 0}
+        if not self.is_configured():
+            if self.redis.zcard(self.QUEUE_KEY) or self.redis.scard(self.DIRTY_KEY):
+                self.logger.warning("未配置 WEBHOOK_SECRET，暂停推送Webhook")
+            return stats
+        token = acquire_lock(self.redis, self.LOCK_KEY, Config.WEBHOOK_LOCK_TIMEOUT)
+        if not token:
+            return stats
+
+        try:
+            self._create_batches()
+            batch_ids = [
+                decode_value(batch_id)
+                for batch_id in self.redis.zrangebyscore(
+                    self.QUEUE_KEY, '-inf', int(time.time()), start=0, num=limit or Config.WEBHOOK_MAX_BATCHES
+                )
+            ]
+            if not batch_ids:
+                return stats
+
+            # 按地址分组，地址之间并发；等待重试的批次未到期时，同一地址更新的批次暂缓推送
+            due_seqs = {self._batch_seq(batch_id) for batch_id in batch_ids}
+            retrying = {
+                decode_value(endpoint_id): int(seq)
+                for endpoint_id, seq in self.redis.hgetall(self.RETRYING_KEY).items()
+                if int(seq) not in due_seqs
+            }
+            by_endpoint = {}
+            for batch_id, raw in zip(batch_ids, self.redis.mget([self._batch_key(b) for b in batch_ids])):
+                if not raw:
+                    self.redis.zrem(self.QUEUE_KEY, batch_id)
+                    continue
+                batch = json.loads(decode_value(raw))
+                held_seq = retrying.get(batch['endpoint_id'])
+                if held_seq is not None and self._batch_seq(batch['id']) > held_seq:
+                    continue
+                by_endpoint.setdefault(batch['endpoint_id'], []).append(batch)
+
+            for batches in by_endpoint.values():
+                batches.sort(key=lambda batch: self._batch_seq(batch['id']))
+
+            with ThreadPoolExecutor(max_workers=min(Config.WEBHOOK_MAX_WORKERS, max(len(by_endpoint), 1))) as executor:
+                results = list(executor.map(lambda batches: self._deliver_endpoint(batches, token), by_endpoint.values()))
+
+            for outcomes, deferred in results:
+                for batch, error in outcomes:
+                    outcome = self._record_outcome(batch, error)
+                    stats[outcome] += 1
+                    if outcome == 'sent':
+                        stats['events'] += batch['events']
+                if deferred:
+                    # 暂缓的批次与失败批次一起重试（不计入失败次数）
+                    retry_at = self.redis.zscore(self.QUEUE_KEY, outcomes[-1][0]['id']) or int(time.time())
+                    self.redis.zadd(self.QUEUE_KEY, {batch['id']: retry_at for batch in deferred})
+        finally:
+            release_lock(self.redis, self.LOCK_KEY, token)
+
+        if stats['sent'] or stats['retried'] or stats['dead']:
+            self.logger.info(
+                f"Webhook推送完成 - 成功: {stats['sent']}批 ({stats['events']}个事件), "
+                f"重试: {stats['retried']}, 死信: {stats['dead']}"
+            )
+        return stats
+
+    def _record_outcome(self, batch: Dict, error: Optional[str]) -> str:
+        """更新批次状态，返回 sent / retried / dead"""
+        now = int(time.time())
+        pipe = self.redis.pipeline()
+        if error is None:
+            pipe.zrem(self.QUEUE_KEY, batch['id'])
+            pipe.delete(self._batch_key(batch['id']))
+            pipe.hdel(self.RETRYING_KEY, batch['endpoint_id'])
+            outcome = 'sent'
+        else:
+            batch['attempts'] += 1
+            batch['last_error'] = error
+            if batch['attempts'] >= Config.WEBHOOK_MAX_ATTEMPTS:
+                pipe.zrem(self.QUEUE_KEY, batch['id'])
+                pipe.zadd(self.DEAD_KEY, {batch['id']: now})
+                pipe.hdel(self.RETRYING_KEY, batch['endpoint_id'])
+                pipe.set(self._batch_key(batch['id']), json.dumps(batch), ex=Config.WEBHOOK_DEAD_RETENTION)
+                # 清理过期死信的索引（批次本身已按保留时间过期）
+                pipe.zremrangebyscore(self.DEAD_KEY, '-inf', now - Config.WEBHOOK_DEAD_RETENTION)
+                outcome = 'dead'
+                self.logger.error(f"Webhook推送失败 {batch['attempts']} 次，移入死信: {batch['id']} -> {batch['url']} - {error}")
+            else:
+                pipe.zadd(self.QUEUE_KEY, {batch['id']: now + self.backoff_delay(batch['attempts'])})
+                pipe.hset(self.RETRYING_KEY, batch['endpoint_id'], self._batch_seq(batch['id']))
+                pipe.set(self._batch_key(batch['id']), json.dumps(batch))
+                outcome = 'retried'
+                self.logger.warning(f"Webhook推送失败，稍后重试: {batch['id']} -> {batch['url']} (第{batch['attempts']}次) - {error}")
+        pipe.hincrby(self.STATS_KEY, outcome, 1)
+        pipe.execute()
+        if outcome == 'dead':
+            self._release_ledger(batch)
+        return outcome
+
+    def _release_ledger(self, batch: Dict):
+        """批次没有送达，释放其中事件的通知账本指纹（下次检测到时重新提醒）"""
+        try:
+            ledger = NotificationLedger(self.redis)
+            for entry in batch.get('ledger') or []:
+                ledger.release(entry['recipient'], list(entry['fingerprints']))
+        except Exception as e:
+            self.logger.warning(f"释放通知账本指纹失败: {batch['id']} - {e}")
+
+    def retry_dead(self, batch_id: str) -> bool:
+        """将死信批次重新放回待推送队列"""
+        raw = self.redis.get(self._batch_key(batch_id))
+        if not raw or self.redis.zscore(self.DEAD_KEY, batch_id) is None:
+            return False
+        batch = json.loads(decode_value(raw))
+        batch['attempts'] = 0
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.DEAD_KEY, batch_id)
+        pipe.zadd(self.QUEUE_KEY, {batch_id: int(time.time())})
+        pipe.set(self._batch_key(batch_id), json.dumps(batch))
+        pipe.persist(self._batch_key(batch_id))
+        pipe.execute()
+        # 重新推送期间同一事件不再重复入队
+        ledger = NotificationLedger(self.redis)
+        for entry in batch.get('ledger') or []:
+            ledger.record_each(entry['recipient'], entry['fingerprints'])
+        return True
+
+    def get_stats(self) -> Dict:
+        """获取推送统计"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.scard(self.DIRTY_KEY)
+        pipe.zcard(self.QUEUE_KEY)
+        pipe.zcard(self.DEAD_KEY)
+        pipe.hgetall(self.STATS_KEY)
+        dirty, queued, dead, totals = pipe.execute()
+        return {
+            'endpoints_pending': dirty,
+            'batches_queued': queued,
+            'batches_dead': dead,
+            'totals': {decode_value(k): int(decode_value(v)) for k, v in totals.items()}
+        }
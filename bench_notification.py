@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# 通知性能测试脚本（本地SMTP / HTTP接收端，不会发送真实邮件或请求）
+
+import sys
+import json
+import time
+import hmac
+import random
+import logging
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.notification import EmailNotifier, SMTPConnectionPool
+from app.webhook import WebhookNotifier, sign_payload
+
+# 配置日志
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger('bench_notification')
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """最小的SMTP会话处理：接受任何登录和收件人，只统计收到的邮件"""
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)  # 模拟网络往返
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)  # 模拟TLS握手等建连开销
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+        self.reply("220 bench-smtp ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b"250-bench-smtp\r\n250-AUTH PLAIN LOGIN\r\n")
+                self.reply("250 8BITMIME")
+            elif verb == 'HELO':
+                self.reply("250 bench-smtp")
+            elif verb == 'AUTH':
+                parts = command.split()
+                if len(parts) == 2 and parts[1].upper() == 'LOGIN':
+                    # AUTH LOGIN：依次询问用户名和密码
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    size += len(data_line)
+                with self.server.lock:
+                    self.server.stats['messages'] += 1
+                    self.server.stats['bytes'] += size
+                self.reply("250 OK queued")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply("250 OK")
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """在后台线程运行的本地SMTP接收端"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, connect_latency=0.0):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset(self):
+        self.stats = {'connections': 0, 'messages': 0, 'bytes': 0}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class WebhookSinkHandler(BaseHTTPRequestHandler):
+    """本地Webhook接收端：校验签名，统计收到的批次和事件"""
+    protocol_version = 'HTTP/1.1'  # 支持长连接，才能体现连接复用的效果
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        if self.server.latency:
+            time.sleep(self.server.latency)  # 模拟接收方处理耗时
+
+        expected = sign_payload(body, int(self.headers.get('X-Webstation-Timestamp') or 0), self.server.secret)
+        valid = hmac.compare_digest(expected, self.headers.get('X-Webstation-Signature') or '')
+        with self.server.lock:
+            if valid:
+                self.server.stats['requests'] += 1
+                self.server.stats['events'] += len(json.loads(body).get('events', []))
+                self.server.stats['bytes'] += len(body)
+            else:
+                self.server.stats['bad_signatures'] += 1
+
+        self.send_response(204 if valid else 401)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class WebhookSink(ThreadingHTTPServer):
+    """在后台线程运行的本地Webhook接收端"""
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, secret=None):
+        super().__init__(('127.0.0.1', 0), WebhookSinkHandler)
+        self.latency = latency
+        self.secret = Config.WEBHOOK_SECRET if secret is None else secret
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset(self):
+        self.stats = {'connections': 0, 'requests': 0, 'events': 0, 'bytes': 0, 'bad_signatures': 0}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def make_items(count, prefix):
+    """生成模拟商品"""
+    return [
+        {
+            'id': f"{prefix}{index}",
+            'title': f"Bench item {prefix}{index} - " + ' '.join(random.choice(['Vintage', 'New', 'Rare', 'Lot', 'Set']) for _ in range(8)),
+            'url': f"https://www.ebay.com/itm/{100000000000 + index}",
+            'price': round(random.uniform(1, 500), 2),
+            'currency': '$',
+            'image_url': f"https://i.ebayimg.com/images/g/{prefix}{index}/s-l500.jpg",
+            'shipping': 'Free shipping',
+            'status': 'Brand New',
+            'listing_date': time.strftime('%Y-%m-%d'),
+            'is_new_listing': True
+        }
+        for index in range(count)
+    ]
+
+
+def render_messages(message_count, items_per_message):
+    """渲染邮件（新上架和价格变动交替），返回邮件列表和平均渲染耗时"""
+    rendered = []
+
+    class CapturingNotifier(EmailNotifier):
+        def send_email(self, recipient, subject, body, is_html=True, text_body=None):
+            rendered.append((recipient, subject, body, is_html, text_body))
+            return True
+
+    notifier = CapturingNotifier()
+    render_times = []
+    for index in range(message_count):
+        items = make_items(items_per_message, f"m{index}_")
+        start = time.perf_counter()
+        if index % 2 == 0:
+            notifier.notify_new_listings('bench@example.com', f"bench_store_{index % 30}", items)
+        else:
+            changes = [{'item': item, 'old_price': item['price'] + 1, 'new_price': item['price']} for item in items]
+            notifier.notify_price_changes('bench@example.com', f"bench_store_{index % 30}", changes)
+        render_times.append(time.perf_counter() - start)
+    return rendered, sum(render_times) / len(render_times)
+
+
+def run_variant(name, sink, messages, pool, workers=1):
+    """用指定的连接池投递所有邮件，返回统计结果"""
+    notifier = EmailNotifier()
+    notifier.pool = pool
+    sink.reset()
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda message: notifier.deliver(*message), messages))
+    else:
+        results = [notifier.deliver(*message) for message in messages]
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    return {
+        'variant': name,
+        'sent': sum(1 for result in results if result),
+        'seconds': elapsed,
+        'messages_per_second': len(messages) / elapsed if elapsed else 0,
+        'bytes_per_message': sink.stats['bytes'] / max(sink.stats['messages'], 1),
+        'connections': sink.stats['connections']
+    }
+
+
+def run_benchmark(message_count, items_per_message, workers, latency, connect_latency, variants):
+    """执行性能测试并打印结果"""
+    sink = SMTPSink(latency=latency, connect_latency=connect_latency).start()
+    logger.warning(f"本地SMTP接收端已启动: 127.0.0.1:{sink.port}")
+
+    messages, render_time = render_messages(message_count, items_per_message)
+    print(f"渲染: {len(messages)} 封邮件, 每封 {items_per_message} 个商品, 平均渲染耗时 {render_time * 1000:.2f} 毫秒")
+
+    def pool(size=1, max_messages=None):
+        return SMTPConnectionPool('127.0.0.1', sink.port, 'bench', 'bench',
+                                  size=size, idle_timeout=60, max_messages=max_messages)
+
+    available = {
+        # 每封邮件新建连接（连接池引入前的发送方式）
+        'direct': lambda: run_variant('direct', sink, messages, pool(max_messages=1)),
+        # 单连接复用
+        'pooled': lambda: run_variant('pooled', sink, messages, pool()),
+        # 多连接并发投递
+        'concurrent': lambda: run_variant('concurrent', sink, messages, pool(size=workers), workers=workers),
+    }
+
+    unknown = [variant for variant in variants if variant not in available]
+    if unknown:
+        sink.shutdown()
+        raise ValueError(f"未知的发送方式: {', '.join(unknown)}（可选: {', '.join(available)}）")
+
+    results = [available[variant]() for variant in variants]
+    sink.shutdown()
+
+    print(f"\n{'方式':<12}{'成功':>8}{'耗时(秒)':>12}{'封/秒':>12}{'字节/封':>12}{'连接数':>10}")
+    for result in results:
+        print(
+            f"{result['variant']:<12}{result['sent']:>8}{result['seconds']:>12.2f}"
+            f"{result['messages_per_second']:>12.1f}{result['bytes_per_message']:>12.0f}{result['connections']:>10}"
+        )
+    return all(result['sent'] == len(messages) for result in results)
+
+
+def run_webhook_variant(name, sink, events, endpoints, batch_size, workers, session_factory):
+    """把事件推送到本地接收端（每个接收地址按顺序推送，地址之间并发），返回统计结果"""
+    sink.reset()
+
+    # 每个接收地址的事件按 batch_size 打包（batch_size=1 即逐条推送）
+    batches = {}
+    for index, event in enumerate(events):
+        url = f"http://127.0.0.1:{sink.port}/hook/{index % endpoints}"
+        batches.setdefault(url, []).append(event)
+    work = [
+        [(url, json.dumps({'events': chunk[start:start + batch_size]})) for start in range(0, len(chunk), batch_size)]
+        for url, chunk in batches.items()
+    ]
+
+    def deliver(endpoint_batches):
+        notifier = WebhookNotifier(None, session=session_factory())
+        return [notifier.post(url, body) for url, body in endpoint_batches]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors = [error for result in executor.map(deliver, work) for error in result if error]
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        logger.warning(f"{name}: {len(errors)} 次推送失败，例如: {errors[0]}")
+    return {
+        'variant': name,
+        'events': sink.stats['events'],
+        'requests': sink.stats['requests'],
+        'seconds': elapsed,
+        'events_per_second': sink.stats['events'] / elapsed if elapsed else 0,
+        'connections': sink.stats['connections'],
+        'bad_signatures': sink.stats['bad_signatures']
+    }
+
+
+def run_webhook_benchmark(event_count, endpoints, batch_size, workers, latency):
+    """Webhook推送性能测试：逐条推送与批量、连接复用、并发推送对比"""
+    import requests
+    from app.webhook import get_webhook_session
+
+    # 未配置签名密钥时不会推送，测试使用临时密钥
+    if not Config.WEBHOOK_SECRET:
+        Config.WEBHOOK_SECRET = 'bench-secret'
+
+    sink = WebhookSink(latency=latency).start()
+    logger.warning(f"本地Webhook接收端已启动: 127.0.0.1:{sink.port}")
+
+    events = [
+        {'type': 'price_changes', 'source': f"bench_store_{index % 30}",
+         'data': {'items': [{'item': item, 'old_price': item['price'] + 1, 'new_price': item['price']}]},
+         'occurred_at': int(time.time())}
+        for index, item in enumerate(make_items(event_count, 'w'))
+    ]
+
+    class OneShotSession(requests.Session):
+        """每次请求后关闭连接（不复用连接）"""
+        def request(self, *args, **kwargs):
+            try:
+                return super().request(*args, **kwargs)
+            finally:
+                self.close()
+
+    results = [
+        # 每个事件单独推送、单独建立连接
+        run_webhook_variant('single', sink, events, endpoints, 1, 1, OneShotSession),
+        # 批量推送，复用连接，逐个地址推送
+        run_webhook_variant('batched', sink, events, endpoints, batch_size, 1, get_webhook_session),
+        # 批量推送，复用连接，多个地址并发
+        run_webhook_variant('concurrent', sink, events, endpoints, batch_size, workers, get_webhook_session),
+    ]
+    sink.shutdown()
+
+    print(f"\n{'Webhook':<12}{'事件':>8}{'请求数':>10}{'耗时(秒)':>12}{'事件/秒':>12}{'连接数':>10}{'签名错误':>10}")
+    for result in results:
+        print(
+            f"{result['variant']:<12}{result['events']:>8}{result['requests']:>10}{result['seconds']:>12.2f}"
+            f"{result['events_per_second']:>12.1f}{result['connections']:>10}{result['bad_signatures']:>10}"
+        )
+    return all(result['events'] == event_count and not result['bad_signatures'] for result in results)
+
+
+if __name__ == "__main__":
+    # 创建命令行参数解析器
+    parser = argparse.ArgumentParser(description='通知性能测试（本地SMTP / HTTP接收端）')
+
+    parser.add_argument('--messages', type=int, default=100, help='邮件数量（默认100）')
+    parser.add_argument('--items', type=int, default=50, help='每封邮件的商品数（默认50）')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent 方式的并发连接数（默认4）')
+    parser.add_argument('--latency', type=float, default=2.0, help='SMTP每条命令的模拟延迟，毫秒（默认2）')
+    parser.add_argument('--connect-latency', type=float, default=50.0, help='建立连接的模拟延迟，毫秒（默认50）')
+    parser.add_argument('--variants', default='direct,pooled,concurrent', help='测试的发送方式，逗号分隔')
+    parser.add_argument('--webhook-events', type=int, default=0, help='Webhook测试的事件数（默认0，不测试）')
+    parser.add_argument('--webhook-endpoints', type=int, default=4, help='Webhook测试的接收地址数（默认4）')
+    parser.add_argument('--webhook-latency', type=float, default=5.0, help='Webhook接收端的模拟处理延迟，毫秒（默认5）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='显示详细日志')
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    variants = [variant.strip() for variant in args.variants.split(',') if variant.strip()]
+    success = True
+    if variants:
+        success = run_benchmark(
+            args.messages, args.items, args.workers,
+            args.latency / 1000, args.connect_latency / 1000, variants
+        )
+    if args.webhook_events > 0:
+        success = run_webhook_benchmark(
+            args.webhook_events, args.webhook_endpoints, Config.WEBHOOK_BATCH_SIZE,
+            args.workers, args.webhook_latency / 1000
+        ) and success
+
+    # 设置退出码
+    sys.exit(0 if success else 1)
@@ -0,0 +1,22 @@
+# 测试公共夹具
+
+import pytest
+
+# 需要命令行参数、真实的Redis和eBay访问的脚本，手动运行
+collect_ignore = ['test_scheduler.py']
+
+
+@pytest.fixture
+def redis_client():
+    """使用 fakeredis 模拟 Redis（未安装 fakeredis 时跳过测试）"""
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    client.flushall()
+
+
+@pytest.fixture
+def lua_redis_client(redis_client):
+    """需要执行 Lua 脚本（如令牌锁的释放）的测试使用，fakeredis 没有 Lua 支持时跳过"""
+    pytest.importorskip('lupa', reason='需要安装 fakeredis[lua]')
+    return redis_client
@@ -0,0 +1,91 @@
+"""
+测试变动事件流：写入店铺/全局事件流、按游标增量读取、裁剪检测和消费组
+"""
+
+import pytest
+from app.change_stream import ChangeStream, InvalidCursor
+
+
+def _changes(start, count):
+    return {
+        'new_listings': [{'id': str(item_id), 'title': f'商品 {item_id}', 'price': 10.0}
+                         for item_id in range(start, start + count)],
+        'price_changes': [],
+        'removed_listings': []
+    }
+
+
+def test_publish_and_read_with_cursor(redis_client):
+    """按游标分页读取时每个事件恰好读到一次，读完后游标停在最后一个事件"""
+    stream = ChangeStream(redis_client)
+    assert stream.publish('store_a', _changes(0, 5), 1700000000) == 5
+    assert stream.publish('store_b', {'price_changes': [
+        {'item': {'id': '99'}, 'old_price': 20.0, 'new_price': 18.0}
+    ]}, 1700000001) == 1
+    assert stream.publish('store_a', _changes(5, 2), 1700000002) == 2
+    assert stream.publish('store_a', {}, 1700000003) == 0
+
+    item_ids, cursor, pages = [], None, 0
+    while True:
+        page = stream.read_since(cursor, store_name='store_a', limit=3)
+        item_ids.extend(event['item_id'] for event in page['events'])
+        assert not page['truncated']
+        cursor = page['cursor']
+        pages += 1
+        if not page['has_more']:
+            break
+    assert item_ids == [str(item_id) for item_id in range(7)]
+    assert pages == 3
+    assert cursor == stream.latest_cursor('store_a')
+
+    # 读到末尾后没有新事件时游标不变
+    page = stream.read_since(cursor, store_name='store_a')
+    assert page['events'] == [] and page['cursor'] == cursor and not page['has_more']
+
+    # 全局事件流包含所有店铺的事件
+    events = stream.read_since(None, limit=100)['events']
+    assert [event['store'] for event in events] == ['store_a'] * 5 + ['store_b'] + ['store_a'] * 2
+    assert events[5]['type'] == 'price_change' and events[5]['item_id'] == '99'
+    assert events[5]['data']['new_price'] == 18.0 and events[5]['ts'] == 1700000001
+
+
+def test_truncated_cursor(redis_client):
+    """游标之后的事件已被裁剪时标记 truncated，消费者应重新拉取完整数据"""
+    stream = ChangeStream(redis_client)
+    stream.publish('store_a', _changes(0, 3), 1700000000)
+    cursor = stream.read_since(None, store_name='store_a', limit=1)['cursor']
+    assert not stream.read_since(cursor, store_name='store_a')['truncated']
+
+    stream.publish('store_a', _changes(3, 3), 1700000001)
+    redis_client.xtrim(stream.stream_key('store_a'), maxlen=2, approximate=False)
+    page = stream.read_since(cursor, store_name='store_a')
+    assert page['truncated']
+    assert [event['item_id'] for event in page['events']] == ['4', '5']
+
+
+def test_invalid_cursor(redis_client):
+    """游标格式无效时报错"""
+    stream = ChangeStream(redis_client)
+    assert ChangeStream.parse_cursor('1700000000000-3') == (1700000000000, 3)
+    assert ChangeStream.parse_cursor('1700000000000') == (1700000000000, 0)
+    for cursor in ('abc', '1-2-3', '-1', '$'):
+        with pytest.raises(InvalidCursor):
+            stream.read_since(cursor, store_name='store_a')
+
+
+def test_consumer_group(redis_client):
+    """消费组成员分别读取未分配的事件，确认后不再待处理"""
+    stream = ChangeStream(redis_client)
+    stream.publish('store_a', _changes(0, 4), 1700000000)
+
+    first = stream.read_group('sync', 'worker-1', store_name='store_a', count=3)
+    second = stream.read_group('sync', 'worker-2', store_name='store_a', count=3)
+    assert [event['item_id'] for event in first] == ['0', '1', '2']
+    assert [event['item_id'] for event in second] == ['3']
+    assert stream.ensure_group('sync', store_name='store_a') is False
+
+    assert stream.ack('sync', [event['id'] for event in first + second], store_name='store_a') == 4
+    assert stream.read_group('sync', 'worker-1', store_name='store_a') == []
+    groups = stream.get_group_info('store_a')
+    assert groups[0]['name'] == 'sync' and int(groups[0]['pending']) == 0
+
@@ -0,0 +1,107 @@
+"""
+测试价格对比批量执行：全局请求限速、有界并发抓取、多个对比共用的商品URL只抓取一次
+"""
+
+import time
+import threading
+from app.comparison_executor import ComparisonExecutor, RequestThrottle
+
+
+class FakeScraper:
+    """记录抓取的URL和同时进行的抓取数，failing 中的URL抓取出错"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.failing = set()
+        self.fetched = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_single_listing_info(self, url, request_delay=True, **kwargs):
+        assert request_delay is False
+        with self._lock:
+            self.fetched.append(url)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if url in self.failing:
+            raise RuntimeError('页面抓取失败')
+        return {'url': url, 'price': float(url.rsplit('/', 1)[-1])}
+
+
+class FakeResolver:
+    """没有店铺数据可用，所有URL都需要抓取商品页面"""
+
+    def split_resolvable(self, urls):
+        return {'resolved': {}, 'to_fetch': list(urls)}
+
+
+class FakeComparison:
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.resolver = FakeResolver()
+
+    def evaluate_comparison(self, config, my_info, competitor_info):
+        return {'price_difference': my_info['price'] - competitor_info['price']}
+
+
+def _config(comparison_id, my_price, competitor_price):
+    return {
+        'id': comparison_id,
+        'my_listing': {'url': f'https://www.ebay.com/itm/{my_price}'},
+        'competitor_listing': {'url': f'https://www.ebay.com/itm/{competitor_price}'}
+    }
+
+
+def test_throttle_spaces_request_starts():
+    throttle = RequestThrottle(0.05)
+    starts = []
+    lock = threading.Lock()
+
+    def request():
+        throttle.wait()
+        with lock:
+            starts.append(time.time())
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    starts.sort()
+    assert all(later - earlier >= 0.045 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_shared_urls_fetched_once():
+    scraper = FakeScraper()
+    scraper.failing.add('https://www.ebay.com/itm/30')
+    executor = ComparisonExecutor(FakeComparison(scraper), max_workers=4, min_interval=0)
+    configs = [_config('comp_1', 10, 20), _config('comp_2', 10, 25), _config('comp_3', 25, 30)]
+
+    assert ComparisonExecutor.collect_urls(configs) == [
+        'https://www.ebay.com/itm/10', 'https://www.ebay.com/itm/20',
+        'https://www.ebay.com/itm/25', 'https://www.ebay.com/itm/30'
+    ]
+    outcome = executor.run(configs)
+    assert sorted(scraper.fetched) == sorted(ComparisonExecutor.collect_urls(configs))
+    assert outcome['unique_listings'] == 4 and outcome['failed_listings'] == 1
+    # 缺少商品信息的对比跳过评估，不影响其他对比
+    assert outcome['results'] == {
+        'comp_1': {'price_difference': -10.0},
+        'comp_2': {'price_difference': -15.0},
+        'comp_3': None
+    }
+
+
+def test_concurrency_bounded_by_max_workers():
+    scraper = FakeScraper(delay=0.05)
+    executor = ComparisonExecutor(FakeComparison(scraper), max_workers=2, min_interval=0)
+    urls = [f'https://www.ebay.com/itm/{price}' for price in range(6)]
+
+    fetched = executor.fetch_all(urls)
+    assert list(fetched) == urls and all(fetched.values())
+    assert scraper.max_active == 2
@@ -0,0 +1,78 @@
+"""
+测试价格对比分组：向量化计算价格差异和排名，分组商品只抓取一次并保存评估结果
+"""
+
+import pytest
+from app.comparison_executor import ComparisonExecutor
+from app.comparison_groups import ComparisonGroupManager, evaluate_pairs
+
+
+def _url(item_id):
+    return f'https://www.ebay.com/itm/{item_id}'
+
+
+@pytest.fixture
+def manager(redis_client):
+    return ComparisonGroupManager(redis_client)
+
+
+def test_evaluate_pairs():
+    arrays = evaluate_pairs(
+        my_prices=[100.0, 100.0, 100.0, 50.0],
+        competitor_prices=[90.0, 120.0, 0.0, 50.0],
+        thresholds=[5.0, 30.0, 5.0, 5.0],
+        owners=[0, 0, 0, 1],
+        owner_count=2
+    )
+    assert arrays['difference'].tolist() == [-10.0, 20.0, 0.0, 0.0]
+    assert arrays['percentage'].tolist() == [-10.0, 20.0, 0.0, 0.0]
+    # 状态：0 未知（缺少价格）、1 相同、2 对手更贵、3 对手更便宜
+    assert arrays['status'].tolist() == [3, 2, 0, 1]
+    assert arrays['threshold_exceeded'].tolist() == [True, False, False, False]
+    assert arrays['ranks'].tolist() == [2, 1]
+    assert arrays['competitors'].tolist() == [2, 1]
+
+
+def test_create_group_validation(manager):
+    with pytest.raises(ValueError):
+        manager.create_group('空分组', [], [_url(2)])
+    with pytest.raises(ValueError):
+        manager.create_group('无效URL', [_url(1)], ['https://example.com/item/2'])
+
+
+def test_perform_groups(manager, monkeypatch):
+    listings = {
+        _url(1): {'title': '我的商品 1', 'current': 100.0},
+        _url(2): {'title': '我的商品 2', 'current': 80.0},
+        _url(11): {'title': '对手 11', 'current': 90.0},
+        _url(12): {'title': '对手 12', 'current': 110.0},
+    }
+    fetched = []
+
+    def fetch_all(self, urls, bypass_cache=False):
+        fetched.append(list(urls))
+        return {url: listings.get(url) for url in urls}
+
+    monkeypatch.setattr(ComparisonExecutor, 'fetch_all', fetch_all)
+    basket = manager.create_group('篮子', [_url(1), _url(2), _url(1)], [_url(11), _url(12)],
+                                  notify_conditions={'higher': False, 'lower': True, 'threshold': 5.0})
+    single = manager.create_group(None, [_url(2)], [_url(11)])
+    assert basket['type'] == 'basket' and len(basket['my_listings']) == 2
+    assert single['type'] == 'listing' and single['name'] == '1 vs 1'
+
+    results = manager.perform_groups(manager.get_all_groups())
+    # 多个分组共用的商品只抓取一次
+    assert len(fetched) == 1 and sorted(fetched[0]) == sorted([_url(1), _url(2), _url(11), _url(12)])
+
+    result = results[basket['id']]
+    assert [(listing['url'], listing['rank']) for listing in result['listings']] == [(_url(1), 2), (_url(2), 1)]
+    assert [pair['status'] for pair in result['listings'][0]['pairs']] == ['competitor_lower', 'competitor_higher']
+    assert result['alerts'] == 1
+    assert results[single['id']]['alerts'] == 1
+
+    # 保存最新结果并回填商品标题
+    assert manager.get_latest_result(basket['id']) == result
+    assert manager.get_group(basket['id'])['competitors'][0]['title'] == '对手 11'
+
+    assert manager.delete_group(single['id'])
+    assert [group['id'] for group in manager.get_all_groups()] == [basket['id']]
@@ -0,0 +1,89 @@
+"""
+测试价格对比历史：有序集合分页（含同一秒内的多条记录）、旧版数据迁移和删除
+"""
+
+import json
+import pytest
+from app.comparison import PriceComparison, LEGACY_HISTORY_MIGRATED_KEY
+
+
+@pytest.fixture
+def comparison(redis_client):
+    return PriceComparison(redis_client)
+
+
+def _save_records(comparison, comparison_id, timestamps):
+    for seq, timestamp in enumerate(timestamps):
+        comparison.save_comparison_history(comparison_id, {'timestamp': timestamp, 'seq': seq})
+
+
+def _read_all(comparison, comparison_id, limit, **kwargs):
+    records, cursor = [], None
+    while True:
+        page = comparison.get_comparison_history_page(comparison_id, limit=limit, cursor=cursor, **kwargs)
+        assert len(page['records']) <= limit
+        records.extend(page['records'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return records
+
+
+def _save_legacy(redis_client, comparison_id, timestamps):
+    redis_client.set(f'comparison:history_index:{comparison_id}', json.dumps(timestamps))
+    for seq, timestamp in enumerate(timestamps):
+        redis_client.set(f'comparison:history:{comparison_id}:{timestamp}',
+                         json.dumps({'timestamp': timestamp, 'seq': seq}))
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 10, 20])
+def test_pagination_with_same_second_records(comparison, limit):
+    """按游标翻页时每条记录恰好出现一次，且按时间倒序"""
+    base = 1700000000
+    # 多条记录落在同一秒，且跨越页边界
+    timestamps = [base, base + 1, base + 1, base + 1, base + 1, base + 1, base + 2, base + 5, base + 5, base + 9]
+    _save_records(comparison, 'cmp_1', timestamps)
+
+    records = _read_all(comparison, 'cmp_1', limit)
+    assert sorted(record['seq'] for record in records) == list(range(len(timestamps)))
+    assert [record['timestamp'] for record in records] == sorted(timestamps, reverse=True)
+
+    # 按时间范围读取
+    records = _read_all(comparison, 'cmp_1', limit, start=base + 1, end=base + 5)
+    assert sorted(record['seq'] for record in records) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert comparison.get_latest_comparison_result('cmp_1')['seq'] == len(timestamps) - 1
+
+
+def test_invalid_cursor(comparison):
+    with pytest.raises(ValueError):
+        comparison.get_comparison_history_page('cmp_1', cursor='abc')
+
+
+def test_legacy_history_migration(comparison, redis_client):
+    """旧版历史记录只在迁移任务中转换，读写路径不再检查旧版键"""
+    _save_legacy(redis_client, 'cmp_1', [1700000000, 1700000100, 1700000200])
+    _save_legacy(redis_client, 'cmp_2', [1700000050])
+    assert comparison.get_comparison_history('cmp_1', limit=10) == []
+
+    assert comparison.migrate_legacy_history() == 2
+    assert [record['seq'] for record in comparison.get_comparison_history('cmp_1', limit=10)] == [2, 1, 0]
+    assert [record['seq'] for record in comparison.get_comparison_history('cmp_2', limit=10)] == [0]
+    assert not redis_client.exists('comparison:history_index:cmp_1')
+    assert not redis_client.exists('comparison:history:cmp_1:1700000000')
+    assert redis_client.exists(LEGACY_HISTORY_MIGRATED_KEY)
+
+    # 已迁移后不再扫描
+    _save_legacy(redis_client, 'cmp_3', [1700000000])
+    assert comparison.migrate_legacy_history() == 0
+    assert redis_client.exists('comparison:history_index:cmp_3')
+
+
+def test_delete_cleans_legacy_keys(comparison, redis_client):
+    """删除对比时清理所有相关键，包括迁移前残留的旧版键"""
+    # 另一个对比的旧版记录不应受影响
+    redis_client.set('comparison:history:cmp_10:1700000000', json.dumps({'timestamp': 1700000000}))
+    redis_client.set('comparison:history:cmp_1:1690000000', '{}')
+    comparison.save_comparison_history('cmp_1', {'timestamp': 1700000300, 'seq': 3})
+
+    comparison.delete_comparison('cmp_1')
+    assert [key for key in redis_client.scan_iter(match='comparison:*cmp_1*') if 'cmp_10' not in key] == []
+    assert redis_client.exists('comparison:history:cmp_10:1700000000')
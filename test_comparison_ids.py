@@ -0,0 +1,45 @@
+"""
+测试对比配置ID分配：按日期原子递增，并发创建时不重复，跳过旧方式生成的已占用编号
+"""
+
+import threading
+import pytest
+from app.comparison import PriceComparison
+
+
+@pytest.fixture
+def comparison(redis_client):
+    return PriceComparison(redis_client=redis_client)
+
+
+def test_sequential_ids_per_day(comparison, redis_client):
+    assert comparison.allocate_comparison_id('20241201') == 'comp_20241201_001'
+    assert comparison.allocate_comparison_id('20241201') == 'comp_20241201_002'
+    assert comparison.allocate_comparison_id('20241202') == 'comp_20241202_001'
+    # 计数器两天后过期
+    assert 0 < redis_client.ttl('comparison:id_counter:20241201') <= 2 * 24 * 3600
+
+
+def test_skips_legacy_ids(comparison, redis_client):
+    redis_client.set('comparison:config:comp_20241201_001', '{}')
+    redis_client.set('comparison:config:comp_20241201_002', '{}')
+    assert comparison.allocate_comparison_id('20241201') == 'comp_20241201_003'
+
+
+def test_concurrent_allocation_unique(comparison):
+    ids = []
+    lock = threading.Lock()
+
+    def allocate():
+        for _ in range(10):
+            comparison_id = comparison.allocate_comparison_id('20241201')
+            with lock:
+                ids.append(comparison_id)
+
+    threads = [threading.Thread(target=allocate) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(ids) == [f'comp_20241201_{number:03d}' for number in range(1, 51)]
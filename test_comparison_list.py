@@ -0,0 +1,38 @@
+"""
+测试对比列表：配置和最新结果一次读取，旧数据缺少最新结果键时从历史中读取并回填
+"""
+
+import json
+import pytest
+from app.comparison import PriceComparison
+
+
+def _config(comparison_id, last_check=0):
+    return {'id': comparison_id, 'name': comparison_id, 'last_check': last_check, 'status': 'active'}
+
+
+@pytest.fixture
+def comparison(redis_client):
+    return PriceComparison(redis_client=redis_client)
+
+
+def test_configs_with_latest_result(comparison, redis_client):
+    for comparison_id in ('comp_1', 'comp_2', 'comp_3'):
+        redis_client.set(f'comparison:config:{comparison_id}', json.dumps(_config(comparison_id, 1700000000)))
+        comparison._add_to_comparison_list(comparison_id)
+    comparison._add_to_comparison_list('comp_deleted')
+
+    comparison.save_comparison_history('comp_1', {'timestamp': 1700000000, 'comparison_id': 'comp_1'})
+    comparison.save_comparison_history('comp_1', {'timestamp': 1700000100, 'comparison_id': 'comp_1'})
+    # 旧数据：有历史记录但没有最新结果键
+    redis_client.zadd('comparison:history:comp_2', {json.dumps({'timestamp': 1700000050}): 1700000050})
+
+    comparisons = comparison.get_all_comparisons_with_latest()
+    # 配置已删除的ID跳过，从未检查过的对比没有最新结果
+    assert [config['id'] for config in comparisons] == ['comp_1', 'comp_2', 'comp_3']
+    assert comparisons[0]['latest_result']['timestamp'] == 1700000100
+    assert comparisons[1]['latest_result'] == {'timestamp': 1700000050}
+    assert comparisons[2]['latest_result'] is None
+    assert json.loads(redis_client.get('comparison:latest:comp_2')) == {'timestamp': 1700000050}
+
+    assert [config['id'] for config in comparison.get_all_comparisons()] == ['comp_1', 'comp_2', 'comp_3']
@@ -0,0 +1,75 @@
+"""
+测试通知摘要：同一收件人在合并窗口内的通知按店铺分组合并，窗口到期后发送，发送失败时放回重试
+"""
+
+import pytest
+from app.digest import NotificationDigest
+
+
+class FakeNotifier:
+    """记录发送的摘要，failing 中的收件人发送失败"""
+
+    def __init__(self):
+        self.failing = set()
+        self.sent = []
+
+    def notify_digest(self, recipient, grouped, ledger=None):
+        if recipient in self.failing:
+            return False
+        self.sent.append((recipient, grouped))
+        return True
+
+
+def _item(item_id, price=10.0):
+    return {'id': str(item_id), 'title': f'商品 {item_id}', 'price': price, 'raw_html': '<div></div>'}
+
+
+def _change(item_id, old_price, new_price):
+    return {'item': _item(item_id, new_price), 'old_price': old_price, 'new_price': new_price}
+
+
+@pytest.fixture
+def digest(redis_client):
+    return NotificationDigest(redis_client, window=600)
+
+
+def test_group_entries(digest):
+    digest.add_new_listings('a@example.com', 'store_a', [_item(1), _item(2)])
+    digest.add_new_listings('a@example.com', 'store_a', [_item(2, 12.0)])
+    digest.add_price_changes('a@example.com', 'store_a', [_change(3, 20.0, 18.0), _change(4, 5.0, 6.0)])
+    # 窗口内多次变价保留最初的原价，变回原价的商品不再列出
+    digest.add_price_changes('a@example.com', 'store_a', [_change(3, 18.0, 15.0), _change(4, 6.0, 5.0)])
+    digest.add_new_listings('a@example.com', 'store_b', [_item(5)])
+    digest.add_comparison('a@example.com', {'id': 'comp_1', 'name': '对比'}, {'price_difference': 1.0})
+
+    grouped = digest.group_entries(digest._take_pending('a@example.com'))
+    store_a = grouped['stores']['store_a']
+    assert [(item['id'], item['price']) for item in store_a['new_listings']] == [('1', 10.0), ('2', 12.0)]
+    # 摘要中只保留邮件需要的商品字段
+    assert 'raw_html' not in store_a['new_listings'][0]
+    assert [(c['item']['id'], c['old_price'], c['new_price']) for c in store_a['price_changes']] == [('3', 20.0, 15.0)]
+    assert [item['id'] for item in grouped['stores']['store_b']['new_listings']] == ['5']
+    assert [comparison['config']['id'] for comparison in grouped['comparisons']] == ['comp_1']
+
+
+def test_flush_due(digest, redis_client):
+    notifier = FakeNotifier()
+    digest.add_new_listings('a@example.com', 'store_a', [_item(1)])
+    digest.add_price_changes('a@example.com', 'store_b', [_change(2, 20.0, 18.0)])
+    digest.add_new_listings('b@example.com', 'store_a', [_item(1)])
+
+    # 合并窗口未到期时不发送
+    assert digest.flush_due(notifier)['recipients'] == 0
+    assert notifier.sent == []
+
+    notifier.failing.add('b@example.com')
+    stats = digest.flush_due(notifier, force=True)
+    assert stats == {'recipients': 2, 'notifications': 3, 'emails_sent': 1}
+    assert [recipient for recipient, _ in notifier.sent] == ['a@example.com']
+    assert set(notifier.sent[0][1]['stores']) == {'store_a', 'store_b'}
+
+    # 发送失败的摘要放回并立即到期，下次重试
+    notifier.failing.clear()
+    assert digest.flush_due(notifier)['emails_sent'] == 1
+    assert [recipient for recipient, _ in notifier.sent] == ['a@example.com', 'b@example.com']
+    assert not redis_client.exists(NotificationDigest.DUE_KEY, 'digest:pending:b@example.com')
@@ -0,0 +1,37 @@
+"""
+测试邮件模板：HTML 和纯文本正文渲染、HTML 转义，以及多个列表共用的商品数量上限
+"""
+
+from app.email_templates import ItemBudget, format_money, render_email
+
+
+def _item(item_id, title=None):
+    return {'id': str(item_id), 'title': title or f'商品 {item_id}', 'price': 1234.5,
+            'url': f'https://www.ebay.com/itm/{item_id}'}
+
+
+def test_item_budget_shared_across_sections():
+    budget = ItemBudget(limit=3)
+    assert budget.take([1, 2]) == {'items': [1, 2], 'total': 2, 'more': 0}
+    assert budget.take([3, 4, 5]) == {'items': [3], 'total': 3, 'more': 2}
+    assert budget.take([6]) == {'items': [], 'total': 1, 'more': 1}
+
+
+def test_format_money():
+    assert format_money(1234.5) == '$1,234.50'
+    assert format_money('12', '£') == '£12.00'
+    assert format_money('N/A') == '$N/A'
+
+
+def test_render_new_listings():
+    items = [_item(1, '<b>Vintage</b> camera'), _item(2), _item(3)]
+    html, text = render_email('new_listings', store_name='store_a', listings=ItemBudget(limit=2).take(items))
+
+    # HTML 正文转义商品标题，纯文本正文原样输出
+    assert '&lt;b&gt;Vintage&lt;/b&gt; camera' in html and '<b>Vintage</b>' not in html
+    assert '- <b>Vintage</b> camera' in text
+    assert '$1,234.50' in html and '$1,234.50' in text
+    assert 'https://www.ebay.com/itm/2' in text and 'https://www.ebay.com/itm/3' not in text
+    # 超出上限的商品只显示数量
+    assert '以及其他 1 个（共 3 个）' in html and '以及其他 1 个（共 3 个）' in text
+    assert '<html' not in text
@@ -0,0 +1,88 @@
+"""
+测试店铺历史引擎：增量链回放、按时间点还原、两个时间点对比和清理
+"""
+
+import random
+from app.history import StoreHistory
+
+
+def _strip(items):
+    """去掉易变的 timestamp 字段后比较"""
+    return [{field: value for field, value in item.items() if field != 'timestamp'} for item in items]
+
+
+def _random_versions(count, seed=7):
+    """生成一串随机变化的店铺商品列表（上新、下架、改价、删字段）"""
+    rng = random.Random(seed)
+    items = [{'id': str(i), 'title': f'商品 {i}', 'price': 10.0 + i} for i in range(20)]
+    next_id = 20
+    versions = []
+    for _ in range(count):
+        items = [dict(item) for item in items]
+        for item in rng.sample(items, 3):
+            item['price'] = round(item['price'] * rng.uniform(0.8, 1.2), 2)
+        if rng.random() < 0.5:
+            items.pop(rng.randrange(len(items)))
+        if rng.random() < 0.3:
+            rng.choice(items).pop('title', None)
+        for _ in range(rng.randint(0, 2)):
+            items.insert(0, {'id': str(next_id), 'title': f'商品 {next_id}', 'price': 5.0, 'shipping': 'Free'})
+            next_id += 1
+        versions.append(items)
+    return versions
+
+
+def test_chain_replay(redis_client):
+    """每个时间点的状态都能由关键帧 + 增量链还原"""
+    history = StoreHistory(redis_client, keyframe_interval=4, retention_days=30)
+    versions = _random_versions(11)
+    start = 1700000000
+
+    previous = None
+    for index, items in enumerate(versions):
+        summary = history.record_update('store_a', items, previous, start + index * 3600)
+        assert summary['type'] == ('keyframe' if index % 4 == 0 else 'delta'), (index, summary)
+        previous = items
+
+    for index, items in enumerate(versions):
+        state = history.get_store_state('store_a', start + index * 3600)
+        assert state['timestamp'] == start + index * 3600
+        assert _strip(state['items']) == items, index
+
+    # 两个记录之间的时间点还原为之前最近的状态，最早记录之前没有状态
+    assert _strip(history.get_store_state('store_a', start + 5 * 3600 + 60)['items']) == versions[5]
+    assert _strip(history.get_store_state('store_a')['items']) == versions[-1]
+    assert history.get_store_state('store_a', start - 1) is None
+
+
+def test_stale_previous_items_ignored(redis_client):
+    """调用方传入的上次数据与历史不一致时，从历史还原增量基准"""
+    history = StoreHistory(redis_client, keyframe_interval=10, retention_days=30)
+    history.record_update('store_a', [{'id': '1', 'price': 10.0}], None, 1000)
+    history.record_update('store_a', [{'id': '1', 'price': 12.0}, {'id': '2', 'price': 5.0}],
+                          [{'id': '1', 'price': 99.0}], 2000)
+
+    assert _strip(history.get_store_state('store_a', 2000)['items']) == [
+        {'id': '1', 'price': 12.0}, {'id': '2', 'price': 5.0}
+    ]
+    diff = history.diff_states('store_a', 1000, 2000)
+    assert [item['id'] for item in diff['added']] == ['2']
+    assert diff['changed'] == [{'id': '1', 'title': None, 'fields': {'price': {'old': 10.0, 'new': 12.0}}}]
+
+
+def test_prune_keeps_retained_points_restorable(redis_client):
+    """清理后保留期内的时间点仍可还原"""
+    history = StoreHistory(redis_client, keyframe_interval=3, retention_days=1)
+    versions = _random_versions(9, seed=3)
+    start = 1700000000
+    for index, items in enumerate(versions):
+        history.record_update('store_a', items, None, start + index * 6 * 3600)
+
+    now = start + 8 * 6 * 3600
+    removed = history.prune('store_a', now=now)
+    assert removed > 0
+    for index, items in enumerate(versions):
+        timestamp = start + index * 6 * 3600
+        if timestamp >= now - 24 * 3600:
+            assert _strip(history.get_store_state('store_a', timestamp)['items']) == items, index
+
@@ -0,0 +1,53 @@
+"""
+测试商品到店铺的反向索引：登记、下架清理、商品转移到其他店铺，以及删除店铺时清理索引
+"""
+
+import json
+import pytest
+from app.item_index import ItemStoreIndex
+
+
+def _item(item_id, price=10.0):
+    return {'id': str(item_id), 'title': f'商品 {item_id}', 'price': price}
+
+
+@pytest.fixture
+def index(redis_client):
+    return ItemStoreIndex(redis_client)
+
+
+def test_update_and_lookup(index, redis_client):
+    index.update_store('store_a', [_item(1), _item(2)])
+    index.update_store('store_b', [_item(3)])
+    assert index.lookup_store('1') == 'store_a'
+    assert index.lookup_store('3') == 'store_b'
+    assert index.lookup_store('999') is None
+
+    # 下架的商品从索引中移除
+    index.update_store('store_a', [_item(1)], removed_items=[_item(2)])
+    assert index.lookup_store('2') is None
+    assert redis_client.smembers('store:store_a:item_ids') == {'1'}
+
+
+def test_moved_item_kept_for_new_store(index):
+    """商品转移到其他店铺后，原店铺的下架记录不删除新店铺的索引项"""
+    index.update_store('store_a', [_item(1)])
+    index.update_store('store_b', [_item(1)])
+    index.update_store('store_a', [], removed_items=[_item(1)])
+    assert index.lookup_store('1') == 'store_b'
+
+    index.remove_store('store_a')
+    assert index.lookup_store('1') == 'store_b'
+    index.remove_store('store_b')
+    assert index.lookup_store('1') is None
+
+
+def test_get_item_from_store_items(index, redis_client):
+    """只在所属店铺的商品列表中查找商品数据"""
+    redis_client.set('store:store_a:items', json.dumps([_item(1, 12.5), _item(2)]))
+    redis_client.set('store:store_b:items', json.dumps([_item(1, 99.0)]))
+    index.update_store('store_a', [_item(1), _item(2)])
+
+    item = index.get_item('1')
+    assert item['price'] == 12.5 and item['store_name'] == 'store_a'
+    assert index.get_item('3') is None
@@ -0,0 +1,89 @@
+"""
+测试店铺商品查询索引：增量更新、过滤条件和并列分数下的游标分页
+"""
+
+import base64
+import json
+import pytest
+from app.item_query import ItemQueryIndex
+
+
+def _item(item_id, price=10.0, timestamp=1000, **fields):
+    item = {'id': str(item_id), 'title': f'商品 {item_id}', 'price': price, 'timestamp': timestamp}
+    item.update(fields)
+    return item
+
+
+def _ids(items):
+    return [item['id'] for item in items]
+
+
+@pytest.fixture
+def index(redis_client):
+    return ItemQueryIndex(redis_client)
+
+
+def _all_pages(index, limit, **kwargs):
+    """按游标读取全部分页"""
+    ids, cursor = [], None
+    while True:
+        page = index.query_items('store_a', cursor=cursor, limit=limit, **kwargs)
+        ids.extend(_ids(page['items']))
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_pagination_over_ties(index, redis_client, descending):
+    # 所有商品价格相同，分页只能依靠游标中已返回的数量
+    index.update_store('store_a', [_item(i) for i in range(1, 12)])
+    ids = _all_pages(index, 3, sort='price', descending=descending)
+    assert sorted(ids, key=int) == [str(i) for i in range(1, 12)] and len(ids) == 11
+
+    # 跨越多个分数的并列商品
+    index.update_store('store_a', [_item(i, price=float(i % 3)) for i in range(1, 12)])
+    ids = _all_pages(index, 2, sort='price', descending=descending)
+    assert len(set(ids)) == 11
+    prices = [float(int(item_id) % 3) for item_id in ids]
+    assert prices == sorted(prices, reverse=descending)
+
+
+def test_filters_and_invalid_cursor(index):
+    index.update_store('store_a', [
+        _item(1, price=5, free_returns=True, buy_format='auction'),
+        _item(2, price=15, free_returns=True, buy_format='buy_it_now'),
+        _item(3, price=25, buy_format='buy_it_now'),
+    ])
+    page = index.query_items('store_a', filters={'free_returns': True, 'min_price': 10}, sort='default')
+    assert _ids(page['items']) == ['2'] and page['total'] == 1
+    assert index.get_buy_formats('store_a') == ['auction', 'buy_it_now']
+
+    # 旧格式或无法解析的游标从第一页开始
+    legacy = base64.urlsafe_b64encode(json.dumps([5.0, '1']).encode('utf-8')).decode('ascii')
+    assert index.decode_cursor(legacy) is None
+    page = index.query_items('store_a', cursor='not-a-cursor', limit=2)
+    assert _ids(page['items']) == ['1', '2'] and page['next_cursor']
+
+
+def test_incremental_update(index, redis_client):
+    index.update_store('store_a', [_item(1, buy_format='auction', is_new_listing=True), _item(2), _item(3)])
+    version = redis_client.get('store:store_a:idx:version')
+
+    # 只有爬取时间变化时不写入，也不使查询缓存失效
+    changes = index.update_store('store_a', [_item(1, timestamp=2000, buy_format='auction', is_new_listing=True),
+                                             _item(2, timestamp=2000), _item(3, timestamp=2000)])
+    assert changes == {'changed': 0, 'removed': 0, 'moved': 0}
+    assert redis_client.get('store:store_a:idx:version') == version
+
+    # 新商品插在前面，商品 1 价格和标记变化，商品 3 被移除
+    changes = index.update_store('store_a', [_item(4, timestamp=3000), _item(1, price=8, timestamp=3000), _item(2)])
+    assert changes == {'changed': 2, 'removed': 1, 'moved': 3}
+    assert _ids(index.get_page('store_a')['items']) == ['4', '1', '2']
+    assert index.get_item('store_a', '1')['timestamp'] == 1000
+    assert index.get_item('store_a', '3') is None
+    assert index.query_items('store_a', filters={'is_new_listing': True})['items'] == []
+    assert index.get_buy_formats('store_a') == []
+    assert not redis_client.exists('store:store_a:idx:format:auction')
+    assert _ids(index.query_items('store_a', sort='price')['items']) == ['1', '2', '4']
+    assert _ids(index.query_items('store_a', sort='listing_date')['items']) == ['1', '2', '4']
@@ -0,0 +1,72 @@
+"""
+测试单个商品信息缓存：新鲜期内直接返回，过期后先返回旧结果并只启动一个后台刷新，bypass_cache 时强制抓取页面
+"""
+
+import json
+import time
+import threading
+import pytest
+from app.config import Config
+from app.improved_scraper import ImprovedEbayStoreScraper
+
+URL = 'https://www.ebay.com/itm/123456789'
+
+
+@pytest.fixture
+def scraper(redis_client, monkeypatch):
+    """页面抓取返回递增的价格；fetch_gate 未放行时后台刷新一直等待"""
+    monkeypatch.setattr(Config, 'LISTING_CACHE_TTL', 900)
+    monkeypatch.setattr(Config, 'LISTING_CACHE_STALE_TTL', 3600)
+    scraper = ImprovedEbayStoreScraper(redis_client=redis_client)
+    scraper.fetches = []
+    scraper.fetch_gate = threading.Event()
+    scraper.fetch_gate.set()
+
+    def fetch(listing_url, max_retries=3, request_delay=True):
+        scraper.fetch_gate.wait(5)
+        scraper.fetches.append(listing_url)
+        return {'url': listing_url, 'current': 10.0 + len(scraper.fetches)}
+
+    scraper._fetch_single_listing_info = fetch
+    return scraper
+
+
+def _age_cache(redis_client, seconds):
+    """把缓存的写入时间提前 seconds 秒"""
+    key = 'listing_cache:123456789'
+    cached = json.loads(redis_client.get(key))
+    cached['cached_at'] -= seconds
+    redis_client.set(key, json.dumps(cached))
+
+
+def _wait_for_refresh(redis_client):
+    deadline = time.time() + 5
+    while redis_client.exists('listing_cache:123456789:refreshing') and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_cache_hit(scraper):
+    assert scraper.get_single_listing_info(URL)['current'] == 11.0
+    assert scraper.get_single_listing_info(URL)['current'] == 11.0
+    assert len(scraper.fetches) == 1
+
+    # bypass_cache 时抓取页面并更新缓存
+    assert scraper.get_single_listing_info(URL, bypass_cache=True)['current'] == 12.0
+    assert scraper.get_single_listing_info(URL)['current'] == 12.0
+    assert len(scraper.fetches) == 2
+
+
+def test_stale_while_revalidate(scraper, redis_client):
+    scraper.get_single_listing_info(URL)
+    _age_cache(redis_client, 1000)
+
+    # 过期后立即返回旧结果，后台刷新期间的请求不重复启动刷新
+    scraper.fetch_gate.clear()
+    assert scraper.get_single_listing_info(URL)['current'] == 11.0
+    assert scraper.get_single_listing_info(URL)['current'] == 11.0
+    scraper.fetch_gate.set()
+    _wait_for_refresh(redis_client)
+
+    assert len(scraper.fetches) == 2
+    assert scraper.get_single_listing_info(URL)['current'] == 12.0
+    assert len(scraper.fetches) == 2
@@ -0,0 +1,69 @@
+"""
+测试商品价格解析：优先使用已监控店铺足够新的爬取数据，店铺数据过期或商品不在监控店铺中时回退到抓取商品页面
+"""
+
+import json
+import time
+import pytest
+from app.item_index import ItemStoreIndex
+from app.listing_resolver import ListingPriceResolver
+
+
+class FakeScraper:
+    """记录回退抓取的URL"""
+
+    def __init__(self):
+        self.fetched = []
+
+    def _extract_item_id_from_url(self, url):
+        return url.rsplit('/', 1)[-1]
+
+    def get_single_listing_info(self, url, request_delay=True, **kwargs):
+        self.fetched.append(url)
+        return {'url': url, 'current': 1.0, 'source': 'page'}
+
+
+def _url(item_id):
+    return f'https://www.ebay.com/itm/{item_id}'
+
+
+def _store(redis_client, store_name, items, last_update):
+    """写入店铺的商品数据和最近更新时间，并登记反向索引"""
+    redis_client.hset(f"store:{store_name}:item_data",
+                      mapping={item['id']: json.dumps(item) for item in items})
+    redis_client.set(f"store:{store_name}:last_update", last_update)
+    ItemStoreIndex(redis_client).update_store(store_name, items)
+
+
+@pytest.fixture
+def scraper():
+    return FakeScraper()
+
+
+@pytest.fixture
+def resolver(redis_client, scraper):
+    now = int(time.time())
+    _store(redis_client, 'fresh_store', [{'id': '1', 'title': '商品 1', 'price': 12.5, 'currency': 'GBP'}], now - 60)
+    _store(redis_client, 'stale_store', [{'id': '2', 'title': '商品 2', 'price': 20.0}], now - 7200)
+    return ListingPriceResolver(redis_client, scraper, max_age=3600)
+
+
+def test_resolve_from_fresh_store(resolver, scraper):
+    info = resolver.resolve(_url('1'))
+    assert info['current'] == 12.5 and info['currency'] == 'GBP'
+    assert info['source'] == 'store_data' and info['store_name'] == 'fresh_store'
+    assert info['url'] == _url('1')
+    assert scraper.fetched == []
+
+
+def test_fallback_to_page(resolver, scraper):
+    # 店铺数据过期、商品不属于任何监控店铺时抓取商品页面
+    assert resolver.resolve(_url('2'))['source'] == 'page'
+    assert resolver.resolve(_url('3'))['source'] == 'page'
+    assert scraper.fetched == [_url('2'), _url('3')]
+
+
+def test_split_resolvable(resolver):
+    split = resolver.split_resolvable([_url('1'), _url('2'), _url('3')])
+    assert list(split['resolved']) == [_url('1')]
+    assert split['to_fetch'] == [_url('2'), _url('3')]
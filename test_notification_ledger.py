@@ -0,0 +1,183 @@
+"""
+测试通知账本：事件指纹去重、过期，价格对比提醒的滞回（回落到释放区间后才重新提醒），
+以及入队的通知最终没有送达（进入死信）时释放指纹
+"""
+
+import json
+import time
+import pytest
+from app.config import Config
+from app.comparison import PriceComparison
+from app.digest import NotificationDigest
+from app.notification import EmailNotifier
+from app.notification_ledger import NotificationLedger
+from app.outbox import NotificationOutbox
+from app.webhook import WebhookNotifier
+
+MY_URL = 'https://www.ebay.com/itm/1001'
+COMPETITOR_URL = 'https://www.ebay.com/itm/2002'
+
+
+class FailingNotifier:
+    """投递总是失败的邮件通知器"""
+
+    def deliver(self, recipient, subject, body, is_html=True, text_body=None):
+        return False
+
+
+class FailingSession:
+    """推送总是失败的HTTP会话"""
+
+    class Response:
+        status_code = 500
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        return self.Response()
+
+
+@pytest.fixture
+def ledger(redis_client):
+    return NotificationLedger(redis_client)
+
+
+@pytest.fixture
+def comparison(redis_client, monkeypatch):
+    """价格由 comparison.prices 提供的对比（不抓取页面，不合并摘要）"""
+    monkeypatch.setattr(Config, 'DIGEST_WINDOW', 0)
+    comparison = PriceComparison(redis_client)
+    comparison.prices = {MY_URL: 100.0, COMPETITOR_URL: 100.0}
+    comparison.resolver.split_resolvable = lambda urls: {
+        'resolved': {url: {'current': comparison.prices[url], 'status': 'active'} for url in urls},
+        'to_fetch': []
+    }
+    return comparison
+
+
+def _save_config(redis_client, **fields):
+    config = {
+        'id': 'cmp_1',
+        'name': '对比',
+        'my_listing': {'url': MY_URL, 'title': '我的商品'},
+        'competitor_listing': {'url': COMPETITOR_URL, 'title': '对手商品'},
+        'notify_email': 'a@example.com',
+        'notify_conditions': {'threshold': 5.0, 'higher': True, 'lower': True},
+        'status': 'active'
+    }
+    config.update(fields)
+    redis_client.set('comparison:config:cmp_1', json.dumps(config))
+    redis_client.set('comparison:list', json.dumps(['cmp_1']))
+    return config
+
+
+def test_unseen_and_expiry(ledger, redis_client):
+    """记录过的指纹在有效期内不再通知，过期后重新通知"""
+    items = [{'id': '1'}, {'id': '2'}]
+
+    assert ledger.filter_unseen('a@example.com', items, ledger.new_listing_fingerprint) == items
+    ledger.record('a@example.com', ['new:1'], 3600)
+    assert ledger.filter_unseen('a@example.com', items, ledger.new_listing_fingerprint) == [{'id': '2'}]
+    # 其他收件人不受影响
+    assert ledger.unseen('b@example.com', ['new:1']) == [True]
+
+    redis_client.zadd('notify_ledger:a@example.com', {'new:1': int(time.time()) - 1})
+    assert ledger.unseen('a@example.com', ['new:1']) == [True]
+
+
+def test_comparison_released():
+    """释放区间判断：价格相等释放，价格获取失败保持原状态"""
+    threshold = 10.0
+    ratio = Config.LEDGER_COMPARISON_RELEASE_RATIO
+    assert NotificationLedger.comparison_released({'status': 'equal', 'difference': 0}, threshold)
+    assert not NotificationLedger.comparison_released({'status': 'unknown', 'difference': 0}, threshold)
+    assert NotificationLedger.comparison_released(
+        {'status': 'competitor_lower', 'difference': -threshold * ratio * 0.9}, threshold)
+    assert not NotificationLedger.comparison_released(
+        {'status': 'competitor_lower', 'difference': -threshold * ratio}, threshold)
+
+
+def test_comparison_hysteresis(comparison, redis_client):
+    """价格差异在阈值附近波动时只提醒一次，回落到释放区间后再次超过阈值才重新提醒"""
+    _save_config(redis_client)
+
+    # 我的价格 100，阈值 5，释放区间为差异小于 5 * LEDGER_COMPARISON_RELEASE_RATIO
+    release_price = 100 + 5.0 * Config.LEDGER_COMPARISON_RELEASE_RATIO * 0.5
+    steps = [
+        (110, 'notified'),       # 超过阈值，提醒
+        (108, 'suppressed'),     # 仍超过阈值，已提醒过
+        (103, 'none'),           # 低于阈值但未回落到释放区间
+        (108, 'suppressed'),     # 再次超过阈值，仍不重复提醒
+        (release_price, 'none'),  # 回落到释放区间，解除抑制
+        (108, 'notified'),       # 再次超过阈值，重新提醒
+        (90, 'notified'),        # 方向改变是另一个提醒
+        (91, 'suppressed'),
+    ]
+    for competitor_price, expected in steps:
+        comparison.prices[COMPETITOR_URL] = competitor_price
+        result = comparison.perform_all_comparisons()
+        record = result['comparison_results'][0]
+        assert record['notification_status'] == expected, competitor_price
+        assert record['notification_sent'] == (expected == 'notified')
+        assert result['notifications_suppressed'] == (['cmp_1'] if expected == 'suppressed' else [])
+
+
+def test_should_send_is_a_predicate(comparison, ledger, redis_client):
+    """判断是否通知时不修改通知账本（解除抑制只在发送流程中进行）"""
+    config = _save_config(redis_client)
+    ledger.record('a@example.com', ['comparison:cmp_1:competitor_higher'], 3600)
+    record = comparison.evaluate_comparison(config, {'current': 100.0}, {'current': 100.0})
+    assert record['notification_status'] == 'none'
+    assert ledger.unseen('a@example.com', ['comparison:cmp_1:competitor_higher']) == [False]
+
+
+def test_dead_letter_releases_fingerprints(lua_redis_client, ledger, monkeypatch):
+    """邮件入队时记录指纹，投递失败进入死信时释放，重新投递死信时再次记录"""
+    monkeypatch.setattr(Config, 'DIGEST_WINDOW', 0)
+    monkeypatch.setattr(Config, 'OUTBOX_MAX_ATTEMPTS', 1)
+    notifier = EmailNotifier(redis_client=lua_redis_client)
+    outbox = NotificationOutbox(lua_redis_client)
+    items = [{'id': '1', 'title': '商品', 'price': 10.0, 'is_new_listing': True}]
+
+    assert notifier.notify_new_listings('a@example.com', 'store_a', items)
+    assert ledger.unseen('a@example.com', ['new:1']) == [False]
+    # 投递前再次检测到的同一事件不重复入队
+    assert notifier.notify_new_listings('a@example.com', 'store_a', items)
+    assert outbox.get_stats()['pending'] == 1
+
+    assert outbox.deliver_due(FailingNotifier())['dead'] == 1
+    assert ledger.unseen('a@example.com', ['new:1']) == [True]
+
+    outbox.retry_dead(outbox.get_dead_letters()[0]['id'])
+    assert ledger.unseen('a@example.com', ['new:1']) == [False]
+
+
+def test_digest_carries_fingerprints(lua_redis_client, ledger, monkeypatch):
+    """摘要中的事件指纹随摘要邮件入队，摘要邮件进入死信时一起释放"""
+    monkeypatch.setattr(Config, 'OUTBOX_MAX_ATTEMPTS', 1)
+    notifier = EmailNotifier(redis_client=lua_redis_client)
+    change = {'item': {'id': '7', 'title': '商品'}, 'old_price': 10.0, 'new_price': 8.0}
+
+    assert notifier.notify_price_changes('a@example.com', 'store_a', [change])
+    NotificationDigest(lua_redis_client).flush_due(notifier, force=True)
+    message = NotificationOutbox(lua_redis_client).get_message('msg_1')
+    assert message['ledger'] == {'price:7:8.0': Config.LEDGER_PRICE_CHANGE_TTL}
+
+    NotificationOutbox(lua_redis_client).deliver_due(FailingNotifier())
+    assert ledger.unseen('a@example.com', ['price:7:8.0']) == [True]
+
+
+def test_webhook_dead_letter_releases_fingerprint(comparison, lua_redis_client, ledger, monkeypatch):
+    """只配置Webhook的对比提醒，推送最终失败时释放指纹，且账本信息不推送给接收方"""
+    monkeypatch.setattr(Config, 'WEBHOOK_SECRET', 'secret')
+    monkeypatch.setattr(Config, 'WEBHOOK_MAX_ATTEMPTS', 1)
+    _save_config(lua_redis_client, notify_email=None, webhook_url='https://hooks.example.com/a')
+    recipient = 'webhook:https://hooks.example.com/a'
+    comparison.prices[COMPETITOR_URL] = 110.0
+
+    comparison.perform_all_comparisons()
+    assert ledger.unseen(recipient, ['comparison:cmp_1:competitor_higher']) == [False]
+
+    webhook = WebhookNotifier(lua_redis_client, session=FailingSession())
+    assert webhook.deliver_due()['dead'] == 1
+    batch = json.loads(lua_redis_client.get('webhook:batch:batch_1'))
+    assert 'ledger' not in json.loads(batch['body'])['events'][0]
+    assert ledger.unseen(recipient, ['comparison:cmp_1:competitor_higher']) == [True]
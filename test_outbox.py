@@ -0,0 +1,119 @@
+"""
+测试通知发件箱：入队、失败后指数退避重试、死信和重新投递，以及投递锁的延长
+（投递锁的释放和延长脚本需要 Lua 支持：pip install "fakeredis[lua]"）
+"""
+
+import time
+import pytest
+from app.config import Config
+from app.outbox import NotificationOutbox
+from app.utils import acquire_lock
+
+
+class FakeNotifier:
+    """记录投递的邮件，failing 中的收件人投递失败；on_deliver 在每次投递时调用"""
+
+    def __init__(self):
+        self.failing = set()
+        self.delivered = []
+        self.on_deliver = None
+
+    def deliver(self, recipient, subject, body, is_html=True, text_body=None):
+        if self.on_deliver:
+            self.on_deliver()
+        if recipient in self.failing:
+            return False
+        self.delivered.append((recipient, subject))
+        return True
+
+
+@pytest.fixture
+def outbox(lua_redis_client, monkeypatch):
+    monkeypatch.setattr(Config, 'OUTBOX_BACKOFF_BASE', 60)
+    monkeypatch.setattr(Config, 'OUTBOX_BACKOFF_MAX', 600)
+    return NotificationOutbox(lua_redis_client)
+
+
+def _make_due(redis_client):
+    """让所有等待重试的消息立即到期"""
+    for message_id in redis_client.zrange(NotificationOutbox.QUEUE_KEY, 0, -1):
+        redis_client.zadd(NotificationOutbox.QUEUE_KEY, {message_id: 0})
+
+
+def test_backoff_delay():
+    """每次失败后等待时间翻倍（带抖动），不超过上限"""
+    for attempts, base in ((1, 60), (2, 120), (3, 240)):
+        assert base * 0.8 <= NotificationOutbox.backoff_delay(attempts) <= base * 1.2
+    assert NotificationOutbox.backoff_delay(20) <= Config.OUTBOX_BACKOFF_MAX * 1.2
+
+
+def test_deliver_and_retry(outbox, lua_redis_client):
+    notifier = FakeNotifier()
+    notifier.failing.add('b@example.com')
+    ok_id = outbox.enqueue('a@example.com', '主题A', '<p>A</p>')
+    failing_id = outbox.enqueue('b@example.com', '主题B', '<p>B</p>')
+    # 未到期的消息不投递
+    outbox.enqueue('c@example.com', '主题C', '<p>C</p>', deliver_at=int(time.time()) + 3600)
+
+    stats = outbox.deliver_due(notifier)
+    assert stats == {'sent': 1, 'retried': 1, 'dead': 0}
+    assert notifier.delivered == [('a@example.com', '主题A')]
+    assert outbox.get_message(ok_id)['status'] == 'sent'
+
+    message = outbox.get_message(failing_id)
+    assert message['attempts'] == 1 and message['last_error']
+    assert message['next_attempt_at'] >= int(time.time()) + 60 * 0.8 - 1
+    assert outbox.get_stats()['pending'] == 2 and outbox.get_stats()['due'] == 0
+    assert not lua_redis_client.exists(NotificationOutbox.LOCK_KEY)
+
+
+def test_dead_letter_and_retry(outbox, lua_redis_client, monkeypatch):
+    monkeypatch.setattr(Config, 'OUTBOX_MAX_ATTEMPTS', 2)
+    notifier = FakeNotifier()
+    notifier.failing.add('a@example.com')
+    message_id = outbox.enqueue('a@example.com', '主题', '<p>正文</p>', text_body='正文')
+
+    assert outbox.deliver_due(notifier)['retried'] == 1
+    _make_due(lua_redis_client)
+    assert outbox.deliver_due(notifier)['dead'] == 1
+
+    dead = outbox.get_dead_letters()
+    assert [message['id'] for message in dead] == [message_id]
+    assert 'body' not in dead[0] and 'text_body' not in dead[0]
+    assert 0 < lua_redis_client.ttl(outbox._message_key(message_id)) <= Config.OUTBOX_DEAD_RETENTION
+    assert outbox.get_stats()['totals'] == {'enqueued': 1, 'retried': 1, 'dead': 1}
+
+    notifier.failing.clear()
+    assert outbox.retry_dead(message_id)
+    assert not outbox.retry_dead(message_id)
+    assert outbox.deliver_due(notifier)['sent'] == 1
+    assert outbox.get_stats()['dead'] == 0
+
+
+def test_lock_extended_between_messages(outbox, lua_redis_client):
+    """每条消息投递前延长投递锁，锁失效（被其他进程获取）后停止投递"""
+    notifier = FakeNotifier()
+    for index in range(3):
+        outbox.enqueue(f'{index}@example.com', f'主题{index}', '<p>正文</p>')
+
+    ttls = []
+    notifier.on_deliver = lambda: ttls.append(lua_redis_client.pttl(NotificationOutbox.LOCK_KEY))
+    assert outbox.deliver_due(notifier)['sent'] == 3
+    assert all(ttl > (Config.OUTBOX_LOCK_TIMEOUT - 5) * 1000 for ttl in ttls)
+
+    # 其他投递任务正在运行时直接返回
+    for index in range(3):
+        outbox.enqueue(f'{index}@example.com', f'主题{index}', '<p>正文</p>')
+    token = acquire_lock(lua_redis_client, NotificationOutbox.LOCK_KEY, 60)
+    assert outbox.deliver_due(notifier) == {'sent': 0, 'retried': 0, 'dead': 0}
+
+    # 第一条投递期间锁超时并被其他进程获取，剩余消息不再投递，也不删除对方的锁
+    lua_redis_client.delete(NotificationOutbox.LOCK_KEY)
+
+    def steal_lock():
+        lua_redis_client.set(NotificationOutbox.LOCK_KEY, token)
+        notifier.on_deliver = None
+    notifier.on_deliver = steal_lock
+    assert outbox.deliver_due(notifier)['sent'] == 1
+    assert outbox.get_stats()['pending'] == 2
+    assert lua_redis_client.get(NotificationOutbox.LOCK_KEY) == token
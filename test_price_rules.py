@@ -0,0 +1,68 @@
+"""
+测试商品价格提醒规则：跌破价格和涨跌幅阈值的范围查询、店铺范围、暂停规则，以及触发的提醒加入通知摘要
+"""
+
+import pytest
+from app.digest import NotificationDigest
+from app.price_rules import PriceRuleEngine
+
+
+def _change(item_id, old_price, new_price):
+    return {'item': {'id': str(item_id), 'title': f'商品 {item_id}'}, 'old_price': old_price, 'new_price': new_price}
+
+
+@pytest.fixture
+def engine(redis_client):
+    return PriceRuleEngine(redis_client)
+
+
+def test_create_rule_validation(engine):
+    with pytest.raises(ValueError):
+        engine.create_rule('1', 'a@example.com')
+    with pytest.raises(ValueError):
+        engine.create_rule('1', 'a@example.com', below_price=0)
+    with pytest.raises(ValueError):
+        engine.create_rule('', 'a@example.com', change_pct=5)
+
+
+def test_evaluate_changes(engine):
+    below = engine.create_rule('1', 'a@example.com', below_price=90.0)
+    pct = engine.create_rule('1', 'b@example.com', change_pct=20.0)
+    scoped = engine.create_rule('1', 'c@example.com', below_price=95.0, store_name='store_b')
+
+    # 跌破阈值才触发：价格本来就在阈值之下、或没有跌破时不触发
+    alerts = engine.evaluate_changes('store_a', [_change(1, 100.0, 85.0)])
+    assert [(alert['rule_id'], alert['reason']) for alert in alerts] == [(below['id'], 'below')]
+    assert engine.evaluate_changes('store_a', [_change(1, 85.0, 80.0)]) == []
+    assert engine.evaluate_changes('store_a', [_change(1, 100.0, 91.0)]) == []
+
+    # 涨跌幅达到阈值时触发，涨价同样计算
+    alerts = engine.evaluate_changes('store_a', [_change(1, 100.0, 125.0)])
+    assert [(alert['rule_id'], alert['reason'], alert['actual_pct']) for alert in alerts] == [
+        (pct['id'], 'change_pct', 25.0)
+    ]
+
+    # 指定了店铺的规则只对该店铺生效
+    alerts = engine.evaluate_changes('store_b', [_change(1, 100.0, 92.0)])
+    assert [alert['rule_id'] for alert in alerts] == [scoped['id']]
+
+    # 暂停的规则不参与评估，重新启用后恢复
+    engine.set_status(below['id'], 'paused')
+    assert engine.evaluate_changes('store_a', [_change(1, 100.0, 85.0)]) == []
+    engine.set_status(below['id'], 'active')
+    assert len(engine.evaluate_changes('store_a', [_change(1, 100.0, 85.0)])) == 1
+
+    assert engine.delete_rule(below['id'])
+    assert engine.evaluate_changes('store_a', [_change(1, 100.0, 85.0)]) == []
+
+
+def test_process_price_changes_adds_to_digest(engine, redis_client):
+    rule = engine.create_rule('1', 'a@example.com', below_price=90.0)
+    engine.create_rule('2', 'a@example.com', change_pct=10.0)
+
+    assert engine.process_price_changes('store_a', [_change(1, 100.0, 85.0), _change(2, 50.0, 40.0),
+                                                    _change(3, 10.0, 1.0)]) == 2
+    entries = NotificationDigest(redis_client)._take_pending('a@example.com')
+    assert [entry['kind'] for entry in entries] == ['price_rule_alerts']
+    assert [alert['item']['id'] for alert in entries[0]['payload']['alerts']] == ['1', '2']
+    assert engine.get_rule(rule['id'])['last_triggered_at'] is not None
@@ -0,0 +1,57 @@
+"""
+测试商品标题搜索：多语言分词、排名、店铺过滤，以及索引更新后查询缓存失效
+"""
+
+import pytest
+from app.item_index import ItemStoreIndex
+from app.search import TitleSearchIndex, tokenize
+
+
+def _item(item_id, title):
+    return {'id': str(item_id), 'title': title, 'price': 10.0}
+
+
+@pytest.fixture
+def index(redis_client):
+    return TitleSearchIndex(redis_client)
+
+
+def _add_store(redis_client, index, store_name, items):
+    ItemStoreIndex(redis_client).update_store(store_name, items)
+    index.update_store(store_name, items)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Vintage Café Lamp for the 1970s', ['vintage', 'cafe', 'lamp', '1970s']),
+    ('Straße Øre', ['straße', 'øre']),
+    ('빈티지 카메라', ['빈티지', '카메라']),
+    ('ガラス・ｶﾒﾗ', ['ガ', 'ラ', 'ス', 'カ', 'メ', 'ラ']),
+    ('相机镜头', ['相', '机', '镜', '头']),
+])
+def test_tokenize(text, expected):
+    assert tokenize(text) == expected
+
+
+def test_search_ranking_and_store_filter(index, redis_client):
+    _add_store(redis_client, index, 'store_a', [_item(1, 'vintage camera lens'), _item(2, 'camera bag')])
+    _add_store(redis_client, index, 'store_b', [_item(3, 'Vintage Camera'), _item(4, '카메라 가방')])
+
+    result = index.search('vintage camera')
+    assert [row['id'] for row in result['results']] == ['3', '1']
+    assert result['results'][0]['store_name'] == 'store_b'
+
+    assert [row['id'] for row in index.search('vintage camera', store_name='store_a')['results']] == ['1']
+    # 没有同时包含所有词项的结果时放宽为任意词项
+    assert {row['id'] for row in index.search('camera tripod')['results']} == {'1', '2', '3'}
+    assert [row['id'] for row in index.search('가방')['results']] == ['4']
+
+
+def test_cache_invalidated_on_update(index, redis_client):
+    _add_store(redis_client, index, 'store_a', [_item(1, 'vintage camera')])
+    assert [row['id'] for row in index.search('camera')['results']] == ['1']
+
+    # 缓存有效期内新增和删除的商品立即反映在结果中
+    index.update_store('store_a', [], new_items=[_item(2, 'camera strap')])
+    assert sorted(row['id'] for row in index.search('camera')['results']) == ['1', '2']
+    index.update_store('store_a', [], removed_items=[_item(1, 'vintage camera')])
+    assert [row['id'] for row in index.search('camera')['results']] == ['2']
@@ -0,0 +1,94 @@
+"""
+测试已见商品登记表：精确记录 + 布隆过滤器查询，以及店铺更新时区分真正的新上架和重新出现的商品
+"""
+
+import time
+import pytest
+from app.seen_registry import SeenRegistry
+from app.improved_scraper import ImprovedEbayStoreScraper
+
+STORE_URL = 'https://www.ebay.com/sch/i.html?_ssn=store_a'
+
+
+def _item(item_id):
+    return {'id': str(item_id), 'title': f'商品 {item_id}', 'price': 10.0,
+            'url': f'https://www.ebay.com/itm/{item_id}'}
+
+
+def _ids(items):
+    return [item['id'] for item in items]
+
+
+@pytest.fixture
+def store_pages(redis_client):
+    """店铺页面由 store_pages['current'] 提供（整个店铺都在已爬取的页面内），store_pages['scraper'] 为爬虫"""
+    pages = {'current': [_item(1), _item(2), _item(3)]}
+    scraper = ImprovedEbayStoreScraper(redis_client=redis_client)
+
+    def scrape(url, max_pages=None):
+        items = [dict(item) for item in pages['current']]
+        return items, {'pages': [1], 'max_pages': max_pages, 'items': len(items),
+                       'total_results': len(items), 'reached_end': True}
+
+    scraper.scrape_pages_with_coverage = scrape
+    pages['scraper'] = scraper
+    return pages
+
+
+def test_bloom_hash_count(redis_client):
+    """每个商品在布隆过滤器中置位 bloom_hashes 个位置"""
+    registry = SeenRegistry(redis_client, bloom_bits=1024, bloom_hashes=7)
+    positions = registry._bit_positions('123')
+    assert len(positions) == 7 and all(0 <= position < 1024 for position in positions)
+
+
+def test_record_and_lookup(redis_client):
+    """登记后保留首次出现时间；精确记录清理后仍由布隆过滤器识别为出现过"""
+    registry = SeenRegistry(redis_client)
+    now = int(time.time())
+    assert not registry.is_initialized('store_a')
+
+    assert registry.record('store_a', [_item(1), _item(2), _item(2)], now - 100 * 86400) == 2
+    assert registry.record('store_a', [_item(2), _item(3)], now) == 1
+    assert registry.is_initialized('store_a')
+    assert registry.get_item('store_a', '1') == {'first_seen': now - 100 * 86400, 'last_seen': now - 100 * 86400,
+                                                 'source': 'exact'}
+    assert registry.get_item('store_a', '2')['first_seen'] == now - 100 * 86400
+    assert registry.get_item('store_a', '2')['last_seen'] == now
+
+    assert registry.prune('store_a', retention_days=30) == 1
+    assert registry.get_item('store_a', '1')['source'] == 'bloom'
+    assert registry.get_item('store_a', '2')['source'] == 'exact'
+    assert registry.get_item('store_a', '999') is None
+    # 其他店铺的登记表互不影响
+    assert registry.get_item('store_b', '2') is None
+
+    new_items, reappeared = registry.split_new('store_a', [_item(4), _item(1), _item(3)])
+    assert _ids(new_items) == ['4'] and _ids(reappeared) == ['1', '3']
+
+
+def test_update_store_classification(store_pages, redis_client):
+    """下架后重新上架、或店铺商品数据丢失后重新爬取的商品都不算新上架"""
+    scraper = store_pages['scraper']
+
+    # 首次爬取：店铺还没有登记表，所有商品都是新上架
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['new_listings']) == ['1', '2', '3']
+
+    # 商品 2 下架
+    store_pages['current'] = [_item(1), _item(3)]
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['removed_listings']) == ['2'] and result['new_listings'] == []
+
+    # 商品 2 重新上架，商品 4 是真正的新上架
+    store_pages['current'] = [_item(4), _item(2), _item(1), _item(3)]
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['new_listings']) == ['4']
+    assert _ids(result['reappeared_listings']) == ['2']
+
+    # 店铺商品数据丢失后重新爬取：只有从未出现过的商品 5 是新上架
+    redis_client.delete('store:store_a:items')
+    store_pages['current'] = [_item(5), _item(4), _item(2), _item(1), _item(3)]
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['new_listings']) == ['5']
+    assert sorted(_ids(result['reappeared_listings'])) == ['1', '2', '3', '4']
@@ -0,0 +1,82 @@
+"""
+测试SMTP连接池：复用已登录的连接，空闲超时或达到发送上限时重建，连接断开时重连重试一次
+"""
+
+import smtplib
+import pytest
+from app.notification import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """模拟SMTP服务器连接，fail_next 中的异常在下一次发送时抛出"""
+
+    instances = []
+
+    def __init__(self, server, port, timeout=None):
+        self.sent = []
+        self.fail_next = []
+        self.logged_in = False
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def login(self, username, password):
+        self.logged_in = True
+
+    def sendmail(self, sender, recipient, message):
+        assert self.logged_in and not self.closed
+        if self.fail_next:
+            raise self.fail_next.pop(0)
+        self.sent.append(recipient)
+        return {}
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    return SMTPConnectionPool('smtp.example.com', 587, 'user', 'password',
+                              size=2, idle_timeout=60, max_messages=3)
+
+
+def test_connection_reused(pool):
+    for index in range(3):
+        pool.sendmail('from@example.com', f'{index}@example.com', 'message')
+    assert len(FakeSMTP.instances) == 1
+    assert FakeSMTP.instances[0].sent == ['0@example.com', '1@example.com', '2@example.com']
+    assert pool.stats == {'connections_opened': 1, 'messages_sent': 3, 'reconnects': 0}
+
+    # 达到发送上限后重建连接
+    pool.sendmail('from@example.com', '3@example.com', 'message')
+    assert len(FakeSMTP.instances) == 2 and FakeSMTP.instances[0].closed
+
+    # 空闲超时的连接重建
+    pool._idle[0]['last_used'] -= 120
+    pool.sendmail('from@example.com', '4@example.com', 'message')
+    assert len(FakeSMTP.instances) == 3 and FakeSMTP.instances[1].closed
+
+    pool.close()
+    assert FakeSMTP.instances[2].closed
+
+
+def test_reconnect_on_disconnect(pool):
+    pool.sendmail('from@example.com', 'a@example.com', 'message')
+    FakeSMTP.instances[0].fail_next.append(smtplib.SMTPServerDisconnected('closed'))
+
+    pool.sendmail('from@example.com', 'b@example.com', 'message')
+    assert pool.stats['reconnects'] == 1
+    assert FakeSMTP.instances[0].closed
+    assert FakeSMTP.instances[1].sent == ['b@example.com']
+
+
+def test_recipient_error_keeps_connection(pool):
+    pool.sendmail('from@example.com', 'a@example.com', 'message')
+    FakeSMTP.instances[0].fail_next.append(smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'no such user')}))
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.sendmail('from@example.com', 'bad@example.com', 'message')
+    pool.sendmail('from@example.com', 'c@example.com', 'message')
+    assert len(FakeSMTP.instances) == 1
+    assert FakeSMTP.instances[0].sent == ['a@example.com', 'c@example.com']
@@ -0,0 +1,73 @@
+"""
+测试店铺快照注册表：关键帧 + 增量的保存、还原和压缩
+"""
+
+from datetime import datetime
+from app.snapshots import SnapshotRegistry, compute_items_delta, apply_items_delta
+
+
+def _item(item_id, price, **fields):
+    item = {'id': item_id, 'title': f'商品 {item_id}', 'price': price, 'url': f'https://www.ebay.com/itm/{item_id}'}
+    item.update(fields)
+    return item
+
+
+def test_delta_roundtrip():
+    """增量还原后与原列表一致（含顺序、字段删除）"""
+    base = [_item('1', 10.0), _item('2', 20.0, shipping='Free'), _item('3', 30.0)]
+    items = [_item('4', 40.0), _item('2', 18.5), _item('1', 10.0)]
+
+    delta = compute_items_delta(base, items)
+    assert list(delta['added']) == ['4']
+    assert delta['removed'] == ['3']
+    assert delta['changed'] == {'2': {'set': {'price': 18.5}, 'unset': ['shipping']}}
+    assert apply_items_delta(base, delta) == items
+
+
+def test_keyframe_and_delta_reconstruction(redis_client):
+    """每天第一份快照为关键帧，其余为增量，还原结果与保存的商品列表一致"""
+    registry = SnapshotRegistry(redis_client, keep_last=10, keyframe_days=30)
+    day1 = int(datetime(2024, 1, 10, 8).timestamp())
+    day2 = int(datetime(2024, 1, 11, 8).timestamp())
+
+    versions = {
+        day1: [_item('1', 10.0), _item('2', 20.0)],
+        day1 + 3600: [_item('3', 30.0), _item('1', 9.5), _item('2', 20.0)],
+        day1 + 7200: [_item('3', 30.0), _item('1', 9.5)],
+        day2: [_item('3', 28.0)],
+        day2 + 3600: [_item('5', 50.0), _item('3', 28.0)],
+    }
+    for timestamp, items in versions.items():
+        registry.save_snapshot('store_a', items, timestamp)
+
+    listed = registry.list_snapshots('store_a')
+    assert [entry['timestamp'] for entry in listed] == sorted(versions, reverse=True)
+    assert {entry['timestamp'] for entry in listed if entry['type'] == 'keyframe'} == {day1, day2}
+
+    for timestamp, items in versions.items():
+        restored = registry.get_snapshot('store_a', timestamp)
+        expected = [dict(item, timestamp=timestamp) for item in items] if timestamp not in (day1, day2) else items
+        assert restored == expected, (timestamp, restored)
+
+    # 增量只记录相对关键帧的变化
+    record = registry._load_record('store_a', day1 + 7200)
+    assert record['type'] == 'delta' and record['base'] == day1
+    assert record['delta']['removed'] == ['2'] and list(record['delta']['added']) == ['3']
+
+
+def test_compact_keeps_base_keyframes(redis_client):
+    """压缩后保留最近N份快照及其依赖的关键帧，剩余快照仍可还原"""
+    registry = SnapshotRegistry(redis_client, keep_last=2, keyframe_days=1)
+    day1 = int(datetime(2024, 1, 10, 8).timestamp())
+    timestamps = [day1 + hour * 3600 for hour in range(5)]
+    for hour, timestamp in enumerate(timestamps):
+        registry.save_snapshot('store_a', [_item('1', 10.0 + hour)], timestamp)
+
+    removed = registry.compact('store_a', now=day1 + 30 * 24 * 3600)
+    assert removed == 2
+    assert [entry['timestamp'] for entry in registry.list_snapshots('store_a')] == [
+        timestamps[4], timestamps[3], timestamps[0]
+    ]
+    assert registry.get_snapshot('store_a', timestamps[3])[0]['price'] == 13.0
+    assert not redis_client.exists(registry.snapshot_key('store_a', timestamps[1]))
+
@@ -0,0 +1,178 @@
+"""
+测试店铺爬取覆盖范围：商品总数识别、覆盖范围内外缺失商品的划分，以及待确认商品的抽查
+"""
+
+import pytest
+from app.config import Config
+from app.improved_scraper import ImprovedEbayStoreScraper
+from app.listing_resolver import ListingPriceResolver
+
+STORE_URL = 'https://www.ebay.com/sch/i.html?_ssn=store_a'
+
+
+def _item(item_id, price=10.0):
+    return {'id': str(item_id), 'title': f'商品 {item_id}', 'price': price,
+            'url': f'https://www.ebay.com/itm/{item_id}'}
+
+
+def _ids(items):
+    return [item['id'] for item in items]
+
+
+def _heading(text):
+    return f'<html><h1 class="srp-controls__count-heading"><span>{text}</span></h1></html>'
+
+
+@pytest.fixture
+def listing_statuses():
+    """商品页面状态：active / sold / ended / not_found / error，未列出的为 active"""
+    return {}
+
+
+@pytest.fixture
+def scraper(redis_client, listing_statuses, monkeypatch):
+    """不访问eBay的爬虫：商品页面状态由 listing_statuses 提供，scraper.checked 记录抽查过的商品"""
+    monkeypatch.setattr(Config, 'COMPARISON_REQUEST_INTERVAL', 0)
+    scraper = ImprovedEbayStoreScraper(redis_client=redis_client)
+    scraper.checked = []
+
+    def get_page(url):
+        item_id = url.rsplit('/', 1)[1]
+        scraper.checked.append(item_id)
+        status = listing_statuses.get(item_id, 'active')
+        if status in ('not_found', 'error'):
+            return None, status
+        return '<html></html>', 'ok'
+
+    scraper._get_single_listing_page = get_page
+    scraper._parse_single_listing = lambda html_content, url: {
+        'status': listing_statuses.get(url.rsplit('/', 1)[1], 'active')
+    }
+    return scraper
+
+
+@pytest.fixture
+def store_pages(scraper):
+    """店铺商品由 store_pages['current'] 提供，每次只抓到前 store_pages['limit'] 个"""
+    pages = {'current': [_item(i) for i in range(10, 0, -1)], 'limit': None}
+
+    def scrape(url, max_pages=None):
+        items = [dict(item) for item in pages['current'][:pages['limit']]]
+        return items, {'pages': [1], 'max_pages': max_pages, 'items': len(items),
+                       'total_results': None, 'reached_end': len(items) == len(pages['current'])}
+
+    scraper.scrape_pages_with_coverage = scrape
+    return pages
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1,234 results', 1234),
+    ('56 件商品', 56),
+    ('10,000+ results', None),
+    ('1-48 of 1,234 results', None),
+    ('Shop by category', None),
+])
+def test_extract_total_results(scraper, text, expected):
+    assert scraper._extract_total_results(_heading(text)) == expected
+
+
+def test_extract_total_results_requires_single_heading(scraper):
+    assert scraper._extract_total_results(_heading('5 results') + _heading('5 results')) is None
+    assert scraper._extract_total_results('<p>48 results for vintage lamps</p>') is None
+
+
+def test_first_page_coverage(scraper):
+    items = [_item(1), _item(2), _item(3)]
+    scraper.parse_items_from_html = lambda html_content: [dict(item) for item in items]
+
+    scraper._get_html_content = lambda url: _heading('3 results')
+    scraped, coverage = scraper.scrape_pages_with_coverage(STORE_URL, max_pages=1)
+    assert _ids(scraped) == ['1', '2', '3']
+    assert coverage['total_results'] == 3 and coverage['reached_end'] and coverage['pages'] == [1]
+
+    # 总数不明确时不能确认已到最后一页
+    scraper._get_html_content = lambda url: _heading('3+ results')
+    scraped, coverage = scraper.scrape_pages_with_coverage(STORE_URL, max_pages=1)
+    assert coverage['total_results'] is None and not coverage['reached_end']
+    assert scraper.scrape_all_pages(STORE_URL, max_pages=1) == scraped
+
+
+def test_split_missing_items(scraper):
+    previous = [_item(i) for i in range(1, 9)]
+    current = {item_id: {} for item_id in ('1', '3', '5')}
+
+    removed, unconfirmed = scraper.split_missing_items(previous, current, {'reached_end': False})
+    assert _ids(removed) == ['2', '4'] and _ids(unconfirmed) == ['6', '7', '8']
+
+    removed, unconfirmed = scraper.split_missing_items(previous, current, {'reached_end': True})
+    assert _ids(removed) == ['2', '4', '6', '7', '8'] and unconfirmed == []
+
+    # 与上次结果没有重叠时无法确定覆盖范围
+    removed, unconfirmed = scraper.split_missing_items(previous, {'99': {}}, {'reached_end': False})
+    assert removed == [] and len(unconfirmed) == len(previous)
+
+
+def test_confirm_missing_items(scraper, listing_statuses, monkeypatch):
+    monkeypatch.setattr(Config, 'REMOVAL_CONFIRM_BATCH_SIZE', 10)
+    listing_statuses.update({'1': 'sold', '2': 'ended', '3': 'not_found', '4': 'error', '5': 'active'})
+    unconfirmed = [_item(i) for i in range(1, 6)] + [{'id': '6', 'title': '没有链接的商品'}]
+
+    removed, remaining = scraper.confirm_missing_items('store_a', unconfirmed)
+    assert sorted(_ids(removed)) == ['1', '2', '3']
+    assert _ids(remaining) == ['4', '5', '6']
+    assert sorted(scraper.checked) == ['1', '2', '3', '4', '5']
+
+
+def test_confirm_oldest_first(scraper, monkeypatch):
+    monkeypatch.setattr(Config, 'REMOVAL_CONFIRM_BATCH_SIZE', 2)
+    scraper.record_seen_items('store_a', [_item(1)], 3000)
+    scraper.record_seen_items('store_a', [_item(2)], 1000)
+    scraper.record_seen_items('store_a', [_item(3)], 2000)
+    unconfirmed = [_item(1), _item(2), _item(3)]
+
+    removed, remaining = scraper.confirm_missing_items('store_a', unconfirmed)
+    assert removed == [] and _ids(remaining) == ['1', '2', '3']
+    assert sorted(scraper.checked) == ['2', '3']
+
+    # 确认在售的商品更新了最近出现时间，下次先抽查其他商品
+    scraper.checked.clear()
+    scraper.confirm_missing_items('store_a', unconfirmed)
+    assert '1' in scraper.checked
+
+
+def test_update_keeps_unconfirmed_items(scraper, store_pages, listing_statuses, monkeypatch):
+    monkeypatch.setattr(Config, 'REMOVAL_CONFIRM_BATCH_SIZE', 10)
+    scraper.update_store_data(STORE_URL, 'store_a')
+    store_pages['limit'] = 6
+
+    # 覆盖范围内的商品 8 和范围外的商品 2 都消失了，两个新商品把其余商品往后推
+    store_pages['current'] = [_item(12), _item(11)] + [_item(i) for i in (10, 9, 7, 6, 5, 4, 3, 1)]
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['new_listings']) == ['12', '11']
+    assert _ids(result['removed_listings']) == ['8']
+
+    # 抽查确认商品 2 已结束后才移除
+    listing_statuses['2'] = 'ended'
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert _ids(result['removed_listings']) == ['2']
+    result = scraper.update_store_data(STORE_URL, 'store_a')
+    assert result['removed_listings'] == []
+
+
+def test_resolver_skips_unconfirmed_items(scraper, store_pages, redis_client, monkeypatch):
+    """待确认商品的旧价格不作为对比价格，改为抓取商品页面"""
+    monkeypatch.setattr(Config, 'REMOVAL_CONFIRM_BATCH_SIZE', 0)
+    scraper.update_store_data(STORE_URL, 'store_a')
+    store_pages['limit'] = 6
+    store_pages['current'] = [_item(10, price=8.0)] + [_item(i) for i in range(9, 0, -1)]
+    scraper.update_store_data(STORE_URL, 'store_a')
+
+    fetched = []
+    scraper.get_single_listing_info = lambda url, **kwargs: fetched.append(url) or {'current': 9.5, 'status': 'active'}
+    resolver = ListingPriceResolver(redis_client, scraper)
+
+    seen = resolver.resolve('https://www.ebay.com/itm/10')
+    assert seen['source'] == 'store_data' and seen['current'] == 8.0
+    unconfirmed = resolver.resolve('https://www.ebay.com/itm/2')
+    assert unconfirmed == {'current': 9.5, 'status': 'active'}
+    assert fetched == ['https://www.ebay.com/itm/2']
@@ -0,0 +1,58 @@
+"""
+测试店铺数据清理：删除店铺所有键和反向索引项，不影响名称相近的其他店铺，大店铺转入后台清理
+"""
+
+import threading
+import pytest
+from app.item_index import ItemStoreIndex
+from app.store_purge import StorePurger
+
+
+def _seed_store(redis_client, store_name, item_ids):
+    """写入店铺的监控配置、商品数据、历史和快照键"""
+    redis_client.hset(f"monitor:store:{store_name}", mapping={'name': store_name})
+    redis_client.set(f"store:{store_name}:items", '[]')
+    redis_client.set(f"store:{store_name}:last_update", '1700000000')
+    for item_id in item_ids:
+        redis_client.set(f"store:{store_name}:item:{item_id}", '{}')
+    redis_client.set(f"history:{store_name}:1700000000", '{}')
+    redis_client.set(f"snapshot:{store_name}:1700000000", '{}')
+    redis_client.sadd("history:stores", store_name)
+    redis_client.sadd("snapshot:stores", store_name)
+    ItemStoreIndex(redis_client).update_store(store_name, [{'id': item_id} for item_id in item_ids])
+
+
+def _store_keys(redis_client, store_name):
+    return [key for key in redis_client.keys('*') if f":{store_name}:" in key or key.endswith(f":{store_name}")]
+
+
+@pytest.mark.parametrize('store_name', ['store_a', 'store[a]*'])
+def test_purge_store(redis_client, store_name):
+    _seed_store(redis_client, store_name, ['1', '2'])
+    _seed_store(redis_client, 'store_ab', ['3'])
+    _seed_store(redis_client, 'storeab', ['4'])
+    other_keys = set(_store_keys(redis_client, 'store_ab') + _store_keys(redis_client, 'storeab'))
+
+    result = StorePurger(redis_client, batch_size=2).purge_store(store_name, background=False)
+    assert result['background'] is False and result['deleted_keys'] > 0
+    assert _store_keys(redis_client, store_name) == []
+    assert not redis_client.sismember("history:stores", store_name)
+    assert ItemStoreIndex(redis_client).lookup_store('1') is None
+
+    # 名称相近（或被通配符匹配）的店铺数据不受影响
+    assert set(_store_keys(redis_client, 'store_ab') + _store_keys(redis_client, 'storeab')) == other_keys
+    assert ItemStoreIndex(redis_client).lookup_store('3') == 'store_ab'
+    assert ItemStoreIndex(redis_client).lookup_store('4') == 'storeab'
+
+
+def test_large_store_purged_in_background(redis_client):
+    _seed_store(redis_client, 'store_a', [str(item_id) for item_id in range(5)])
+
+    result = StorePurger(redis_client, background_threshold=3).purge_store('store_a')
+    # 监控配置和主要数据键立即删除，其余键由后台线程清理
+    assert result['background'] is True
+    assert not redis_client.exists("monitor:store:store_a", "store:store_a:items")
+    for thread in threading.enumerate():
+        if thread.name == "purge-store-store_a":
+            thread.join(timeout=5)
+    assert _store_keys(redis_client, 'store_a') == []
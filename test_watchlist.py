@@ -0,0 +1,77 @@
+"""
+测试关键词监控：整词匹配、店铺范围、关键词变化后重新编译自动机，以及命中记录加入通知摘要
+"""
+
+import time
+import threading
+import pytest
+from app.digest import NotificationDigest
+from app.watchlist import AhoCorasick, Watchlist
+
+
+def _item(item_id, title):
+    return {'id': str(item_id), 'title': title, 'price': 10.0, 'url': f'https://www.ebay.com/itm/{item_id}'}
+
+
+@pytest.fixture
+def watchlist(redis_client, monkeypatch):
+    # 每个测试使用新的进程内缓存
+    monkeypatch.setattr(Watchlist, '_compiled', {'version': None, 'automaton': None, 'keywords': {}})
+    return Watchlist(redis_client)
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick()
+    for pattern in ('he', 'she', 'his', 'hers'):
+        automaton.add(pattern, pattern)
+    assert automaton.build().find('ushers') == {'she', 'he', 'hers'}
+
+
+def test_match_items(watchlist):
+    camera = watchlist.add_keyword('Vintage Camera', 'a@example.com')
+    lens = watchlist.add_keyword('lens', 'b@example.com', stores=['store_b'])
+    with pytest.raises(ValueError):
+        watchlist.add_keyword('  ', 'a@example.com')
+
+    items = [_item(1, 'VINTAGE camera body'), _item(2, 'vintage cameras'), _item(3, 'Camera lens')]
+    matches = watchlist.match_items('store_a', items)
+    # 按整词匹配，限定店铺的关键词不匹配其他店铺
+    assert [(m['keyword_id'], m['item']['id']) for m in matches] == [(camera['id'], '1')]
+    matches = watchlist.match_items('store_b', items)
+    assert sorted((m['keyword_id'], m['item']['id']) for m in matches) == [(camera['id'], '1'), (lens['id'], '3')]
+
+    # 删除关键词后重新编译
+    watchlist.delete_keyword(camera['id'])
+    assert watchlist.match_items('store_a', items) == []
+
+
+def test_process_new_listings(watchlist, redis_client):
+    watchlist.add_keyword('lens', 'a@example.com')
+    watchlist.add_keyword('camera', 'b@example.com')
+    assert watchlist.process_new_listings('store_a', [_item(1, 'camera lens'), _item(2, 'tripod')]) == 2
+
+    digest = NotificationDigest(redis_client)
+    for recipient in ('a@example.com', 'b@example.com'):
+        entries = digest._take_pending(recipient)
+        assert [entry['kind'] for entry in entries] == ['watchlist_matches']
+        assert entries[0]['payload']['matches'][0]['item']['id'] == '1'
+
+
+def test_compiled_once_for_waiting_threads(watchlist, monkeypatch):
+    """等待编译锁的线程使用其他线程刚编译好的自动机，不重复编译"""
+    watchlist.add_keyword('lens', 'a@example.com')
+    compiles = []
+    get_keywords = Watchlist.get_keywords
+    monkeypatch.setattr(Watchlist, 'get_keywords', lambda self: compiles.append(1) or get_keywords(self))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(watchlist._get_automaton())) for _ in range(4)]
+    with Watchlist._compile_lock:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+    for thread in threads:
+        thread.join()
+
+    assert len(compiles) == 1
+    assert len({id(automaton) for automaton, _ in results}) == 1
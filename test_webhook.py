@@ -0,0 +1,153 @@
+"""
+测试Webhook通知：请求签名、批量推送、失败重试时同一地址的事件顺序、死信，以及推送锁的延长
+（推送锁的释放和延长脚本需要 Lua 支持：pip install "fakeredis[lua]"）
+"""
+
+import hmac
+import json
+import hashlib
+import pytest
+from app.config import Config
+from app.utils import acquire_lock
+from app.webhook import WebhookNotifier, sign_payload
+
+URL_A = 'https://hooks.example.com/a'
+URL_B = 'https://hooks.example.com/b'
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    """模拟接收方：校验签名，记录收到的事件，可按地址模拟失败；on_post 在每次推送时调用"""
+
+    def __init__(self, secret):
+        self.secret = secret
+        self.failing = set()
+        self.received = {}
+        self.on_post = None
+
+    def post(self, url, data, headers, timeout):
+        if self.on_post:
+            self.on_post()
+        body = data.decode()
+        expected = sign_payload(body, int(headers['X-Webstation-Timestamp']), self.secret)
+        assert hmac.compare_digest(headers['X-Webstation-Signature'], expected)
+        if url in self.failing:
+            return FakeResponse(500)
+        self.received.setdefault(url, []).extend(event['data']['seq'] for event in json.loads(body)['events'])
+        return FakeResponse(200)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(Config, 'WEBHOOK_SECRET', 'secret')
+    return FakeSession('secret')
+
+
+@pytest.fixture
+def notifier(lua_redis_client, session):
+    return WebhookNotifier(lua_redis_client, session=session)
+
+
+def _make_due(redis_client):
+    """让所有等待重试的批次立即到期"""
+    for batch_id in redis_client.zrange(WebhookNotifier.QUEUE_KEY, 0, -1):
+        redis_client.zadd(WebhookNotifier.QUEUE_KEY, {batch_id: 0})
+
+
+def test_sign_payload():
+    """签名为 HMAC-SHA256("{timestamp}.{body}")，未配置密钥时拒绝签名"""
+    body = json.dumps({'events': []})
+    digest = hmac.new(b'secret', f"1700000000.{body}".encode(), hashlib.sha256).hexdigest()
+    assert sign_payload(body, 1700000000, 'secret') == f"sha256={digest}"
+    assert sign_payload(body, 1700000001, 'secret') != sign_payload(body, 1700000000, 'secret')
+    with pytest.raises(ValueError):
+        sign_payload(body, 1700000000, '')
+
+
+def test_requires_secret(redis_client, monkeypatch):
+    """未配置密钥时不接受Webhook地址，也不推送"""
+    monkeypatch.setattr(Config, 'WEBHOOK_SECRET', '')
+    notifier = WebhookNotifier(redis_client, session=FakeSession('unused'))
+    assert WebhookNotifier.check_url(URL_A)
+    assert not notifier.enqueue(URL_A, 'new_listings', 'store_a', {'seq': 0})
+    assert notifier.deliver_due() == {'sent': 0, 'retried': 0, 'dead': 0, 'events': 0}
+    assert not redis_client.exists(WebhookNotifier.DIRTY_KEY)
+
+
+def test_order_kept_across_retries(notifier, session, lua_redis_client, monkeypatch):
+    """某个地址推送失败时，该地址更新的批次等待重试成功后按顺序推送，其他地址不受影响"""
+    monkeypatch.setattr(Config, 'WEBHOOK_BATCH_SIZE', 1)
+    monkeypatch.setattr(Config, 'WEBHOOK_MAX_ATTEMPTS', 5)
+
+    session.failing.add(URL_A)
+    for seq in range(3):
+        notifier.enqueue(URL_A, 'new_listings', 'store_a', {'seq': seq})
+        notifier.enqueue(URL_B, 'new_listings', 'store_b', {'seq': seq})
+    stats = notifier.deliver_due()
+    assert stats['sent'] == 3 and stats['retried'] == 1
+    assert session.received == {URL_B: [0, 1, 2]}
+
+    # 恢复后，失败批次未到期前新入队的事件也不能抢先推送
+    session.failing.clear()
+    notifier.enqueue(URL_A, 'new_listings', 'store_a', {'seq': 3})
+    notifier.deliver_due()
+    assert URL_A not in session.received
+
+    _make_due(lua_redis_client)
+    stats = notifier.deliver_due()
+    assert stats['sent'] == 4 and stats['events'] == 4
+    assert session.received[URL_A] == [0, 1, 2, 3]
+    assert not lua_redis_client.hgetall(WebhookNotifier.RETRYING_KEY)
+    assert not lua_redis_client.exists(WebhookNotifier.LOCK_KEY)
+
+
+def test_dead_letter_and_retry(notifier, session, lua_redis_client, monkeypatch):
+    """超过最大重试次数后进入死信（带保留时间），重新推送后按原内容送达"""
+    monkeypatch.setattr(Config, 'WEBHOOK_MAX_ATTEMPTS', 2)
+    session.failing.add(URL_A)
+
+    notifier.enqueue(URL_A, 'price_changes', 'store_a', {'seq': 0})
+    notifier.enqueue(URL_A, 'price_changes', 'store_a', {'seq': 1})
+    assert notifier.deliver_due()['retried'] == 1
+    _make_due(lua_redis_client)
+    assert notifier.deliver_due()['dead'] == 1
+
+    batch_id = lua_redis_client.zrange(WebhookNotifier.DEAD_KEY, 0, -1)[0]
+    assert 0 < lua_redis_client.ttl(notifier._batch_key(batch_id)) <= Config.WEBHOOK_DEAD_RETENTION
+    assert not lua_redis_client.hgetall(WebhookNotifier.RETRYING_KEY)
+
+    session.failing.clear()
+    assert notifier.retry_dead(batch_id)
+    assert lua_redis_client.ttl(notifier._batch_key(batch_id)) == -1
+    stats = notifier.deliver_due()
+    assert stats['sent'] == 1 and session.received[URL_A] == [0, 1]
+    assert notifier.get_stats()['batches_dead'] == 0
+
+
+def test_lock_extended_between_batches(notifier, session, lua_redis_client, monkeypatch):
+    """每批推送前延长推送锁，锁失效（被其他进程获取）后剩余批次留在队列中"""
+    monkeypatch.setattr(Config, 'WEBHOOK_BATCH_SIZE', 1)
+    for seq in range(3):
+        notifier.enqueue(URL_A, 'new_listings', 'store_a', {'seq': seq})
+
+    ttls = []
+    session.on_post = lambda: ttls.append(lua_redis_client.pttl(WebhookNotifier.LOCK_KEY))
+    assert notifier.deliver_due()['sent'] == 3
+    assert len(ttls) == 3 and all(ttl > (Config.WEBHOOK_LOCK_TIMEOUT - 5) * 1000 for ttl in ttls)
+
+    for seq in range(3, 6):
+        notifier.enqueue(URL_A, 'new_listings', 'store_a', {'seq': seq})
+    token = acquire_lock(lua_redis_client, 'other', 60)
+
+    def steal_lock():
+        lua_redis_client.set(WebhookNotifier.LOCK_KEY, token)
+        session.on_post = None
+    session.on_post = steal_lock
+    stats = notifier.deliver_due()
+    assert stats['sent'] == 1 and session.received[URL_A] == [0, 1, 2, 3]
+    assert notifier.get_stats()['batches_queued'] == 2
+    assert lua_redis_client.get(WebhookNotifier.LOCK_KEY) == token